@@ -1,4 +1,7 @@
 import os
+import re
+import time
+import hashlib
 import pymysql
 from src.utils.custom_logging import setup_logging
 from env import Env
@@ -6,54 +9,171 @@ from env import Env
 env = Env()
 log = setup_logging()
 
+# Коды ошибок MySQL: нет базы данных, нет таблицы
+UNKNOWN_DATABASE = 1049
+NO_SUCH_TABLE = 1146
+
+# Файлы миграций: <версия>_<название>.sql
+MIGRATION_FILE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class MigrationError(Exception):
+    """
+    Миграцию нельзя применить или уже примененная миграция изменилась
+    """
+
+
+class Migration:
+    def __init__(self, path: str):
+        self.path = path
+        version, name = MIGRATION_FILE.match(os.path.basename(path)).groups()
+        self.version = int(version)
+        self.name = name
+        with open(path, "rb") as f:
+            self.sql = f.read().decode("utf-8")
+        self.checksum = hashlib.sha256(self.sql.encode("utf-8")).hexdigest()
+
+    def statements(self) -> list:
+        # Строки комментариев отбрасываются, запросы разделяются ";" в конце строки
+        body = "\n".join(line for line in self.sql.splitlines() if not line.lstrip().startswith("--"))
+        return [statement.strip() for statement in re.split(r";\s*$", body, flags=re.MULTILINE)
+                if statement.strip()]
+
 
 class CreateSQL:
+    """
+    Версионные миграции базы данных из каталога migrations.
+
+    Примененные миграции записываются в таблицу schema_migrations вместе
+    с контрольной суммой файла. При запуске выполняется один запрос к этой
+    таблице; если все миграции применены и не изменились, на этом все.
+    Новые миграции выполняются по порядку версий, каждая в своей транзакции,
+    и ошибка останавливает запуск. В MySQL DDL запросы фиксируются сразу,
+    поэтому миграцию со схемой лучше делать из одного изменения.
+
+    База, созданная до появления миграций (таблицы уже есть, а schema_migrations
+    нет), принимается как примененная базовая миграция 0001.
+
+    Методы:
+    - migrate: Применить новые миграции.
+    """
 
-    def __init__(self):
-        # Определение пути к SQL-файлу
-        self.path_to_sql = os.path.join(os.path.dirname(__file__), f"{env.__getattr__('DB')}.sql")
+    def __init__(self, path_to_migrations: str = None):
+        self.database = env.__getattr__("DB")
+        self.path_to_migrations = path_to_migrations or os.path.join(os.path.dirname(__file__), "migrations")
+        self.migrations = sorted((Migration(os.path.join(self.path_to_migrations, name))
+                                  for name in os.listdir(self.path_to_migrations) if MIGRATION_FILE.match(name)),
+                                 key=lambda migration: migration.version)
 
-        # Установка соединения с базой данных
-        self.connection = pymysql.connect(
+    def _connect(self, database: str = None):
+        return pymysql.connect(
             host=env.__getattr__("DB_HOST"),
             port=int(env.__getattr__("DB_PORT")),
             user=env.__getattr__("DB_USER"),
             password=env.__getattr__("DB_PASSWORD"),
+            database=database,
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            autocommit=True
         )
 
-    def read_sql(self):
+    def _pending(self, applied: dict) -> list:
+        for migration in self.migrations:
+            checksum = applied.get(migration.version)
+            if checksum is not None and checksum != migration.checksum:
+                raise MigrationError(f"Migration {migration.version}_{migration.name} was changed after it was applied")
+        return [migration for migration in self.migrations if migration.version not in applied]
+
+    @staticmethod
+    def _applied(cursor) -> dict:
+        cursor.execute("SELECT version, checksum FROM schema_migrations")
+        return {row["version"]: row["checksum"] for row in cursor.fetchall()}
+
+    def _fast_path(self) -> bool:
+        # Один запрос, если база и таблица миграций уже есть
+        try:
+            connection = self._connect(self.database)
+        except pymysql.err.OperationalError as e:
+            if e.args[0] == UNKNOWN_DATABASE:
+                return False
+            raise
+        try:
+            with connection.cursor() as cursor:
+                return not self._pending(self._applied(cursor))
+        except pymysql.err.ProgrammingError as e:
+            if e.args[0] == NO_SUCH_TABLE:
+                return False
+            raise
+        finally:
+            connection.close()
+
+    def _bootstrap(self, cursor):
+        cursor.execute("SHOW TABLES LIKE 'schema_migrations'")
+        if cursor.fetchone():
+            return
+        cursor.execute("SHOW TABLES LIKE 'video'")
+        existing = cursor.fetchone() is not None
+        cursor.execute("CREATE TABLE IF NOT EXISTS `schema_migrations` ("
+                       "`version` int(11) NOT NULL, "
+                       "`name` varchar(255) NOT NULL, "
+                       "`checksum` char(64) NOT NULL, "
+                       "`applied_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP, "
+                       "PRIMARY KEY (`version`)"
+                       ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4")
+        if existing and self.migrations and self.migrations[0].version == 1:
+            baseline = self.migrations[0]
+            log.warning("Existing database without schema_migrations, marking baseline migration as applied")
+            cursor.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                           (baseline.version, baseline.name, baseline.checksum))
+
+    def _apply(self, connection, migration: Migration):
+        started = time.monotonic()
+        connection.begin()
+        try:
+            with connection.cursor() as cursor:
+                for statement in migration.statements():
+                    cursor.execute(statement)
+                cursor.execute("INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                               (migration.version, migration.name, migration.checksum))
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            log.error(f"Migration {migration.version}_{migration.name} failed")
+            raise
+        log.info(f"Applied migration {migration.version}_{migration.name} in {time.monotonic() - started:.2f}s")
+
+    def migrate(self) -> int:
+        """
+        Применяет новые миграции.
+
+        Returns:
+            int: Количество примененных миграций.
+        """
+        if self._fast_path():
+            log.info("Database schema is up to date")
+            return 0
+        connection = self._connect()
         try:
-            with self.connection.cursor() as cursor:
-                # Создание базы данных, если она не существует
-                cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{env.__getattr__('DB')}`")
-                cursor.execute(f"USE `{env.__getattr__('DB')}`")
-
-                # Открываем и выполняем SQL-скрипт
-                with open(self.path_to_sql, "r", encoding="utf-8") as f:
-                    sql_script = f.read()
-
-                    # Разделение SQL-скрипта на отдельные запросы
-                    statements = [stmt.strip() for stmt in sql_script.split(';') if stmt.strip()]
-
-                    # Выполнение всех запросов в файле
-                    for statement in statements:
-                        try:
-                            cursor.execute(statement)
-                            log.info("Executed SQL statement: %s", statement)
-                        except pymysql.MySQLError as e:
-                            log.warning("SQL Warning: %s")
-                            # Логирование неудачных запросов может помочь в отладке
-
-                self.connection.commit()
-                log.info("Database was created and SQL script executed successfully")
-        except Exception as ex:
-            log.warning("Error during SQL script execution", exc_info=ex)
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.database}`")
+                cursor.execute(f"USE `{self.database}`")
+                # Одновременно запущенные процессы применяют миграции по очереди
+                cursor.execute("SELECT GET_LOCK('schema_migrations', 300) AS locked")
+                if not cursor.fetchone()["locked"]:
+                    raise MigrationError("Timed out waiting for the migrations lock")
+                try:
+                    self._bootstrap(cursor)
+                    pending = self._pending(self._applied(cursor))
+                    for migration in pending:
+                        self._apply(connection, migration)
+                finally:
+                    cursor.execute("SELECT RELEASE_LOCK('schema_migrations')")
         finally:
-            self.connection.close()
+            connection.close()
+        log.info(f"Database schema migrated, {len(pending)} migrations applied")
+        return len(pending)
 
 
 if __name__ == "__main__":
     create_sql = CreateSQL()
-    create_sql.read_sql()
+    create_sql.migrate()
@@ -0,0 +1,41 @@
+--
+-- Индексы для точечных проверок существования (src/utils/exam_services.py)
+--
+-- Каждый индекс добавляется, только если его еще нет, поэтому миграцию можно
+-- повторить после частичного выполнения (DDL в MySQL не откатывается)
+--
+
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.statistics
+             WHERE table_schema = DATABASE() AND table_name = 'users' AND index_name = 'email') = 0,
+            'ALTER TABLE `users` ADD UNIQUE KEY `email` (`email`)', 'DO 0');
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.statistics
+             WHERE table_schema = DATABASE() AND table_name = 'categories' AND index_name = 'name') = 0,
+            'ALTER TABLE `categories` ADD UNIQUE KEY `name` (`name`)', 'DO 0');
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.statistics
+             WHERE table_schema = DATABASE() AND table_name = 'tags' AND index_name = 'name') = 0,
+            'ALTER TABLE `tags` ADD UNIQUE KEY `name` (`name`)', 'DO 0');
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.statistics
+             WHERE table_schema = DATABASE() AND table_name = 'api_keys' AND index_name = 'api_key') = 0,
+            'ALTER TABLE `api_keys` ADD UNIQUE KEY `api_key` (`api_key`)', 'DO 0');
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
+
+SET @ddl = IF((SELECT COUNT(*) FROM information_schema.statistics
+             WHERE table_schema = DATABASE() AND table_name = 'video' AND index_name = 'url') = 0,
+            'ALTER TABLE `video` ADD KEY `url` (`url`)', 'DO 0');
+PREPARE ddl FROM @ddl;
+EXECUTE ddl;
+DEALLOCATE PREPARE ddl;
@@ -0,0 +1,18 @@
+--
+-- Счетчики использования API ключей (src/utils/usage_meter.py)
+--
+CREATE TABLE IF NOT EXISTS `api_key_usage` (
+  `api_key` varchar(255) NOT NULL,
+  `used` int(11) NOT NULL DEFAULT '0',
+  PRIMARY KEY (`api_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+--
+-- Отметки о записанных пакетах счетчиков для распознавания повторов
+--
+CREATE TABLE IF NOT EXISTS `api_key_usage_flushes` (
+  `flush_id` char(36) NOT NULL,
+  `flushed_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`flush_id`),
+  KEY `flushed_at` (`flushed_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
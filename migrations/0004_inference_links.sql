@@ -0,0 +1,72 @@
+--
+-- Таблицы связей inference с категориями, подкатегориями и тегами
+-- (src/repository/inference_links_repository.py)
+--
+CREATE TABLE IF NOT EXISTS `inference_category_links` (
+  `inference_id` int(11) NOT NULL,
+  `category_id` int(11) NOT NULL,
+  PRIMARY KEY (`inference_id`, `category_id`),
+  KEY `category_id` (`category_id`, `inference_id`),
+  CONSTRAINT `inference_category_links_ibfk_1` FOREIGN KEY (`inference_id`) REFERENCES `inference_categories` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `inference_subcategory_links` (
+  `inference_id` int(11) NOT NULL,
+  `subcategory_id` int(11) NOT NULL,
+  PRIMARY KEY (`inference_id`, `subcategory_id`),
+  KEY `subcategory_id` (`subcategory_id`, `inference_id`),
+  CONSTRAINT `inference_subcategory_links_ibfk_1` FOREIGN KEY (`inference_id`) REFERENCES `inference_categories` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS `inference_tag_links` (
+  `inference_id` int(11) NOT NULL,
+  `tag_id` int(11) NOT NULL,
+  PRIMARY KEY (`inference_id`, `tag_id`),
+  KEY `tag_id` (`tag_id`, `inference_id`),
+  CONSTRAINT `inference_tag_links_ibfk_1` FOREIGN KEY (`inference_id`) REFERENCES `inference_categories` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+--
+-- Перенос строк "1,2,4" в таблицы связей: n-й элемент списка для n от 1 до 1000,
+-- нечисловые элементы пропускаются
+--
+INSERT IGNORE INTO `inference_category_links` (`inference_id`, `category_id`)
+SELECT s.`id`, CAST(TRIM(SUBSTRING_INDEX(SUBSTRING_INDEX(s.`category_ids`, ',', n.n), ',', -1)) AS UNSIGNED)
+FROM `inference_categories` s
+JOIN (SELECT a.d + b.d * 10 + c.d * 100 + 1 AS n
+      FROM (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) a,
+           (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) b,
+           (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) c) n
+  ON n.n <= 1 + LENGTH(s.`category_ids`) - LENGTH(REPLACE(s.`category_ids`, ',', ''))
+JOIN `inference_categories` i ON i.`id` = s.`id`
+WHERE TRIM(SUBSTRING_INDEX(SUBSTRING_INDEX(s.`category_ids`, ',', n.n), ',', -1)) REGEXP '^[0-9]+$';
+
+INSERT IGNORE INTO `inference_subcategory_links` (`inference_id`, `subcategory_id`)
+SELECT s.`id`, CAST(TRIM(SUBSTRING_INDEX(SUBSTRING_INDEX(s.`subcategory_ids`, ',', n.n), ',', -1)) AS UNSIGNED)
+FROM `inference_subcategories` s
+JOIN (SELECT a.d + b.d * 10 + c.d * 100 + 1 AS n
+      FROM (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) a,
+           (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) b,
+           (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) c) n
+  ON n.n <= 1 + LENGTH(s.`subcategory_ids`) - LENGTH(REPLACE(s.`subcategory_ids`, ',', ''))
+JOIN `inference_categories` i ON i.`id` = s.`id`
+WHERE TRIM(SUBSTRING_INDEX(SUBSTRING_INDEX(s.`subcategory_ids`, ',', n.n), ',', -1)) REGEXP '^[0-9]+$';
+
+INSERT IGNORE INTO `inference_tag_links` (`inference_id`, `tag_id`)
+SELECT s.`id`, CAST(TRIM(SUBSTRING_INDEX(SUBSTRING_INDEX(s.`tag_ids`, ',', n.n), ',', -1)) AS UNSIGNED)
+FROM `inference_tags` s
+JOIN (SELECT a.d + b.d * 10 + c.d * 100 + 1 AS n
+      FROM (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) a,
+           (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) b,
+           (SELECT 0 AS d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) c) n
+  ON n.n <= 1 + LENGTH(s.`tag_ids`) - LENGTH(REPLACE(s.`tag_ids`, ',', ''))
+JOIN `inference_categories` i ON i.`id` = s.`id`
+WHERE TRIM(SUBSTRING_INDEX(SUBSTRING_INDEX(s.`tag_ids`, ',', n.n), ',', -1)) REGEXP '^[0-9]+$';
+
+--
+-- Подкатегории тегов inference
+--
+INSERT IGNORE INTO `inference_subcategory_links` (`inference_id`, `subcategory_id`)
+SELECT l.`inference_id`, t.`subcategory_id`
+FROM `inference_tag_links` l
+JOIN `tags` t ON t.`id` = l.`tag_id`;
@@ -0,0 +1,6 @@
+--
+-- Имя подкатегории уникально внутри категории (массовый импорт таксономии,
+-- src/repository/taxonomy_repository.py)
+--
+ALTER TABLE `subcategories`
+  ADD UNIQUE KEY `category_name` (`category_id`, `name`);
@@ -0,0 +1,11 @@
+--
+-- Версия таксономии для снимка категорий, подкатегорий и тегов в памяти
+-- (src/utils/taxonomy_cache.py)
+--
+CREATE TABLE IF NOT EXISTS `taxonomy_version` (
+  `id` tinyint(4) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO `taxonomy_version` (`id`, `version`) VALUES (1, 0);
@@ -0,0 +1,16 @@
+--
+-- Загруженные файлы с адресацией по содержимому и счетчиком ссылок
+-- (src/utils/write_file_into_server.py): одинаковый файл хранится один раз
+--
+CREATE TABLE IF NOT EXISTS `media_objects` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `name_object` varchar(64) NOT NULL,
+  `sha256` char(64) NOT NULL,
+  `filename` varchar(128) NOT NULL,
+  `size` bigint(20) NOT NULL,
+  `refcount` int(11) NOT NULL DEFAULT '1',
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `name_object_sha256` (`name_object`, `sha256`),
+  UNIQUE KEY `name_object_filename` (`name_object`, `filename`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,29 @@
+--
+-- Возобновляемые загрузки частями (src/services/upload_services.py)
+--
+CREATE TABLE IF NOT EXISTS `upload_sessions` (
+  `id` char(36) NOT NULL,
+  `name_object` varchar(64) NOT NULL,
+  `filename` varchar(255) NOT NULL,
+  `size` bigint(20) NOT NULL,
+  `chunk_size` int(11) NOT NULL,
+  `sha256` char(64) DEFAULT NULL,
+  `predict` tinyint(1) NOT NULL DEFAULT '0',
+  `status` varchar(16) NOT NULL DEFAULT 'open',
+  `stored_filename` varchar(128) DEFAULT NULL,
+  `job_id` char(36) DEFAULT NULL,
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+--
+-- Принятые части загрузки с их sha256
+--
+CREATE TABLE IF NOT EXISTS `upload_chunks` (
+  `upload_id` char(36) NOT NULL,
+  `chunk_index` int(11) NOT NULL,
+  `size` int(11) NOT NULL,
+  `sha256` char(64) NOT NULL,
+  PRIMARY KEY (`upload_id`, `chunk_index`),
+  CONSTRAINT `upload_chunks_session` FOREIGN KEY (`upload_id`) REFERENCES `upload_sessions` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
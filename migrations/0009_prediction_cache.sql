@@ -0,0 +1,13 @@
+--
+-- Сохраненный уровень кеша предсказаний (src/utils/prediction_cache.py):
+-- ответ модели в JSON по версии модели и sha256 нормализованной ссылки
+--
+CREATE TABLE IF NOT EXISTS `prediction_cache` (
+  `model_version` varchar(64) NOT NULL,
+  `url_hash` char(64) NOT NULL,
+  `url` varchar(2048) NOT NULL,
+  `result` mediumtext NOT NULL,
+  `expires_at` bigint(20) NOT NULL,
+  PRIMARY KEY (`model_version`, `url_hash`),
+  KEY `expires_at` (`expires_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,11 @@
+--
+-- Версия обратного индекса видео в памяти процессов сервера
+-- (src/utils/video_index.py)
+--
+CREATE TABLE IF NOT EXISTS `video_index_version` (
+  `id` tinyint(4) NOT NULL,
+  `version` bigint(20) NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT IGNORE INTO `video_index_version` (`id`, `version`) VALUES (1, 0);
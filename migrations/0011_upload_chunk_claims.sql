@@ -0,0 +1,8 @@
+--
+-- Часть загрузки занимается запросом до записи (writer, updated_at), пока она
+-- пишется, sha256 пустой (src/repository/upload_repository.py)
+--
+ALTER TABLE `upload_chunks`
+  MODIFY `sha256` char(64) DEFAULT NULL,
+  ADD `writer` char(36) DEFAULT NULL,
+  ADD `updated_at` bigint(20) NOT NULL DEFAULT '0';
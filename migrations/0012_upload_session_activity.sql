@@ -0,0 +1,9 @@
+--
+-- Время последней активности загрузки для удаления брошенных загрузок
+-- (src/services/upload_services.py)
+--
+ALTER TABLE `upload_sessions`
+  ADD `updated_at` bigint(20) NOT NULL DEFAULT '0',
+  ADD KEY `status_updated_at` (`status`, `updated_at`);
+
+UPDATE `upload_sessions` SET `updated_at` = UNIX_TIMESTAMP(`created_at`);
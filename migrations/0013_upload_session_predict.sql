@@ -0,0 +1,7 @@
+--
+-- Предсказание по загруженному файлу не поддерживается (src/services/upload_services.py):
+-- флаг predict и ID задачи в загрузках не используются
+--
+ALTER TABLE `upload_sessions`
+  DROP COLUMN `predict`,
+  DROP COLUMN `job_id`;
@@ -2,7 +2,7 @@ from pydantic import (BaseModel, Field, StrictStr, Json, condecimal,
                       StrictInt, PrivateAttr, SecretBytes, StrictBytes, StrictBool, root_validator,
                       SecretStr)
 from enum import Enum
-from typing import Optional, List, ClassVar
+from typing import Optional, List, ClassVar, Any
 from datetime import datetime
 import os
 from pathlib import Path
@@ -90,6 +90,24 @@ class VideoInference(BaseModel):
                                    examples=[1])
 
 
+class InferenceLinks(BaseModel):
+    """
+    Model of inference links to categories, subcategories and tags
+    """
+    InferenceID: StrictInt = Field(...,
+                                   alias="inference_id",
+                                   examples=[1])
+    CategoryIDS: List[int] = Field([],
+                                   alias="category_ids",
+                                   examples=[[1, 2, 4]])
+    SubcategoryIDS: List[int] = Field([],
+                                      alias="subcategory_ids",
+                                      examples=[[3, 5]])
+    TagIDS: List[int] = Field([],
+                              alias="tag_ids",
+                              examples=[[1, 2, 3]])
+
+
 class Predict(BaseModel):
     """
     Model of predict
@@ -99,6 +117,128 @@ class Predict(BaseModel):
                            examples=["https://rutube.ru/video/98a85192e297ff4db1860f43ff7a2738/"])
 
 
+class PredictBatchResult(BaseModel):
+    """
+    Model of predict result for one item of batch
+    """
+    Url: StrictStr = Field(...,
+                           alias="url",
+                           examples=["https://rutube.ru/video/98a85192e297ff4db1860f43ff7a2738/"])
+    Result: Optional[Any] = Field(None,
+                                  alias="result")
+    Error: Optional[StrictStr] = Field(None,
+                                       alias="error",
+                                       examples=["Video not found"])
+    InferenceID: Optional[int] = Field(None,
+                                       alias="inference_id",
+                                       examples=[1])
+
+
+class JobStatus(str, Enum):
+    """
+    Status of background job
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class PredictJob(BaseModel):
+    """
+    Model of background predict job
+    """
+    ID: StrictStr = Field(...,
+                          alias="id",
+                          examples=[str(uuid4())])
+    Url: StrictStr = Field(...,
+                           alias="url",
+                           examples=["https://rutube.ru/video/98a85192e297ff4db1860f43ff7a2738/"])
+    Status: JobStatus = Field(JobStatus.QUEUED,
+                              alias="status",
+                              examples=[JobStatus.QUEUED])
+    Result: Optional[Any] = Field(None,
+                                  alias="result")
+    Error: Optional[StrictStr] = Field(None,
+                                       alias="error",
+                                       examples=["Video not found"])
+    Attempts: StrictInt = Field(0,
+                                alias="attempts",
+                                examples=[1])
+    CreatedAt: Optional[datetime] = Field(None,
+                                          alias="created_at",
+                                          examples=[f"{datetime.now()}"])
+    FinishedAt: Optional[datetime] = Field(None,
+                                           alias="finished_at",
+                                           examples=[f"{datetime.now()}"])
+
+
+class UploadStatus(str, Enum):
+    """
+    Status of chunked upload
+    """
+    OPEN = "open"
+    COMPLETING = "completing"
+    COMPLETED = "completed"
+
+
+class UploadInit(BaseModel):
+    """
+    Model of chunked upload start
+    """
+    Filename: StrictStr = Field(...,
+                                alias="filename",
+                                examples=["video.mp4"])
+    Size: StrictInt = Field(...,
+                            alias="size",
+                            ge=0,
+                            examples=[2147483648])
+    ChunkSize: Optional[StrictInt] = Field(None,
+                                           alias="chunk_size",
+                                           gt=0,
+                                           examples=[8388608])
+    Sha256: Optional[StrictStr] = Field(None,
+                                        alias="sha256",
+                                        pattern="^[0-9a-f]{64}$")
+    NameObject: StrictStr = Field("videos",
+                                  alias="name_object",
+                                  pattern="^[A-Za-z0-9_-]{1,64}$",
+                                  examples=["videos"])
+
+
+class UploadSession(BaseModel):
+    """
+    Model of chunked upload state
+    """
+    ID: StrictStr = Field(...,
+                          alias="id",
+                          examples=[str(uuid4())])
+    Filename: StrictStr = Field(...,
+                                alias="filename",
+                                examples=["video.mp4"])
+    Size: StrictInt = Field(...,
+                            alias="size",
+                            examples=[2147483648])
+    ChunkSize: StrictInt = Field(...,
+                                 alias="chunk_size",
+                                 examples=[8388608])
+    ChunksTotal: StrictInt = Field(...,
+                                   alias="chunks_total",
+                                   examples=[256])
+    ReceivedBytes: StrictInt = Field(0,
+                                     alias="received_bytes",
+                                     examples=[16777216])
+    Missing: List[int] = Field([],
+                               alias="missing",
+                               examples=[[2, 3]])
+    Status: UploadStatus = Field(UploadStatus.OPEN,
+                                 alias="status",
+                                 examples=[UploadStatus.OPEN])
+    StoredFilename: Optional[StrictStr] = Field(None,
+                                                alias="stored_filename")
+
+
 class Users(BaseModel):
     """
     Модель пользователя
@@ -0,0 +1,106 @@
+import asyncio
+import aiomysql
+from pymysql.err import OperationalError
+from env import Env
+from src.database.my_connector import config, RECONNECT_ERRORS, LOST_DURING_QUERY_ERRORS
+from src.utils.custom_logging import setup_logging
+
+env = Env()
+log = setup_logging()
+
+
+class AsyncDatabase:
+    """
+    Асинхронный вариант Database поверх пула соединений aiomysql.
+
+    Запросы не блокируют цикл событий uvicorn, поэтому медленный запрос
+    задерживает только свой обработчик. Пул создается лениво при первом
+    запросе или явно через connect() при старте приложения.
+
+    Методы:
+    - connect: Создать пул соединений.
+    - close: Закрыть пул соединений.
+    - execute_query: Выполнить изменяющий запрос и вернуть курсор.
+    - fetch_one: Вернуть первую строку результата.
+    - fetch_all: Вернуть все строки результата.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.retries = int(config["Database"]["retries"])
+        self.retry_backoff = float(config["Database"]["retry_backoff"])
+        self._lock = asyncio.Lock()
+        self._counters = {"retries": 0}
+
+    async def connect(self):
+        async with self._lock:
+            if self.pool is None:
+                self.pool = await aiomysql.create_pool(
+                    host=env.__getattr__("DB_HOST"),
+                    db=env.__getattr__("DB"),
+                    port=int(env.__getattr__("DB_PORT")),
+                    user=env.__getattr__("DB_USER"),
+                    password=env.__getattr__("DB_PASSWORD"),
+                    charset='utf8mb4',
+                    cursorclass=aiomysql.DictCursor,
+                    autocommit=True,
+                    minsize=1,
+                    maxsize=int(config["Database"]["pool_size"]),
+                    pool_recycle=int(config["Database"]["pool_recycle"])
+                )
+        return self.pool
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    async def _run(self, action, idempotent: bool):
+        pool = self.pool or await self.connect()
+        attempt = 0
+        while True:
+            try:
+                async with pool.acquire() as connection:
+                    return await action(connection)
+            except OperationalError as e:
+                code = e.args[0] if e.args else None
+                retryable = code in RECONNECT_ERRORS or (idempotent and code in LOST_DURING_QUERY_ERRORS)
+                if not retryable or attempt >= self.retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                self._counters["retries"] += 1
+                log.warning(f"Database error {code}, retry {attempt}/{self.retries} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def execute_query(self, query, params=None):
+        async def action(connection):
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                await connection.commit()
+                return cursor
+        return await self._run(action, idempotent=False)
+
+    async def fetch_one(self, query, params=None):
+        async def action(connection):
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchone()
+        return await self._run(action, idempotent=True)
+
+    async def fetch_all(self, query, params=None):
+        async def action(connection):
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchall()
+        return await self._run(action, idempotent=True)
+
+    def stats(self) -> dict:
+        if self.pool is None:
+            return {"size": 0, "free": 0, **self._counters}
+        return {"size": self.pool.size, "free": self.pool.freesize, "max_size": self.pool.maxsize,
+                **self._counters}
+
+
+async_db = AsyncDatabase()
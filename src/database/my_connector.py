@@ -1,49 +1,292 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
 import pymysql
 from pymysql.err import OperationalError
 from env import Env
+from src import path_to_config
+from src.utils.config_parser import ConfigParser
 from src.utils.custom_logging import setup_logging
 
 env = Env()
 log = setup_logging()
+config = ConfigParser.parse(path_to_config())
 
 
-class Database:
-    def __init__(self):
-        self.connection = pymysql.connect(
+class PoolTimeoutError(Exception):
+    """
+    Свободное соединение не освободилось за отведенное время
+    """
+
+
+class PooledConnection:
+    """
+    Соединение pymysql вместе с временем создания и последнего использования
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений с базой данных ограниченного размера.
+
+    Соединения создаются лениво, выдаются по принципу LIFO (самое "теплое" первым)
+    и пересоздаются по истечении pool_recycle секунд. Ping выполняется только для
+    соединений, простаивавших дольше ping_interval секунд, поэтому "теплое"
+    соединение не стоит лишних обращений к серверу.
+
+    Методы:
+    - acquire: Получить соединение из пула (ожидает не дольше timeout секунд).
+    - release: Вернуть соединение в пул или закрыть его, если оно сломано.
+    - close_all: Закрыть все свободные соединения.
+    - stats: Размер пула и счетчики ping/переподключений.
+    """
+
+    def __init__(self, max_size: int = 10, timeout: float = 30, recycle: float = 3600,
+                 ping_interval: float = 30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._counters = {"connects": 0, "pings": 0, "reconnects": 0, "discards": 0, "retries": 0}
+
+    def count(self, name: str, value: int = 1):
+        with self._condition:
+            self._counters[name] += value
+
+    def _create_connection(self):
+        self.count("connects")
+        return pymysql.connect(
             host=env.__getattr__("DB_HOST"),
             db=env.__getattr__("DB"),
             port=int(env.__getattr__("DB_PORT")),
             user=env.__getattr__("DB_USER"),
             password=env.__getattr__("DB_PASSWORD"),
             charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
+            cursorclass=pymysql.cursors.DictCursor,
+            # Без autocommit соединение из пула держало бы старый снимок данных
+            autocommit=True
         )
 
-    def check_and_reconnect(self):
+    def check_and_reconnect(self, pooled: PooledConnection) -> PooledConnection:
+        # Недавно использованное соединение считаем живым без обращения к серверу
+        if time.monotonic() - pooled.last_used < self.ping_interval:
+            return pooled
+        self.count("pings")
         try:
-            self.connection.close()
-            self.connection.ping(reconnect=True)
+            pooled.connection.ping(reconnect=False)
+            return pooled
         except OperationalError as e:
-            log.exception(e)
+            log.warning(f"Database connection lost, reconnecting: {e}")
+            self._close(pooled)
+            self.count("reconnects")
+            return PooledConnection(self._create_connection())
+
+    def acquire(self) -> PooledConnection:
+        deadline = time.monotonic() + self.timeout
+        pooled = None
+        with self._condition:
+            while True:
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Резервируем место, само соединение создаем вне блокировки
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(f"No free database connection in {self.timeout} seconds")
+                self._condition.wait(remaining)
+
+        try:
+            if pooled is not None and time.monotonic() - pooled.created_at > self.recycle:
+                self._close(pooled)
+                pooled = None
+            if pooled is None:
+                pooled = PooledConnection(self._create_connection())
+            else:
+                pooled = self.check_and_reconnect(pooled)
+        except Exception:
+            if pooled is not None:
+                self._close(pooled)
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        return pooled
+
+    def release(self, pooled: PooledConnection, discard: bool = False):
+        pooled.last_used = time.monotonic()
+        if discard or not pooled.connection.open:
+            self._close(pooled)
+            with self._condition:
+                self._size -= 1
+                self._counters["discards"] += 1
+                self._condition.notify()
+            return
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def invalidate_idle(self):
+        # После обрыва связи заставляем проверить ping все свободные соединения
+        with self._condition:
+            for pooled in self._idle:
+                pooled.last_used = float("-inf")
+
+    def close_all(self):
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            self._close(pooled)
+
+    @staticmethod
+    def _close(pooled: PooledConnection):
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size,
+                    **self._counters}
+
+
+# Коды ошибок MySQL, при которых соединение потеряно:
+# 2003 - не удалось подключиться, 2006 - сервер ушел (запрос не был отправлен),
+# 2013 - соединение потеряно во время запроса (запрос мог выполниться)
+RECONNECT_ERRORS = (2003, 2006)
+LOST_DURING_QUERY_ERRORS = (2013,)
+
+
+class Database:
+    def __init__(self, pool: ConnectionPool = None):
+        self.pool = pool or ConnectionPool(
+            max_size=int(config["Database"]["pool_size"]),
+            timeout=float(config["Database"]["pool_timeout"]),
+            recycle=float(config["Database"]["pool_recycle"]),
+            ping_interval=float(config["Database"]["ping_interval"])
+        )
+        self.retries = int(config["Database"]["retries"])
+        self.retry_backoff = float(config["Database"]["retry_backoff"])
+
+    @contextmanager
+    def connection(self):
+        pooled = self.pool.acquire()
+        discard = False
+        try:
+            yield pooled.connection
+        except OperationalError:
+            # Соединение могло оборваться посреди запроса, в пул его не возвращаем
+            discard = True
+            raise
+        finally:
+            self.pool.release(pooled, discard=discard)
+
+    def _run(self, action, idempotent: bool):
+        """
+        Выполняет action(connection) на соединении из пула, повторяя попытку
+        с экспоненциальной задержкой, если соединение оказалось потерянным.
+
+        Изменяющие запросы повторяются только если они гарантированно не дошли до сервера.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self.connection() as connection:
+                    return action(connection)
+            except OperationalError as e:
+                code = e.args[0] if e.args else None
+                retryable = code in RECONNECT_ERRORS or (idempotent and code in LOST_DURING_QUERY_ERRORS)
+                if not retryable or attempt >= self.retries:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt
+                attempt += 1
+                self.pool.count("retries")
+                self.pool.invalidate_idle()
+                log.warning(f"Database error {code}, retry {attempt}/{self.retries} in {delay:.2f}s")
+                time.sleep(delay)
 
     def execute_query(self, query, params=None):
-        self.check_and_reconnect()
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)
-            self.connection.commit()
-            return cursor
+        def action(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                connection.commit()
+                return cursor
+        return self._run(action, idempotent=False)
 
     def fetch_one(self, query, params=None):
-        self.check_and_reconnect()
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchone()
+        def action(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchone()
+        return self._run(action, idempotent=True)
 
     def fetch_all(self, query, params=None):
-        self.check_and_reconnect()
-        with self.connection.cursor() as cursor:
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        def action(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+        return self._run(action, idempotent=True)
+
+    def execute_many(self, query, params_list):
+        """
+        Выполняет INSERT ... VALUES для набора строк; pymysql собирает его
+        в многострочные INSERT, то есть один запрос вместо запроса на строку.
+        """
+        def action(connection):
+            with connection.cursor() as cursor:
+                cursor.executemany(query, params_list)
+                connection.commit()
+                return cursor
+        return self._run(action, idempotent=False)
+
+    @contextmanager
+    def transaction(self):
+        """
+        Выдает соединение из пула с открытой транзакцией: commit при успехе, rollback при ошибке.
+        """
+        with self.connection() as connection:
+            connection.begin()
+            try:
+                yield connection
+            except Exception:
+                connection.rollback()
+                raise
+            connection.commit()
+
+    def stream(self, query, params=None, chunk_size: int = 500):
+        """
+        Построчно читает результат небуферизованным курсором и отдает его
+        порциями по chunk_size строк, не загружая всю таблицу в память.
+        Соединение занято, пока генератор не будет исчерпан или закрыт.
+        """
+        with self.connection() as connection:
+            with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    def stats(self) -> dict:
+        return self.pool.stats()
+
+    def close(self):
+        self.pool.close_all()
 
 
 db = Database()
@@ -0,0 +1,216 @@
+import re
+import sqlite3
+import asyncio
+import pytest
+from contextlib import asynccontextmanager, contextmanager
+from pymysql.err import OperationalError
+from src.database.my_async_connector import AsyncDatabase
+from src.utils import write_file_into_server as media_store
+
+"""
+
+Заменитель базы данных внутри процесса: пул с интерфейсом aiomysql поверх sqlite3,
+чтобы проверять асинхронный слой без запущенного MySQL сервера
+
+"""
+
+
+class StandInCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.lastrowid = None
+        self.rowcount = -1
+        self._cursor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def execute(self, query, params=None):
+        if self.connection.pool.fail_next:
+            code = self.connection.pool.fail_next.pop(0)
+            raise OperationalError(code, "Lost connection (stand-in)")
+        query = _to_sqlite(query)
+        self._cursor = self.connection.pool.sqlite.execute(query, params or ())
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+        # Имитируем сетевой запрос, чтобы конкурентные запросы переключали задачи
+        await asyncio.sleep(0)
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class StandInConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    async def commit(self):
+        self.pool.sqlite.commit()
+
+
+class StandInPool:
+    def __init__(self, maxsize=10):
+        self.sqlite = sqlite3.connect(":memory:", check_same_thread=False)
+        self.sqlite.row_factory = lambda cursor, row: {col[0]: row[i] for i, col in enumerate(cursor.description)}
+        self.maxsize = maxsize
+        self.size = 0
+        self.fail_next = []
+        self._semaphore = asyncio.Semaphore(maxsize)
+
+    @property
+    def freesize(self):
+        return self.maxsize - self.size
+
+    @asynccontextmanager
+    async def acquire(self):
+        async with self._semaphore:
+            self.size += 1
+            try:
+                yield StandInConnection(self)
+            finally:
+                self.size -= 1
+
+    def close(self):
+        self.sqlite.close()
+
+    async def wait_closed(self):
+        pass
+
+
+def _to_sqlite(query: str) -> str:
+    # Плейсхолдеры pymysql (%s) -> sqlite3 (?); в sqlite сравнение строк и так точное,
+    # поэтому BINARY убирается, транзакция блокирует всю базу, поэтому FOR UPDATE тоже,
+    # а INSERT IGNORE записывается как INSERT OR IGNORE
+    query = query.replace("BINARY ", "").replace(" FOR UPDATE", "").replace("INSERT IGNORE", "INSERT OR IGNORE")
+    return re.sub(r"%s", "?", query)
+
+
+class StandInSyncCursor:
+    def __init__(self, sqlite):
+        self.sqlite = sqlite
+        self.lastrowid = None
+        self.rowcount = -1
+        self._cursor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        self._cursor = self.sqlite.execute(_to_sqlite(query), params or ())
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+
+    def executemany(self, query, params_list):
+        self._cursor = self.sqlite.executemany(_to_sqlite(query), params_list)
+        self.rowcount = self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class StandInSyncConnection:
+    def __init__(self, sqlite):
+        self.sqlite = sqlite
+
+    def cursor(self):
+        return StandInSyncCursor(self.sqlite)
+
+
+class StandInSyncDatabase:
+    """
+    Заменитель синхронного db (my_connector.Database) поверх sqlite3
+    """
+
+    def __init__(self):
+        self.sqlite = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+        self.sqlite.row_factory = lambda cursor, row: {col[0]: row[i] for i, col in enumerate(cursor.description)}
+        self.queries = []
+
+    def _execute(self, query, params=None) -> StandInSyncCursor:
+        self.queries.append(query)
+        cursor = StandInSyncCursor(self.sqlite)
+        cursor.execute(query, params)
+        return cursor
+
+    def execute_query(self, query, params=None):
+        return self._execute(query, params)
+
+    def fetch_one(self, query, params=None):
+        return self._execute(query, params).fetchone()
+
+    def fetch_all(self, query, params=None):
+        return self._execute(query, params).fetchall()
+
+    @contextmanager
+    def transaction(self):
+        self.sqlite.execute("BEGIN")
+        try:
+            yield StandInSyncConnection(self.sqlite)
+        except Exception:
+            self.sqlite.execute("ROLLBACK")
+            raise
+        self.sqlite.execute("COMMIT")
+
+
+class MemoryMediaRepository:
+    """
+    Заменитель media_repository: строки media_objects в словаре
+    """
+
+    def __init__(self):
+        self.rows = {}
+
+    def acquire_media_object(self, name_object, sha256, filename, size):
+        row = self.rows.setdefault((name_object, sha256), {"filename": filename, "size": size, "refcount": 0})
+        row["refcount"] += 1
+        return row["filename"], row["refcount"]
+
+    def release_media_object(self, name_object, filename, remove):
+        for key, row in self.rows.items():
+            if key[0] == name_object and row["filename"] == filename:
+                row["refcount"] -= 1
+                if row["refcount"] == 0:
+                    del self.rows[key]
+                    remove()
+                return row["refcount"]
+        return None
+
+
+@pytest.fixture
+def memory_media_repository(monkeypatch, tmp_path):
+    repository = MemoryMediaRepository()
+    monkeypatch.setenv("UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(media_store, "media_repository", repository)
+    return repository
+
+
+@pytest.fixture
+def stand_in_sync_db():
+    database = StandInSyncDatabase()
+    yield database
+    database.sqlite.close()
+
+
+@pytest.fixture
+def stand_in_db():
+    database = AsyncDatabase(pool=StandInPool())
+    database.retry_backoff = 0
+    database.pool.sqlite.execute(
+        "CREATE TABLE categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR(255) NOT NULL)")
+    yield database
+    database.pool.close()
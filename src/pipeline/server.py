@@ -1,19 +1,48 @@
 import os
-from fastapi import FastAPI, HTTPException, Depends, Request, File, UploadFile, status, Form
-from typing import Dict
+import io
+import json
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import (FastAPI, HTTPException, Depends, Request, File, UploadFile, status, Form, Response, Query, Security,
+                     Header)
+from typing import Dict, Optional
 from fastapi.openapi.models import Tag as OpenApiTag
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pymysql.err import IntegrityError
 from src.utils.custom_logging import setup_logging
 from env import Env
-from src import path_to_project
-from src.database.models import Category, Tag, Video, VideoInference, Inference, Users, APIKey, Predict
+from src import path_to_project, path_to_config
+from src.utils.config_parser import ConfigParser
+from src.database.models import (Category, Tag, Video, VideoInference, Inference, InferenceLinks, Users, APIKey, Predict,
+                                 PredictBatchResult, PredictJob, APIKeyData, UploadInit, UploadSession)
+from src.database.my_connector import db
+from src.database.my_async_connector import async_db
+from src.utils.pagination import fetch_page, stream_ndjson, PAGE_SIZE, MAX_PAGE_SIZE, LIST_QUERIES
+from src.utils.job_queue import JobQueue, QueueFullError
+from src.utils.prediction_cache import PredictionCache, normalize_url
+from src.utils.single_flight import SingleFlight
+from src.utils.admission import AdmissionController
+from src.utils.api_key_cache import APIKeyValidator, api_key_header
+from src.utils.usage_meter import UsageMeter
+from src.utils.rate_limiter import (RateLimiter, RateLimitMiddleware, BucketLimit, MemoryBucketStore,
+                                    SQLiteBucketStore)
+from src.utils.hashing import hashing_pool
+from src.utils import exam_services
+from src.repository import inference_links_repository
+from src.utils.video_index import VideoIndex
+from src.utils.taxonomy_cache import TaxonomyCache
+from src.utils.object_store import object_store
 from src.services import (category_services, tag_services, video_services,
                           video_inference_services, inference_services, main_services,
-                          user_services, api_key_services, authenticate_services)
+                          user_services, api_key_services, authenticate_services, taxonomy_services, predict_batch_services,
+                          upload_services)
 
 env = Env()
 log = setup_logging()
+config = ConfigParser.parse(path_to_config())
 
 
 app_server = FastAPI(title="API - server")
@@ -21,9 +50,114 @@ app_public = FastAPI(title="API - public")
 
 app = FastAPI()
 
+# У модели нет пакетного предсказания: main_services.predict обрабатывает одну ссылку, поэтому
+# предсказания выполняются по одному в своем пуле потоков. Пул размером с Admission.max_concurrency:
+# контроль допуска пропускает не больше предсказаний, чем в пуле потоков
+predict_executor = ThreadPoolExecutor(max_workers=int(config["Admission"]["max_concurrency"]),
+                                      thread_name_prefix="predict")
+
+# Повторные предсказания одного видео отдаются из кеша без запуска модели
+prediction_cache = PredictionCache(model_version=str(config["TrainParamMain"]["name_model"]),
+                                   max_size=int(config["PredictCache"]["max_size"]),
+                                   ttl=float(config["PredictCache"]["ttl"]),
+                                   use_persisted=bool(config["PredictCache"]["use_persisted"]),
+                                   persisted_ttl=float(config["PredictCache"]["persisted_ttl"]))
+
+
+# Одновременные предсказания одного видео выполняются один раз
+predict_flight = SingleFlight()
+
+
+# При перегрузке новые предсказания сразу получают 503, вызовы сервера обслуживаются первыми
+predict_admission = AdmissionController(max_concurrency=int(config["Admission"]["max_concurrency"]),
+                                        max_queue=int(config["Admission"]["max_queue"]),
+                                        max_wait=float(config["Admission"]["max_wait"]),
+                                        public_share=float(config["Admission"]["public_share"]))
+
+
+async def predict_in_pool(predict: Predict):
+    return await asyncio.get_running_loop().run_in_executor(predict_executor, main_services.predict, predict)
+
+
+async def run_predict(predict: Predict, priority: str = "server"):
+    # Попадания в кеш и присоединение к идущему предсказанию не занимают место в очереди
+    return await prediction_cache.get_or_compute(
+        predict.Url,
+        lambda: predict_flight.do(normalize_url(predict.Url),
+                                  lambda: predict_admission.run(priority, partial(predict_in_pool, predict))))
+
+
+async def save_prediction(predict: Predict, result):
+    # /predict/ сохраняет результат для видео с той же ссылкой так же, как /predict_batch/
+    saved = PredictBatchResult(url=predict.Url, result=result)
+    await run_in_threadpool(predict_batch_services.save_results, [saved])
+    if saved.InferenceID:
+        await video_index.refresh_inferences([saved.InferenceID])
+
+
+# Фоновые задачи предсказания для долгих запросов (скачивание видео, кадры, аудио);
+# при перегрузке они уступают интерактивным запросам и повторяются позже
+predict_jobs = JobQueue(partial(run_predict, priority="public"),
+                        workers=int(config["PredictJobs"]["workers"]),
+                        max_retries=int(config["PredictJobs"]["max_retries"]),
+                        retry_backoff=float(config["PredictJobs"]["retry_backoff"]),
+                        max_queued=int(config["PredictJobs"]["max_queued"]),
+                        keep_finished=float(config["PredictJobs"]["keep_finished"]))
+
+# Обратный индекс категорий, подкатегорий и тегов для поиска видео
+video_index = VideoIndex(refresh_interval=float(config["VideoIndex"]["refresh_interval"]))
+
+# Брошенные загрузки частями удаляются вместе с их файлами
+upload_expiry = upload_services.UploadExpiry(interval=float(config["Upload"]["expire_interval"]))
+
+# Снимок категорий, подкатегорий и тегов в памяти для чтения без запросов к базе
+taxonomy_cache = TaxonomyCache(refresh_interval=float(config["Taxonomy"]["snapshot_refresh_interval"]))
+
+# Проверенные API ключи кешируются, чтобы не расшифровывать и не искать ключ на каждый запрос
+api_key_validator = APIKeyValidator(authenticate_services.validate_api_key,
+                                    max_size=int(config["APIKeyCache"]["max_size"]),
+                                    ttl=float(config["APIKeyCache"]["ttl"]),
+                                    negative_ttl=float(config["APIKeyCache"]["negative_ttl"]))
+
+# Использование API ключей считается в памяти и периодически записывается в базу
+usage_meter = UsageMeter(flush_interval=float(config["UsageMeter"]["flush_interval"]))
+
+
+async def metered_api_key(api_key: str = Security(api_key_header),
+                          api_key_data: APIKeyData = Depends(api_key_validator)) -> APIKeyData:
+    # Единица квоты резервируется до работы, маршрут возвращает ее, если запрос не выполнен
+    await usage_meter.reserve(api_key, api_key_data.usage_limit)
+    return api_key_data
+
+# Уникальные ключи проверяются и базой: дубликат, записанный между проверкой и INSERT, - это 409
+for application in (app, app_server, app_public):
+    application.add_exception_handler(IntegrityError, exam_services.duplicate_entry_handler)
+
 app.mount("/server", app_server)
 app.mount("/public", app_public)
 
+async def rate_limit_identity(headers: Dict[bytes, bytes]) -> Optional[str]:
+    # Своя корзина только у действительного API ключа (проверка идет через кеш ключей)
+    api_key = headers.get(b"x-api-key")
+    if api_key is None:
+        return None
+    try:
+        await api_key_validator(api_key.decode("latin-1"))
+    except HTTPException:
+        return None
+    return "key:" + api_key.decode("latin-1")
+
+
+# Корзины токенов по IP и проверенному API ключу; CORS добавляется после, чтобы быть внешним
+rate_limiter = RateLimiter(
+    store=(SQLiteBucketStore(os.path.join(path_to_project(), config["RateLimiter"]["sqlite_path"]))
+           if config["RateLimiter"]["store"] == "sqlite"
+           else MemoryBucketStore(max_size=int(config["RateLimiter"]["max_buckets"]))),
+    routes={path: BucketLimit(**limit) for path, limit in config["RateLimiter"]["routes"].items()},
+    default=BucketLimit(**config["RateLimiter"]["default"]) if config["RateLimiter"]["default"] else None,
+    identify=rate_limit_identity)
+app.add_middleware(RateLimitMiddleware, limiter=rate_limiter)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -43,6 +177,8 @@ ServerTagTag = OpenApiTag(name="Tag", description="CRUD operations tag")
 ServerVideoTag = OpenApiTag(name="Video", description="CRUD operations video")
 ServerVideoInferenceTag = OpenApiTag(name="VideoInference", description="CRUD operations video inference")
 ServerInferenceTag = OpenApiTag(name="Inference", description="CRUD operations inference")
+ServerTaxonomyTag = OpenApiTag(name="Taxonomy", description="Bulk import/export of categories, subcategories and tags")
+ServerUploadTag = OpenApiTag(name="Upload", description="Resumable chunked upload of large videos")
 
 # Настройка документации с тегами
 app_server.openapi_tags = [
@@ -53,7 +189,9 @@ app_server.openapi_tags = [
     ServerTagTag.model_dump(),
     ServerVideoTag.model_dump(),
     ServerVideoInferenceTag.model_dump(),
-    ServerInferenceTag.model_dump()
+    ServerInferenceTag.model_dump(),
+    ServerTaxonomyTag.model_dump(),
+    ServerUploadTag.model_dump()
 ]
 
 app_public.openapi_tags = [
@@ -61,6 +199,35 @@ app_public.openapi_tags = [
 ]
 
 
+@app.on_event("startup")
+async def startup():
+    # Открываем асинхронный пул заранее, чтобы первый запрос не ждал подключения
+    await async_db.connect()
+    await predict_jobs.start()
+    await usage_meter.start()
+    await video_index.start()
+    await taxonomy_cache.start()
+    await upload_expiry.start()
+    # Общий S3 клиент с пулом соединений на весь срок работы сервера
+    if object_store is not None:
+        await object_store.open()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await predict_jobs.stop()
+    await usage_meter.stop()
+    await taxonomy_cache.stop()
+    await video_index.stop()
+    await upload_expiry.stop()
+    predict_executor.shutdown(wait=False)
+    if object_store is not None:
+        await object_store.close()
+    # Закрываем свободные соединения пулов базы данных
+    db.close()
+    await async_db.close()
+
+
 
 @app_public.post("/signup/", response_model=Users, tags=["Main"])
 async def signup(email: str = Form(...), password: str = Form(...)):
@@ -68,7 +235,8 @@ async def signup(email: str = Form(...), password: str = Form(...)):
     Регистрация нового пользователя.
     """
     try:
-        user = authenticate_services.register_user(email, password)
+        # Сервис работает в общем пуле потоков, а сам bcrypt - в отдельном пуле hashing_pool
+        user = await run_in_threadpool(authenticate_services.register_user, email, password)
         return user_services.create_user(user)
     except HTTPException as ex:
         log.exception("Error during registration", exc_info=ex)
@@ -81,7 +249,7 @@ async def signin(email: str = Form(...), password: str = Form(...)):
     Авторизация пользователя.
     """
     try:
-        user = authenticate_services.auth_user(email, password)
+        user = await run_in_threadpool(authenticate_services.auth_user, email, password)
         return user_services.create_user(user)
     except HTTPException as ex:
         log.exception("Error during registration", exc_info=ex)
@@ -96,7 +264,10 @@ async def get_api_key(user: Users = Depends(authenticate_services.get_current_us
     """
     try:
         key = authenticate_services.get_current_api_key(user.ID, 10, key_name)
-        return api_key_services.create_api_key(key)
+        created = api_key_services.create_api_key(key)
+        # Ключ мог попасть в кеш как недействительный до создания
+        api_key_validator.invalidate(key.Key)
+        return created
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -104,47 +275,342 @@ async def get_api_key(user: Users = Depends(authenticate_services.get_current_us
 
 @app_public.post("/predict/", response_model=None, tags=["Main"])
 async def predict(predict: Predict,
-                  api_key: str = authenticate_services.validate_api_key):
+                  api_key: str = Security(api_key_header),
+                  api_key_data: APIKeyData = Depends(metered_api_key)):
     """
-    Route for predict tags and category.
+    Route for predict tags and category, the result is saved for the video with the same url.
+    Usage is charged only for predictions that were admitted and served.
 
     :param predict: Model predict tags and category. [Predict]
 
     :return: response model dict.
     """
     try:
-        return None
-        # return main_services.predict(predict)
+        try:
+            result = await run_predict(predict, priority="public")
+        except BaseException:
+            usage_meter.refund(api_key)
+            raise
+        await save_prediction(predict, result)
+        return result
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_public.post("/predict_batch/", response_model=list[PredictBatchResult], tags=["Main"])
+async def predict_batch(predicts: list[Predict],
+                        api_key: str = Security(api_key_header),
+                        api_key_data: APIKeyData = Depends(api_key_validator)):
+    """
+    Route for predict tags and category for many videos at once.
+
+    :param predicts: List of model predict. [List[Predict]]
+
+    :return: response model List[PredictBatchResult], failed items carry error.
+    """
+    try:
+        # Каждая ссылка пакета учитывается как отдельный запрос: до работы проверяется
+        # размер пакета и резервируется квота на весь пакет, а за неудавшиеся предсказания она возвращается
+        predict_batch_services.check_batch_size(predicts)
+        await usage_meter.reserve(api_key, api_key_data.usage_limit, len(predicts))
+        predicted = 0
+        try:
+            results = await predict_batch_services.predict_batch(predicts, partial(run_predict, priority="public"))
+            predicted = sum(1 for result in results if result.Error is None)
+        finally:
+            usage_meter.refund(api_key, len(predicts) - predicted)
+        await video_index.refresh_inferences(result.InferenceID for result in results if result.InferenceID)
+        return results
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
+@app_public.post("/predict_jobs/", response_model=PredictJob, tags=["Main"])
+async def submit_predict_job(predict: Predict,
+                             api_key: str = Security(api_key_header),
+                             api_key_data: APIKeyData = Depends(metered_api_key)):
+    """
+    Route for submit background predict job, returns job id immediately.
+    The job is visible only with the same API key.
+
+    :param predict: Model predict tags and category. [Predict]
+
+    :return: response model PredictJob.
+    """
+    try:
+        job = predict_jobs.submit(predict, owner=api_key)
+    except QueueFullError as ex:
+        log.exception(f"Error", exc_info=ex)
+        # Задача не принята в очередь - квота возвращается
+        usage_meter.refund(api_key)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(ex))
+    return PredictJob(url=predict.Url, **job.dump())
+
+
+@app_public.get("/predict_jobs/{job_id}", response_model=PredictJob, tags=["Main"])
+async def get_predict_job(job_id: str,
+                          api_key: str = Security(api_key_header),
+                          api_key_data: APIKeyData = Depends(api_key_validator)):
+    """
+    Route for get status and result of predict job submitted with the same API key.
+
+    :param job_id: ID by job. [str]
+
+    :return: response model PredictJob.
+    """
+    job = predict_jobs.get(job_id, owner=api_key)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return PredictJob(url=job.payload.Url, **job.dump())
+
+
+@app_public.delete("/predict_jobs/{job_id}", response_model=PredictJob, tags=["Main"])
+async def cancel_predict_job(job_id: str,
+                             api_key: str = Security(api_key_header),
+                             api_key_data: APIKeyData = Depends(api_key_validator)):
+    """
+    Route for cancel queued or running predict job submitted with the same API key.
+
+    :param job_id: ID by job. [str]
+
+    :return: response model PredictJob.
+    """
+    job = predict_jobs.cancel(job_id, owner=api_key)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return PredictJob(url=job.payload.Url, **job.dump())
+
+
 @app_server.post("/predict/", response_model=list, tags=["Main"])
 async def predict(predict: Predict):
     """
-    Route for predict tags and category.
+    Route for predict tags and category, the result is saved for the video with the same url.
 
     :param predict: Model predict tags and category. [Predict]
 
     :return: response model dict.
     """
     try:
-        return main_services.predict(predict)
+        result = await run_predict(predict)
+        await save_prediction(predict, result)
+        return result
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.post("/predict_batch/", response_model=list[PredictBatchResult], tags=["Main"])
+async def predict_batch(predicts: list[Predict]):
+    """
+    Route for predict tags and category for many videos at once.
+
+    :param predicts: List of model predict. [List[Predict]]
+
+    :return: response model List[PredictBatchResult], failed items carry error.
+    """
+    try:
+        results = await predict_batch_services.predict_batch(predicts, run_predict)
+        await video_index.refresh_inferences(result.InferenceID for result in results if result.InferenceID)
+        return results
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.post("/predict_jobs/", response_model=PredictJob, tags=["Main"])
+async def submit_predict_job(predict: Predict):
+    """
+    Route for submit background predict job, returns job id immediately.
+
+    :param predict: Model predict tags and category. [Predict]
+
+    :return: response model PredictJob.
+    """
+    try:
+        job = predict_jobs.submit(predict)
+    except QueueFullError as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(ex))
+    return PredictJob(url=predict.Url, **job.dump())
+
+
+@app_server.get("/predict_jobs/{job_id}", response_model=PredictJob, tags=["Main"])
+async def get_predict_job(job_id: str):
+    """
+    Route for get status and result of predict job.
+
+    :param job_id: ID by job. [str]
+
+    :return: response model PredictJob.
+    """
+    job = predict_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return PredictJob(url=job.payload.Url, **job.dump())
+
+
+@app_server.delete("/predict_jobs/{job_id}", response_model=PredictJob, tags=["Main"])
+async def cancel_predict_job(job_id: str):
+    """
+    Route for cancel queued or running predict job.
+
+    :param job_id: ID by job. [str]
+
+    :return: response model PredictJob.
+    """
+    job = predict_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return PredictJob(url=job.payload.Url, **job.dump())
+
+
+@app_server.post("/uploads/", response_model=UploadSession, tags=["Upload"])
+async def create_upload(upload: UploadInit):
+    """
+    Route for start resumable chunked upload of large video.
+
+    :param upload: Model of upload start: filename, size, chunk size and sha256. [UploadInit]
+
+    :return: response model UploadSession.
+    """
+    try:
+        return await upload_services.create_upload(upload)
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.put("/uploads/{upload_id}/chunks/{index}", response_model=UploadSession, tags=["Upload"])
+async def put_upload_chunk(upload_id: str, index: int, request: Request, offset: int = Query(..., ge=0),
+                           chunk_sha256: Optional[str] = Header(None, pattern="^[0-9a-fA-F]{64}$")):
+    """
+    Route for put chunk of upload, the request body is raw bytes of chunk. Chunk can be sent again.
+
+    :param upload_id: ID by upload. [str]
+
+    :param index: Number of chunk from 0. [int]
+
+    :param offset: Offset of chunk in file, must be index * chunk_size. [int]
+
+    :param chunk_sha256: Header Chunk-SHA256 with sha256 of chunk. [str]
+
+    :return: response model UploadSession.
+    """
+    try:
+        return await upload_services.write_chunk(upload_id, index, offset, request.stream(), chunk_sha256)
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.get("/uploads/{upload_id}", response_model=UploadSession, tags=["Upload"])
+async def get_upload(upload_id: str):
+    """
+    Route for get upload state with missing chunks to resume it.
+
+    :param upload_id: ID by upload. [str]
+
+    :return: response model UploadSession.
+    """
+    try:
+        return await upload_services.get_upload(upload_id)
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.post("/uploads/{upload_id}/complete/", response_model=UploadSession, tags=["Upload"])
+async def complete_upload(upload_id: str):
+    """
+    Route for complete upload when all chunks are received.
+
+    :param upload_id: ID by upload. [str]
+
+    :return: response model UploadSession.
+    """
+    try:
+        return await upload_services.complete_upload(upload_id)
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.delete("/uploads/{upload_id}", response_model=Dict, tags=["Upload"])
+async def abort_upload(upload_id: str):
+    """
+    Route for abort upload and delete its received chunks, for completed upload - release its stored file.
+
+    :param upload_id: ID by upload. [str]
+
+    :return: response model dict.
+    """
+    try:
+        await upload_services.abort_upload(upload_id)
+        return {"message": "Upload aborted"}
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
+@app_server.delete("/predict/cache/", response_model=Dict, tags=["Main"])
+async def invalidate_prediction_cache(url: Optional[str] = None, persisted: bool = False):
+    """
+    Route for invalidate cached predictions, for example after model update.
+
+    :param url: Url of video, whole cache is invalidated if not set. [str]
+
+    :param persisted: Also delete predictions of the current model persisted in basedata. [bool]
+
+    :return: response model dict.
+    """
+    await prediction_cache.invalidate(url, persisted)
+    return {"message": "Prediction cache invalidated"}
+
+
+@app_server.get("/metrics/", response_model=Dict, tags=["Main"])
+async def get_metrics():
+    """
+    Route for get server metrics: database pools, object store, admission, jobs and cache.
+
+    :return: response model dict.
+    """
+    return {"database": db.stats(),
+            "async_database": async_db.stats(),
+            "predict_jobs": predict_jobs.stats(),
+            "prediction_cache": prediction_cache.stats(),
+            "predict_single_flight": predict_flight.stats(),
+            "predict_admission": predict_admission.stats(),
+            "api_key_cache": api_key_validator.stats(),
+            "hashing": hashing_pool.stats(),
+            "usage_meter": usage_meter.stats(),
+            "rate_limiter": rate_limiter.stats(),
+            "video_index": video_index.stats(),
+            "taxonomy_cache": taxonomy_cache.stats(),
+            "object_store": object_store.stats() if object_store is not None else {"enabled": False}}
+
+
 @app_server.get("/api_keys/", response_model=list[APIKey], tags=["APIKey"])
-async def get_all_api_keys():
+async def get_all_api_keys(response: Response,
+                           after_id: int = Query(0, ge=0),
+                           limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                           stream: bool = False):
     """
-    Route for get all api keys from basedata.
+    Route for get api keys from basedata page by page.
+
+    :param after_id: Cursor - id of the last row of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :param stream: Return the whole table as NDJSON stream instead of a page. [bool]
 
     :return: response model List[APIKey].
     """
     try:
-        return api_key_services.get_all_api_keys()
+        if stream:
+            return stream_ndjson("api_keys", APIKey)
+        return await fetch_page(response, "api_keys", after_id, limit)
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -192,7 +658,9 @@ async def create_api_key(api_key: APIKey = Depends(authenticate_services.get_cur
     :return: response model APIKey.
     """
     try:
-        return api_key_services.create_api_key(api_key)
+        created = api_key_services.create_api_key(api_key)
+        api_key_validator.invalidate(api_key.Key)
+        return created
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -210,7 +678,10 @@ async def update_api_key(api_key_id: int, api_key: APIKey = Depends(authenticate
     :return: response model dict.
     """
     try:
-        return api_key_services.update_api_key(api_key_id, api_key)
+        old_key = await api_key_validator.key_by_id(api_key_id)
+        updated = api_key_services.update_api_key(api_key_id, api_key)
+        api_key_validator.invalidate(old_key, api_key.Key)
+        return updated
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -226,21 +697,35 @@ async def delete_api_key(api_key_id: int):
     :return: response model dict.
     """
     try:
-        return api_key_services.delete_api_key(api_key_id)
+        old_key = await api_key_validator.key_by_id(api_key_id)
+        deleted = api_key_services.delete_api_key(api_key_id)
+        api_key_validator.invalidate(old_key)
+        return deleted
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
 @app_server.get("/users/", response_model=list[Users], tags=["User"])
-async def get_all_users():
+async def get_all_users(response: Response,
+                        after_id: int = Query(0, ge=0),
+                        limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        stream: bool = False):
     """
-    Route for get all users from basedata.
+    Route for get users from basedata page by page.
+
+    :param after_id: Cursor - id of the last row of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :param stream: Return the whole table as NDJSON stream instead of a page. [bool]
 
     :return: response model List[Users].
     """
     try:
-        return user_services.get_all_users()
+        if stream:
+            return stream_ndjson("users", Users)
+        return await fetch_page(response, "users", after_id, limit)
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -322,21 +807,42 @@ async def delete_user(user_id):
     :return: response model dict.
     """
     try:
-        return user_services.delete_user(user_id)
+        api_keys = await api_key_validator.keys_by_user(user_id)
+        deleted = user_services.delete_user(user_id)
+        # Ключи удаленного пользователя не должны оставаться действительными в кеше
+        api_key_validator.invalidate(*api_keys)
+        return deleted
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
 @app_server.get("/categories/", response_model=list[Category], tags=["Category"])
-async def get_all_categories():
+async def get_all_categories(response: Response,
+                             after_id: int = Query(0, ge=0),
+                             limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                             stream: bool = False):
     """
-    Route for get all categories from basedata.
+    Route for get categories from basedata page by page.
+
+    :param after_id: Cursor - id of the last row of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :param stream: Return the whole table as NDJSON stream instead of a page. [bool]
 
     :return: response model List[Categories].
     """
     try:
-        return category_services.get_all_categories()
+        snapshot = await taxonomy_cache.get()
+        if stream:
+            return StreamingResponse((json.dumps(dict(row), ensure_ascii=False) + "\n"
+                                      for row in snapshot.page("categories", 0, len(snapshot.category_ids))),
+                                     media_type="application/x-ndjson")
+        rows = snapshot.page("categories", after_id, limit)
+        if len(rows) == limit:
+            response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+        return rows
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -352,7 +858,10 @@ async def get_category_by_id(category_id: int):
     :return: response model Categories.
     """
     try:
-        return category_services.get_category_by_id(category_id)
+        row = (await taxonomy_cache.get()).categories.get(category_id)
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+        return row
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -368,7 +877,10 @@ async def get_category_by_name(category_name: str):
     :return: response model Categories.
     """
     try:
-        return category_services.get_category_by_name(category_name)
+        row = (await taxonomy_cache.get()).category_named(category_name)
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+        return row
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -384,7 +896,9 @@ async def create_category(category: Category):
     :return: response model Categories.
     """
     try:
-        return category_services.create_category(category)
+        created = category_services.create_category(category)
+        await taxonomy_cache.bump()
+        return created
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -402,7 +916,9 @@ async def update_category(category_id, category: Category):
     :return: response model dict.
     """
     try:
-        return category_services.update_category(category_id, category)
+        updated = category_services.update_category(category_id, category)
+        await taxonomy_cache.bump()
+        return updated
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -418,21 +934,97 @@ async def delete_category(category_id):
     :return: response model dict.
     """
     try:
-        return category_services.delete_category(category_id)
+        deleted = category_services.delete_category(category_id)
+        await taxonomy_cache.bump()
+        return deleted
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.post("/taxonomy/import/", response_model=Dict, tags=["Taxonomy"])
+async def import_taxonomy(file: UploadFile = File(...),
+                          format: Optional[str] = Query(None, pattern="^(csv|jsonl)$")):
+    """
+    Route for bulk import of categories, subcategories and tags from CSV (category,subcategory,tag) or JSONL.
+
+    :param file: CSV or JSONL file in UTF-8. [UploadFile]
+
+    :param format: csv or jsonl, by default it is taken from the file extension. [str]
+
+    :return: response model dict with numbers of read rows, duplicates and written entities
+    and rows whose tag is already imported under another subcategory.
+    """
+    try:
+        stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+        try:
+            imported = await run_in_threadpool(taxonomy_services.import_taxonomy, stream,
+                                               format or taxonomy_services.format_from_name(file.filename))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        finally:
+            # Часть порций могла быть записана и до ошибки
+            await taxonomy_cache.bump()
+        return imported
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
+@app_server.get("/taxonomy/tree/", response_model=list[Dict], tags=["Taxonomy"])
+async def get_taxonomy_tree():
+    """
+    Route for get the tree of categories, their subcategories and tags from the in-memory snapshot.
+
+    :return: response model List[dict] of categories with nested subcategories and tags.
+    """
+    try:
+        return (await taxonomy_cache.get()).tree()
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.get("/taxonomy/export/", tags=["Taxonomy"])
+async def export_taxonomy(format: str = Query("csv", pattern="^(csv|jsonl)$")):
+    """
+    Route for export of all categories, subcategories and tags as a CSV or JSONL stream.
+
+    :param format: csv or jsonl. [str]
+
+    :return: streaming response with one row per tag (or per subcategory/category without children).
+    """
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(taxonomy_services.export_taxonomy(format), media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=taxonomy.{format}"})
+
+
 @app_server.get("/tags/", response_model=list[Tag], tags=["Tag"])
-async def get_all_tags():
+async def get_all_tags(response: Response,
+                       after_id: int = Query(0, ge=0),
+                       limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                       stream: bool = False):
     """
-    Route for get all tags from basedata.
+    Route for get tags from basedata page by page.
+
+    :param after_id: Cursor - id of the last row of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :param stream: Return the whole table as NDJSON stream instead of a page. [bool]
 
     :return: response model List[Tag].
     """
     try:
-        return tag_services.get_all_tags()
+        snapshot = await taxonomy_cache.get()
+        if stream:
+            return StreamingResponse((json.dumps(dict(row), ensure_ascii=False) + "\n"
+                                      for row in snapshot.page("tags", 0, len(snapshot.tag_ids))),
+                                     media_type="application/x-ndjson")
+        rows = snapshot.page("tags", after_id, limit)
+        if len(rows) == limit:
+            response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+        return rows
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -448,7 +1040,10 @@ async def get_tag_by_id(tag_id: int):
     :return: response model Tag.
     """
     try:
-        return tag_services.get_tag_by_id(tag_id)
+        row = (await taxonomy_cache.get()).tags.get(tag_id)
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+        return row
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -464,7 +1059,10 @@ async def get_tag_by_name(tag_name: str):
     :return: response model Tag.
     """
     try:
-        return tag_services.get_tag_by_name(tag_name)
+        row = (await taxonomy_cache.get()).tag_named(tag_name)
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
+        return row
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -480,7 +1078,9 @@ async def create_tag(tag: Tag):
     :return: response model Tag.
     """
     try:
-        return tag_services.create_tag(tag)
+        created = tag_services.create_tag(tag)
+        await taxonomy_cache.bump()
+        return created
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -498,7 +1098,9 @@ async def update_tag(tag_id, tag: Tag):
     :return: response model dict.
     """
     try:
-        return tag_services.update_tag(tag_id, tag)
+        updated = tag_services.update_tag(tag_id, tag)
+        await taxonomy_cache.bump()
+        return updated
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -514,21 +1116,34 @@ async def delete_tag(tag_id):
     :return: response model dict.
     """
     try:
-        return tag_services.delete_tag(tag_id)
+        deleted = tag_services.delete_tag(tag_id)
+        await taxonomy_cache.bump()
+        return deleted
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
 @app_server.get("/inferences/", response_model=list[Inference], tags=["Inference"])
-async def get_all_inferences():
+async def get_all_inferences(response: Response,
+                             after_id: int = Query(0, ge=0),
+                             limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                             stream: bool = False):
     """
-    Route for get all inferences from basedata.
+    Route for get inferences from basedata page by page.
+
+    :param after_id: Cursor - id of the last row of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :param stream: Return the whole table as NDJSON stream instead of a page. [bool]
 
     :return: response model List[Inference].
     """
     try:
-        return inference_services.get_all_inferences()
+        if stream:
+            return stream_ndjson("inferences", Inference)
+        return await fetch_page(response, "inferences", after_id, limit)
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -560,7 +1175,9 @@ async def create_inference(inference: Inference):
     :return: response model Inference.
     """
     try:
-        return inference_services.create_inference(inference)
+        created = inference_services.create_inference(inference)
+        inference_links_repository.sync_inferences([created["id"]])
+        return created
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -578,7 +1195,26 @@ async def update_inference(inference_id, inference: Inference):
     :return: response model dict.
     """
     try:
-        return inference_services.update_inference(inference_id, inference)
+        updated = inference_services.update_inference(inference_id, inference)
+        inference_links_repository.sync_inferences([inference_id])
+        await video_index.refresh_inferences([inference_id])
+        return updated
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.get("/inferences/{inference_id}/links/", response_model=InferenceLinks, tags=["Inference"])
+async def get_inference_links(inference_id: int):
+    """
+    Route for get category, subcategory and tag IDs of inference from link tables.
+
+    :param inference_id: ID by inference. [int]
+
+    :return: response model InferenceLinks.
+    """
+    try:
+        return {"inference_id": inference_id, **await inference_links_repository.get_links(inference_id)}
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -594,21 +1230,70 @@ async def delete_inference(inference_id):
     :return: response model dict.
     """
     try:
-        return inference_services.delete_inference(inference_id)
+        deleted = inference_services.delete_inference(inference_id)
+        await video_index.refresh_inferences([inference_id])
+        return deleted
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
 @app_server.get("/video_inferences/", response_model=list[VideoInference], tags=["VideoInference"])
-async def get_all_video_inferences():
+async def get_all_video_inferences(response: Response,
+                                   after_id: int = Query(0, ge=0),
+                                   limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                                   stream: bool = False):
     """
-    Route for get all video inferences from basedata.
+    Route for get video inferences from basedata page by page.
+
+    :param after_id: Cursor - id of the last row of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :param stream: Return the whole table as NDJSON stream instead of a page. [bool]
 
     :return: response model List[VideoInference].
     """
     try:
-        return video_inference_services.get_all_video_inferences()
+        if stream:
+            return stream_ndjson("video_inferences", VideoInference)
+        return await fetch_page(response, "video_inferences", after_id, limit)
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.get("/video_inferences/lookup/", response_model=list[VideoInference], tags=["VideoInference"])
+async def lookup_video_inferences(response: Response,
+                                  category_id: Optional[int] = None,
+                                  subcategory_id: Optional[int] = None,
+                                  tag_id: Optional[int] = None,
+                                  after_id: int = Query(0, ge=0),
+                                  limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Route for get videos whose inference has the category, subcategory or tag, page by page.
+
+    :param category_id: ID by category. [int]
+
+    :param subcategory_id: ID by subcategory. [int]
+
+    :param tag_id: ID by tag, exactly one of category_id, subcategory_id, tag_id is required. [int]
+
+    :param after_id: Cursor - id of the last video of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :return: response model List[VideoInference].
+    """
+    try:
+        try:
+            column, value = inference_links_repository.lookup_filter(category_id, subcategory_id, tag_id)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        rows = await inference_links_repository.find_video_inferences(column, value, after_id, limit)
+        if len(rows) == limit:
+            response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+        return rows
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -640,7 +1325,9 @@ async def create_video_inference(video_inference: VideoInference):
     :return: response model VideoInference.
     """
     try:
-        return video_inference_services.create_video_inference(video_inference)
+        created = video_inference_services.create_video_inference(video_inference)
+        await video_index.refresh_videos([video_inference.VideoID])
+        return created
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -658,7 +1345,9 @@ async def update_video_inference(video_inference_id, video_inference: VideoInfer
     :return: response model dict.
     """
     try:
-        return video_inference_services.update_video_inference(video_inference_id, video_inference)
+        updated = video_inference_services.update_video_inference(video_inference_id, video_inference)
+        await video_index.refresh_videos([video_inference_id, video_inference.VideoID])
+        return updated
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -674,21 +1363,99 @@ async def delete_video_inference(video_inference_id):
     :return: response model dict.
     """
     try:
-        return video_inference_services.delete_video_inference(video_inference_id)
+        deleted = video_inference_services.delete_video_inference(video_inference_id)
+        await video_index.refresh_videos([video_inference_id])
+        return deleted
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
 
 
 @app_server.get("/videos/", response_model=list[Video], tags=["Video"])
-async def get_all_videos():
+async def get_all_videos(response: Response,
+                         after_id: int = Query(0, ge=0),
+                         limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                         stream: bool = False):
+    """
+    Route for get videos from basedata page by page.
+
+    :param after_id: Cursor - id of the last row of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size. [int]
+
+    :param stream: Return the whole table as NDJSON stream instead of a page. [bool]
+
+    :return: response model List[Video].
     """
-    Route for get all videos from basedata.
+    try:
+        if stream:
+            return stream_ndjson("videos", Video)
+        return await fetch_page(response, "videos", after_id, limit)
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.get("/videos/search/", response_model=list[Video], tags=["Video"])
+async def search_videos(response: Response,
+                        category_id: list[int] = Query([]),
+                        subcategory_id: list[int] = Query([]),
+                        tag_id: list[int] = Query([]),
+                        mode: str = Query("and", pattern="^(and|or)$"),
+                        after_id: int = Query(0, ge=0),
+                        limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    """
+    Route for search videos by categories, subcategories and tags of their inference, page by page.
+
+    :param category_id: IDs by category, can be repeated. [List[int]]
+
+    :param subcategory_id: IDs by subcategory, can be repeated. [List[int]]
+
+    :param tag_id: IDs by tag, can be repeated. [List[int]]
+
+    :param mode: and - video has all given IDs, or - video has any of them. [str]
+
+    :param after_id: Cursor - id of the last video of the previous page, next cursor is in X-Next-Cursor header. [int]
+
+    :param limit: Page size, estimated number of found videos (exact if the first page holds them all)
+    is in X-Total-Count header. [int]
 
     :return: response model List[Video].
     """
     try:
-        return video_services.get_all_videos()
+        terms = ([("category", value) for value in category_id] +
+                 [("subcategory", value) for value in subcategory_id] +
+                 [("tag", value) for value in tag_id])
+        if not terms:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="At least one of category_id, subcategory_id, tag_id is required")
+        video_ids, total = video_index.search(terms, mode, after_id, limit)
+        response.headers["X-Total-Count"] = str(total)
+        if not video_ids:
+            return []
+        if len(video_ids) == limit:
+            response.headers["X-Next-Cursor"] = str(video_ids[-1])
+        placeholders = ", ".join(["%s"] * len(video_ids))
+        return await async_db.fetch_all(f"{LIST_QUERIES['videos'].select} WHERE id IN ({placeholders}) ORDER BY id",
+                                        video_ids)
+    except HTTPException as ex:
+        log.exception(f"Error", exc_info=ex)
+        raise ex
+
+
+@app_server.post("/videos/search/counts/", response_model=Dict, tags=["Video"])
+async def count_video_terms(video_ids: list[int], top: int = Query(10, ge=1, le=1000)):
+    """
+    Route for get the most frequent categories, subcategories and tags of a set of videos.
+
+    :param video_ids: IDs by video. [List[int]]
+
+    :param top: Number of the most frequent IDs of each kind. [int]
+
+    :return: response model dict of kind -> list of [id, count].
+    """
+    try:
+        return video_index.counts(video_ids, top)
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -738,7 +1505,9 @@ async def update_video(video_id, video: Video):
     :return: response model dict.
     """
     try:
-        return video_services.update_video(video_id, video)
+        updated = video_services.update_video(video_id, video)
+        await video_index.refresh_videos([video_id])
+        return updated
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -754,7 +1523,9 @@ async def delete_video(video_id):
     :return: response model dict.
     """
     try:
-        return video_services.delete_video(video_id)
+        deleted = video_services.delete_video(video_id)
+        await video_index.refresh_videos([video_id])
+        return deleted
     except HTTPException as ex:
         log.exception(f"Error", exc_info=ex)
         raise ex
@@ -780,12 +1551,12 @@ def run_server():
 
 
 if __name__ == "__main__":
-    # Создание датабазы и таблиц, если они не существуют
+    # Создание базы данных и применение новых миграций схемы
     log.info("Start create/update database")
     from create_sql import CreateSQL
 
     create_sql = CreateSQL()
-    create_sql.read_sql()
+    create_sql.migrate()
 
     # Запуск сервера и бота
     log.info("Start run server")
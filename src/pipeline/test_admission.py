@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.utils.admission import AdmissionController
+
+
+def test_server_waiters_are_served_before_public():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, max_wait=100)
+        gate = asyncio.Event()
+        order = []
+
+        async def call(name, priority, wait=False):
+            async def work():
+                if wait:
+                    await gate.wait()
+                order.append(name)
+            await controller.run(priority, work)
+
+        first = asyncio.create_task(call("first", "public", wait=True))
+        await asyncio.sleep(0)
+        rest = [asyncio.create_task(call("public", "public")),
+                asyncio.create_task(call("server", "server"))]
+        await asyncio.sleep(0)
+        assert controller.stats()["queued"] == {"server": 1, "public": 1}
+        gate.set()
+        await asyncio.gather(first, *rest)
+        return order, controller.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["first", "server", "public"]
+    assert stats["in_flight"] == 0 and stats["admitted"] == 3
+
+
+def test_public_calls_are_shed_before_server_calls():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=2, max_wait=100, public_share=0.5)
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(controller.run("server", gate.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as public:
+            await controller.run("public", gate.wait)
+        tasks.append(asyncio.create_task(controller.run("server", gate.wait)))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as server:
+            await controller.run("server", gate.wait)
+        gate.set()
+        await asyncio.gather(*tasks)
+        return public.value, server.value, controller.stats()
+
+    public, server, stats = asyncio.run(scenario())
+    assert public.status_code == server.status_code == 503
+    assert "Retry-After" in public.headers
+    assert stats["rejected"] == 2 and stats["rejection_rate"] == 0.4
+
+
+def test_cancelled_waiter_frees_its_place():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, max_wait=100)
+        gate = asyncio.Event()
+        running = asyncio.create_task(controller.run("server", gate.wait))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(controller.run("server", gate.wait))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        gate.set()
+        await running
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0 and stats["queued"] == {"server": 0, "public": 0}
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.utils import api_key_cache
+from src.utils.api_key_cache import APIKeyValidator
+
+
+class KeyStore:
+    """
+    Заменитель authenticate_services.validate_api_key: считает проверки
+    """
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.calls = []
+
+    def __call__(self, api_key):
+        self.calls.append(api_key)
+        if api_key not in self.keys:
+            raise HTTPException(status_code=401, detail="Invalid API key")
+        return self.keys[api_key]
+
+
+def test_valid_key_cached_until_invalidated():
+    store = KeyStore({"key-a": {"user_id": 1}})
+    validator = APIKeyValidator(store)
+
+    async def scenario():
+        results = [await validator("key-a"), await validator("key-a")]
+        validator.invalidate("key-a", None)
+        results.append(await validator("key-a"))
+        return results
+
+    assert asyncio.run(scenario()) == [{"user_id": 1}] * 3
+    assert store.calls == ["key-a", "key-a"]
+
+
+def test_invalid_key_raises_fresh_exception_from_cache():
+    store = KeyStore({})
+    validator = APIKeyValidator(store, negative_ttl=30)
+
+    async def attempt():
+        try:
+            await validator("key-x")
+        except HTTPException as ex:
+            return ex
+
+    errors = [asyncio.run(attempt()) for _ in range(3)]
+    assert store.calls == ["key-x"]
+    assert all(error.status_code == 401 and error.detail == "Invalid API key" for error in errors)
+    # Каждое попадание - новое исключение, traceback не накапливается
+    assert len({id(error) for error in errors}) == 3
+    assert errors[1].__traceback__ is not errors[2].__traceback__
+    assert len(list(_frames(errors[2].__traceback__))) == len(list(_frames(errors[1].__traceback__)))
+
+
+def _frames(traceback):
+    while traceback is not None:
+        yield traceback
+        traceback = traceback.tb_next
+
+
+def test_server_errors_not_cached():
+    calls = []
+
+    def unavailable(api_key):
+        calls.append(api_key)
+        raise HTTPException(status_code=503, detail="Database is unavailable")
+
+    validator = APIKeyValidator(unavailable)
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            asyncio.run(validator("key-a"))
+    assert len(calls) == 2
+
+
+def test_keys_by_user(stand_in_db, monkeypatch):
+    stand_in_db.pool.sqlite.executescript("""
+        CREATE TABLE api_keys (id INTEGER PRIMARY KEY, api_key TEXT, user_id INT);
+        INSERT INTO api_keys (api_key, user_id) VALUES ('key-a', 1), ('key-b', 1), ('key-c', 2);
+    """)
+    monkeypatch.setattr(api_key_cache, "async_db", stand_in_db)
+    assert sorted(asyncio.run(APIKeyValidator.keys_by_user(1))) == ["key-a", "key-b"]
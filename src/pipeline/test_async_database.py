@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from pymysql.err import OperationalError
+
+
+def test_execute_and_fetch(stand_in_db):
+    async def scenario():
+        cursor = await stand_in_db.execute_query("INSERT INTO categories (name) VALUES (%s)", ("Музыка",))
+        row = await stand_in_db.fetch_one("SELECT id, name FROM categories WHERE id = %s", (cursor.lastrowid,))
+        rows = await stand_in_db.fetch_all("SELECT id, name FROM categories")
+        return row, rows
+
+    row, rows = asyncio.run(scenario())
+    assert row["name"] == "Музыка"
+    assert len(rows) == 1
+
+
+def test_concurrent_queries(stand_in_db):
+    async def scenario():
+        await asyncio.gather(*[
+            stand_in_db.execute_query("INSERT INTO categories (name) VALUES (%s)", (f"category{index}",))
+            for index in range(20)
+        ])
+        return await stand_in_db.fetch_all("SELECT name FROM categories")
+
+    assert len(asyncio.run(scenario())) == 20
+
+
+def test_read_retried_after_lost_connection(stand_in_db):
+    stand_in_db.pool.fail_next = [2013]
+    row = asyncio.run(stand_in_db.fetch_one("SELECT COUNT(*) AS total FROM categories"))
+    assert row["total"] == 0
+    assert stand_in_db.stats()["retries"] == 1
+
+
+def test_write_not_retried_when_lost_during_query(stand_in_db):
+    stand_in_db.pool.fail_next = [2013]
+    with pytest.raises(OperationalError):
+        asyncio.run(stand_in_db.execute_query("INSERT INTO categories (name) VALUES (%s)", ("Спорт",)))
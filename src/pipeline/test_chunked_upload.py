@@ -0,0 +1,194 @@
+import os
+import asyncio
+import hashlib
+import pytest
+from fastapi import HTTPException
+from src.database.models import UploadInit
+from src.repository import upload_repository
+from src.services import upload_services
+
+CHUNK = 1000
+
+
+@pytest.fixture
+def uploads(stand_in_db, memory_media_repository, monkeypatch, tmp_path):
+    stand_in_db.pool.sqlite.executescript("""
+        CREATE TABLE upload_sessions (id TEXT PRIMARY KEY, name_object TEXT, filename TEXT, size INT,
+                                      chunk_size INT, sha256 TEXT, status TEXT DEFAULT 'open',
+                                      stored_filename TEXT, updated_at INT);
+        CREATE TABLE upload_chunks (upload_id TEXT, chunk_index INT, size INT, sha256 TEXT, writer TEXT,
+                                    updated_at INT, PRIMARY KEY (upload_id, chunk_index));
+    """)
+    monkeypatch.setattr(upload_repository, "async_db", stand_in_db)
+    return tmp_path
+
+
+async def body(data: bytes, piece: int = 300):
+    for start in range(0, len(data), piece):
+        yield data[start:start + piece]
+
+
+def test_chunks_resume_in_any_order_and_complete_once(uploads):
+    data = os.urandom(CHUNK * 3 + 250)
+    chunks = [data[start:start + CHUNK] for start in range(0, len(data), CHUNK)]
+
+    async def scenario():
+        upload = await upload_services.create_upload(UploadInit(
+            filename="match.mp4", size=len(data), chunk_size=CHUNK,
+            sha256=hashlib.sha256(data).hexdigest()))
+        assert upload.ChunksTotal == 4 and upload.Missing == [0, 1, 2, 3]
+        await upload_services.write_chunk(upload.ID, 3, 3 * CHUNK, body(chunks[3]))
+        await upload_services.write_chunk(upload.ID, 1, CHUNK, body(chunks[1]),
+                                          hashlib.sha256(chunks[1]).hexdigest())
+        errors = []
+        # Испорченная повторная отправка принятой части 1 снова делает ее недостающей
+        for index, offset, chunk, checksum in [(0, 0, chunks[0], "0" * 64), (2, CHUNK + 1, chunks[2], None),
+                                               (2, 2 * CHUNK, chunks[2][:-1], None),
+                                               (1, CHUNK, os.urandom(CHUNK), hashlib.sha256(chunks[1]).hexdigest())]:
+            with pytest.raises(HTTPException) as error:
+                await upload_services.write_chunk(upload.ID, index, offset, body(chunk), checksum)
+            errors.append(error.value.status_code)
+        with pytest.raises(HTTPException) as error:
+            await upload_services.complete_upload(upload.ID)
+        errors.append(error.value.status_code)
+        state = await upload_services.get_upload(upload.ID)
+        assert errors == [400, 400, 400, 400, 409]
+        assert state.Missing == [0, 1, 2] and state.ReceivedBytes == 250
+        for index in state.Missing:
+            await upload_services.write_chunk(upload.ID, index, index * CHUNK, body(chunks[index]))
+        completed = await upload_services.complete_upload(upload.ID)
+        again = await upload_services.complete_upload(upload.ID)
+        return completed, again
+
+    completed, again = asyncio.run(scenario())
+    stored = uploads / "videos" / completed.StoredFilename
+    assert completed.Status == again.Status == "completed"
+    assert completed.ReceivedBytes == len(data)
+    assert stored.read_bytes() == data and os.listdir(uploads / "videos") == [completed.StoredFilename]
+
+
+def upload_whole(data: bytes, filename: str = "match.mp4"):
+    async def scenario():
+        upload = await upload_services.create_upload(UploadInit(filename=filename, size=len(data),
+                                                                chunk_size=CHUNK))
+        for index in range(upload.ChunksTotal):
+            await upload_services.write_chunk(upload.ID, index, index * CHUNK,
+                                              body(data[index * CHUNK:(index + 1) * CHUNK]))
+        return await upload_services.complete_upload(upload.ID)
+    return scenario
+
+
+def test_duplicate_content_shares_file_and_abort_releases_it(uploads):
+    data = os.urandom(CHUNK * 2)
+
+    async def scenario():
+        first = await upload_whole(data)()
+        second = await upload_whole(data, "copy.MKV")()
+        await upload_services.abort_upload(first.ID)
+        kept = os.listdir(uploads / "videos")
+        await upload_services.abort_upload(second.ID)
+        return first, second, kept
+
+    first, second, kept = asyncio.run(scenario())
+    assert first.StoredFilename == second.StoredFilename and kept == [first.StoredFilename]
+    assert os.listdir(uploads / "videos") == []
+
+
+def test_unsupported_extension_rejected_at_init(uploads):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_whole(b"data", "run.sh")())
+    assert error.value.status_code == 415
+
+
+async def slow_body(data: bytes, started: asyncio.Event, release: asyncio.Event):
+    started.set()
+    await release.wait()
+    yield data
+
+
+def test_chunk_write_excludes_second_writer_and_completion(uploads):
+    data = os.urandom(CHUNK * 2)
+
+    async def scenario():
+        upload = await upload_services.create_upload(UploadInit(filename="match.mp4", size=len(data),
+                                                                chunk_size=CHUNK))
+        await upload_services.write_chunk(upload.ID, 0, 0, body(data[:CHUNK]))
+        await upload_services.write_chunk(upload.ID, 1, CHUNK, body(data[CHUNK:]))
+        # Повторная отправка части 1 еще пишется: вторая запись и завершение отклоняются
+        started, release = asyncio.Event(), asyncio.Event()
+        resend = asyncio.create_task(upload_services.write_chunk(upload.ID, 1, CHUNK,
+                                                                 slow_body(data[CHUNK:], started, release)))
+        await started.wait()
+        errors = []
+        for attempt in (upload_services.write_chunk(upload.ID, 1, CHUNK, body(data[CHUNK:])),
+                        upload_services.complete_upload(upload.ID)):
+            with pytest.raises(HTTPException) as error:
+                await attempt
+            errors.append(error.value.detail)
+        # Захват завершения тоже не проходит, пока часть пишется
+        claimed = await upload_repository.claim_upload(upload.ID, 0)
+        release.set()
+        await resend
+        return errors, claimed, await upload_services.complete_upload(upload.ID)
+
+    errors, claimed, completed = asyncio.run(scenario())
+    assert "being written" in errors[0] and "misses 1 chunks" in errors[1] and not claimed
+    assert (uploads / "videos" / completed.StoredFilename).read_bytes() == data
+
+
+def test_resent_chunk_of_completing_upload_keeps_accepted_chunk(uploads):
+    data = os.urandom(CHUNK * 2)
+
+    async def scenario():
+        upload = await upload_services.create_upload(UploadInit(filename="match.mp4", size=len(data),
+                                                                chunk_size=CHUNK))
+        for index in range(2):
+            await upload_services.write_chunk(upload.ID, index, index * CHUNK,
+                                              body(data[index * CHUNK:(index + 1) * CHUNK]))
+        await upload_repository.claim_upload(upload.ID, 0)
+        claimed = await upload_repository.claim_chunk(upload.ID, 1, "late", 0, 0)
+        return claimed, await upload_repository.get_chunks(upload.ID)
+
+    claimed, chunks = asyncio.run(scenario())
+    # Загрузка уже завершается: часть не занимается, а принятая часть не удаляется
+    assert not claimed and [chunk["chunk_index"] for chunk in chunks] == [0, 1]
+
+
+def test_abort_releases_once_and_waits_for_completion(uploads, memory_media_repository):
+    data = os.urandom(CHUNK)
+
+    async def scenario():
+        first = await upload_whole(data)()
+        second = await upload_whole(data)()
+        results = await asyncio.gather(upload_services.abort_upload(first.ID),
+                                       upload_services.abort_upload(first.ID), return_exceptions=True)
+        await upload_repository.claim_upload(second.ID, 0)
+        return results
+
+    results = asyncio.run(scenario())
+    # Из двух параллельных отмен ссылку освобождает одна, вторая не находит загрузку
+    assert results[0] is None and results[1].status_code == 404
+    assert [row["refcount"] for row in memory_media_repository.rows.values()] == [1]
+
+
+def test_abandoned_uploads_expire_and_size_is_capped(uploads, monkeypatch):
+    now = [1000000]
+    monkeypatch.setattr(upload_services.time, "time", lambda: now[0])
+
+    async def scenario():
+        upload = await upload_services.create_upload(UploadInit(filename="match.mp4", size=CHUNK * 3,
+                                                                chunk_size=CHUNK))
+        await upload_services.write_chunk(upload.ID, 0, 0, body(os.urandom(CHUNK)))
+        now[0] += upload_services.EXPIRE_AFTER - 1
+        kept = await upload_services.expire_uploads()
+        now[0] += 2
+        return upload, kept, await upload_services.expire_uploads()
+
+    upload, kept, expired = asyncio.run(scenario())
+    assert (kept, expired) == (0, 1) and os.listdir(uploads / "videos") == []
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_services.get_upload(upload.ID))
+    assert error.value.status_code == 404
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(upload_services.create_upload(UploadInit(filename="huge.mp4", size=upload_services.MAX_SIZE + 1)))
+    assert error.value.status_code == 413
@@ -0,0 +1,130 @@
+import time
+import threading
+import pytest
+from pymysql.err import OperationalError
+from src.database import my_connector
+from src.database.my_connector import ConnectionPool, Database, PoolTimeoutError
+
+
+class FakeConnection:
+    """
+    Заменитель соединения pymysql: ping падает, пока задан ping_error
+    """
+
+    def __init__(self):
+        self.open = True
+        self.pings = 0
+        self.ping_error = None
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        if self.ping_error is not None:
+            raise self.ping_error
+
+    def close(self):
+        self.open = False
+
+
+class FakePool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.created = []
+
+    def _create_connection(self):
+        self.count("connects")
+        self.created.append(FakeConnection())
+        return self.created[-1]
+
+
+def test_acquire_times_out_when_pool_is_exhausted():
+    pool = FakePool(max_size=1, timeout=0.05)
+    held = pool.acquire()
+    started = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.05
+
+    # Освобожденное соединение достается ожидающему потоку
+    threading.Timer(0.01, pool.release, (held,)).start()
+    pool.timeout = 1
+    assert pool.acquire() is held
+    assert pool.stats()["size"] == 1 and pool.stats()["connects"] == 1
+
+
+def test_expired_connection_recycled_and_idle_one_pinged(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(my_connector.time, "monotonic", lambda: clock[0])
+    pool = FakePool(max_size=2, recycle=60, ping_interval=30)
+    first = pool.acquire()
+    pool.release(first)
+
+    # Теплое соединение выдается без ping
+    clock[0] += 10
+    assert pool.acquire() is first and first.connection.pings == 0
+    pool.release(first)
+
+    # Простаивавшее соединение проверяется ping, сломанное пересоздается
+    clock[0] += 40
+    first.connection.ping_error = OperationalError(2006, "gone away")
+    second = pool.acquire()
+    assert second is not first and not first.connection.open
+    assert pool.stats()["reconnects"] == 1
+    pool.release(second)
+
+    # Соединение старше recycle закрывается без ping
+    clock[0] += 61
+    third = pool.acquire()
+    assert third is not second and not second.connection.open and second.connection.pings == 0
+    assert pool.stats()["size"] == 1 and pool.stats()["connects"] == 3
+
+
+def test_connection_discarded_after_operational_error():
+    pool = FakePool(max_size=1)
+    database = Database(pool=pool)
+    with pytest.raises(OperationalError):
+        with database.connection():
+            raise OperationalError(2013, "Lost connection")
+    assert not pool.created[0].open
+    assert pool.stats()["size"] == 0 and pool.stats()["idle"] == 0 and pool.stats()["discards"] == 1
+
+    with database.connection() as connection:
+        assert connection is pool.created[1]
+    assert pool.stats()["idle"] == 1
+
+
+@pytest.mark.parametrize("code, idempotent, retried", [
+    (2003, False, True), (2006, False, True), (2003, True, True), (2006, True, True),
+    (2013, True, True), (2013, False, False), (1062, True, False),
+])
+def test_retry_matrix(code, idempotent, retried):
+    database = Database(pool=FakePool())
+    database.retry_backoff = 0
+    calls = []
+
+    def action(connection):
+        calls.append(connection)
+        if len(calls) == 1:
+            raise OperationalError(code, "error")
+        return "ok"
+
+    if retried:
+        assert database._run(action, idempotent=idempotent) == "ok"
+        assert len(calls) == 2 and database.pool.stats()["retries"] == 1
+        # Повтор выполняется на новом соединении, сломанное не возвращается в пул
+        assert calls[0] is not calls[1] and not calls[0].open
+    else:
+        with pytest.raises(OperationalError):
+            database._run(action, idempotent=idempotent)
+        assert len(calls) == 1 and database.pool.stats()["retries"] == 0
+
+
+def test_retries_exhausted():
+    database = Database(pool=FakePool())
+    database.retry_backoff = 0
+
+    def action(connection):
+        raise OperationalError(2006, "gone away")
+
+    with pytest.raises(OperationalError):
+        database._run(action, idempotent=False)
+    assert database.pool.stats()["retries"] == database.retries
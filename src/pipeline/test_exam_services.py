@@ -0,0 +1,69 @@
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from pymysql.err import IntegrityError
+from src.database.models import Category
+from src.utils import exam_services
+
+
+@pytest.fixture
+def database(stand_in_sync_db, monkeypatch):
+    database = stand_in_sync_db
+    database.sqlite.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT);
+        INSERT INTO categories (id, name) VALUES (1, 'Музыка'), (2, 'Спорт');
+    """)
+    monkeypatch.setattr(exam_services, "db", database)
+    return database
+
+
+def test_table_lookups_follow_column_collation(database):
+    assert exam_services.return_id_if_exists("categories", "name", "Спорт") == 2
+    # Сравнение отдается сопоставлению колонки, как у уникального ключа
+    assert all("BINARY" not in query and "`name` = %s" in query for query in database.queries)
+
+    with pytest.raises(HTTPException):
+        exam_services.check_if_exists("categories", "name", "Музыка", "Category exists")
+    exam_services.check_if_exists("categories", "name", "Кино", "Category exists")
+
+    # Строка, которую обновляют, сама себе не дубликат
+    exam_services.check_for_duplicates("categories", 1, "name", "Музыка", "Category exists")
+    with pytest.raises(HTTPException):
+        exam_services.check_for_duplicates("categories", 2, "name", "Музыка", "Category exists")
+
+    with pytest.raises(ValueError):
+        exam_services.exists("categories; DROP TABLE categories", "name", "Музыка")
+
+
+def test_get_all_callable_still_supported(database):
+    categories = [Category(id=1, name="Музыка"), Category(id=2, name="Спорт")]
+
+    def get_all():
+        return categories
+
+    assert exam_services.return_id_if_exists(get_all, "Name", "Спорт") == 2
+    assert exam_services.return_id_if_exists(get_all, "Name", "Кино") is None
+    with pytest.raises(HTTPException):
+        exam_services.check_if_exists(get_all, "Name", "Музыка", "Category exists")
+    exam_services.check_for_duplicates(get_all, 1, "Name", "Музыка", "Category exists")
+    with pytest.raises(HTTPException):
+        exam_services.check_for_duplicates(get_all, 2, "Name", "Музыка", "Category exists")
+    assert database.queries == []
+
+
+def test_duplicate_entry_returns_409():
+    app = FastAPI()
+    app.add_exception_handler(IntegrityError, exam_services.duplicate_entry_handler)
+
+    @app.post("/categories/")
+    async def create_category():
+        raise IntegrityError(exam_services.DUPLICATE_ENTRY, "Duplicate entry 'cat' for key 'name'")
+
+    @app.post("/videos/")
+    async def create_video():
+        raise IntegrityError(1452, "Cannot add or update a child row")
+
+    client = TestClient(app, raise_server_exceptions=False)
+    response = client.post("/categories/")
+    assert response.status_code == 409 and response.json() == {"detail": "Already exists"}
+    assert client.post("/videos/").status_code == 500
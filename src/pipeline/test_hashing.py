@@ -0,0 +1,60 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.utils import hashing
+from src.utils.hashing import HashingPool
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = HashingPool(workers=2, max_concurrency=3)
+    monkeypatch.setattr(hashing, "hashing_pool", pool)
+    monkeypatch.setattr(hashing, "BCRYPT_ROUNDS", 4)
+    return pool
+
+
+def test_password_hashed_and_checked_in_bcrypt_pool(pool):
+    hashed = hashing.hash_password("secret")
+    assert hashing.validate_password("secret", hashed.decode())
+    assert not hashing.validate_password("wrong", hashed)
+    assert hashed.startswith(b"$2b$04$")
+    assert pool.stats()["operations"] == 3
+
+
+def test_only_bcrypt_runs_in_pool(pool, monkeypatch):
+    threads = {}
+
+    def hashpw(password):
+        threads["bcrypt"] = threading.current_thread().name
+        return b"hash"
+
+    def register_user(email, password):
+        # Сервис (запросы к базе) выполняется в вызывающем потоке
+        threads["service"] = threading.current_thread().name
+        return email, hashing.hash_password(password)
+
+    monkeypatch.setattr(hashing, "_hashpw", hashpw)
+    assert register_user("john@example.com", "secret") == ("john@example.com", b"hash")
+    assert threads["bcrypt"].startswith("bcrypt") and threads["service"] == threading.current_thread().name
+
+
+def test_concurrency_and_workers_bounded(pool, monkeypatch):
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def slow_hash(password):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return password.encode()
+
+    monkeypatch.setattr(hashing, "_hashpw", slow_hash)
+    with ThreadPoolExecutor(max_workers=8) as callers:
+        results = list(callers.map(hashing.hash_password, [f"p{index}" for index in range(8)]))
+    assert results == [f"p{index}".encode() for index in range(8)]
+    assert peak[0] == 2
+    stats = pool.stats()
+    assert stats["operations"] == 8 and stats["wait_max"] > 0 and stats["hash_avg"] >= 0.02
@@ -0,0 +1,24 @@
+import pytest
+from src.repository.inference_links_repository import parse_ids, lookup_filter
+from src.utils.list_to_str import decode_string_to_list
+
+
+def test_parse_ids_skips_malformed_and_repeated_items():
+    assert parse_ids("1,2,4") == [1, 2, 4]
+    assert parse_ids(" 3, 3,,x,5 ") == [3, 5]
+    assert parse_ids(None) == [] and parse_ids("") == []
+
+
+def test_decode_string_to_list_rejects_empty_items():
+    assert decode_string_to_list("1,20,3") == [1, 20, 3]
+    for value in ("", "1,,2", "1,", "1;2"):
+        with pytest.raises(ValueError):
+            decode_string_to_list(value)
+
+
+def test_lookup_requires_exactly_one_filter():
+    assert lookup_filter(tag_id=7) == ("tag_id", 7)
+    with pytest.raises(ValueError):
+        lookup_filter()
+    with pytest.raises(ValueError):
+        lookup_filter(category_id=1, tag_id=2)
@@ -0,0 +1,122 @@
+import asyncio
+import pytest
+from src.database.models import JobStatus
+from src.utils.job_queue import JobQueue, QueueFullError
+
+
+async def wait_finished(job, timeout=1.0):
+    async def poll():
+        while not job.finished:
+            await asyncio.sleep(0.001)
+    await asyncio.wait_for(poll(), timeout)
+
+
+def test_failed_job_retried_until_success():
+    calls = []
+
+    async def flaky(payload):
+        calls.append(payload)
+        if len(calls) < 3:
+            raise RuntimeError("model is busy")
+        return payload * 2
+
+    async def scenario():
+        queue = JobQueue(flaky, workers=1, max_retries=2, retry_backoff=0.001)
+        await queue.start()
+        job = queue.submit(21)
+        await wait_finished(job)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == JobStatus.DONE and job.result == 42 and job.attempts == 3 and calls == [21] * 3
+
+
+def test_job_fails_after_max_retries():
+    async def broken(payload):
+        raise RuntimeError("model is not loaded")
+
+    async def scenario():
+        queue = JobQueue(broken, workers=1, max_retries=1, retry_backoff=0.001)
+        await queue.start()
+        job = queue.submit(1)
+        await wait_finished(job)
+        await queue.stop()
+        return job, queue.stats()
+
+    job, stats = asyncio.run(scenario())
+    assert job.status == JobStatus.FAILED and job.attempts == 2 and job.error == "model is not loaded"
+    assert stats["failed"] == 1
+
+
+def test_cancel_queued_and_running_jobs():
+    async def scenario():
+        running = asyncio.Event()
+
+        async def slow(payload):
+            running.set()
+            await asyncio.sleep(10)
+
+        queue = JobQueue(slow, workers=1)
+        await queue.start()
+        first, second = queue.submit(1), queue.submit(2)
+        await asyncio.wait_for(running.wait(), 1)
+        assert first.status == JobStatus.RUNNING and second.status == JobStatus.QUEUED
+        queue.cancel(second.id)
+        queue.cancel(first.id)
+        await asyncio.sleep(0)
+        # Отмененная в очереди задача не запускается
+        third = queue.submit(3)
+        await asyncio.sleep(0.01)
+        await queue.stop()
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+    assert first.status == second.status == JobStatus.CANCELLED and second.attempts == 0
+    assert third.status == JobStatus.RUNNING
+
+
+def test_workers_limit_concurrency_and_queue_is_bounded():
+    async def scenario():
+        active, peak = [0], [0]
+
+        async def handler(payload):
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+            return payload
+
+        queue = JobQueue(handler, workers=2, max_queued=5)
+        await queue.start()
+        jobs = [queue.submit(index) for index in range(5)]
+        with pytest.raises(QueueFullError):
+            queue.submit(5)
+        for job in jobs:
+            await wait_finished(job)
+        # Завершенные задачи не занимают место в очереди
+        queue.submit(6)
+        await queue.stop()
+        return jobs, peak[0]
+
+    jobs, peak = asyncio.run(scenario())
+    assert peak == 2 and [job.result for job in jobs] == list(range(5))
+
+
+def test_jobs_scoped_to_owner_and_purged():
+    async def handler(payload):
+        return payload
+
+    async def scenario():
+        queue = JobQueue(handler, workers=1, keep_finished=0)
+        await queue.start()
+        job = queue.submit(1, owner="key-a")
+        assert queue.get(job.id, owner="key-b") is None and queue.cancel(job.id, owner="key-b") is None
+        assert queue.get(job.id, owner="key-a") is job and queue.get(job.id) is job
+        await wait_finished(job)
+        await asyncio.sleep(0.001)
+        queue.submit(2)
+        await queue.stop()
+        return queue.get(job.id)
+
+    assert asyncio.run(scenario()) is None
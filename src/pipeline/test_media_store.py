@@ -0,0 +1,77 @@
+import os
+import io
+import asyncio
+import hashlib
+import pytest
+from fastapi import HTTPException
+from src.repository import media_repository
+from src.utils import write_file_into_server as media_store
+
+
+class ChunkedUpload:
+    """
+    Заменитель UploadFile, запоминающий размеры чтений
+    """
+
+    def __init__(self, filename: str, data: bytes):
+        self.filename = filename
+        self.stream = io.BytesIO(data)
+        self.reads = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads.append(size)
+        return self.stream.read(size)
+
+
+@pytest.fixture
+def repository(memory_media_repository, monkeypatch):
+    monkeypatch.setattr(media_store, "CHUNK_SIZE", 1000)
+    return memory_media_repository
+
+
+def test_duplicate_uploads_share_one_file_until_last_release(repository, tmp_path):
+    data = os.urandom(4500)
+    first, second = ChunkedUpload("clip.mp4", data), ChunkedUpload("copy.mp4", data)
+
+    async def upload():
+        return [await media_store.write_file_into_server("videos", upload) for upload in (first, second)]
+
+    names = asyncio.run(upload())
+    sha256 = hashlib.sha256(data).hexdigest()
+    assert names == [f"{sha256}.mp4"] * 2 and first.reads == [1000] * 6
+    assert os.listdir(tmp_path / "videos") == [names[0]]
+    assert (tmp_path / "videos" / names[0]).read_bytes() == data
+    assert repository.rows[("videos", sha256)]["refcount"] == 2
+
+    assert asyncio.run(media_store.release_file_from_server("videos", names[0])) == 1
+    assert os.listdir(tmp_path / "videos") == [names[0]]
+    assert asyncio.run(media_store.release_file_from_server("videos", names[0])) == 0
+    assert os.listdir(tmp_path / "videos") == []
+
+
+def test_extension_whitelisted(repository, tmp_path):
+    assert media_store.file_extension("Match.MP4") == "mp4"
+    for filename in ["clip", "clip.sh", "clip.mp4/../x", "clip.mp4.exe"]:
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(media_store.write_file_into_server("videos", ChunkedUpload(filename, b"data")))
+        assert error.value.status_code == 415
+    assert not (tmp_path / "videos").exists() or os.listdir(tmp_path / "videos") == []
+
+
+def test_last_release_removes_file_after_delete_is_committed(stand_in_sync_db, monkeypatch):
+    stand_in_sync_db.sqlite.executescript("""
+        CREATE TABLE media_objects (id INTEGER PRIMARY KEY AUTOINCREMENT, name_object TEXT, sha256 TEXT,
+                                    filename TEXT, size INTEGER, refcount INTEGER);
+        INSERT INTO media_objects (name_object, sha256, filename, size, refcount)
+        VALUES ('videos', 'abc', 'abc.mp4', 10, 2);
+    """)
+    monkeypatch.setattr(media_repository, "db", stand_in_sync_db)
+
+    def remove():
+        raise OSError("disk error")
+
+    assert media_repository.release_media_object("videos", "abc.mp4", remove) == 1
+    with pytest.raises(OSError):
+        media_repository.release_media_object("videos", "abc.mp4", remove)
+    # Ошибка удаления файла не откатывает уже зафиксированное удаление строки
+    assert stand_in_sync_db.sqlite.execute("SELECT COUNT(*) AS count FROM media_objects").fetchone()["count"] == 0
@@ -0,0 +1,145 @@
+import pytest
+import pymysql
+from create_sql import CreateSQL, MigrationError
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setenv("DB", "test")
+    return CreateSQL()
+
+
+def test_migrations_are_ordered_and_split_into_statements(runner):
+    versions = [migration.version for migration in runner.migrations]
+    assert versions == sorted(set(versions)) and versions[0] == 1
+    for migration in runner.migrations:
+        statements = migration.statements()
+        assert statements
+        assert not any(statement.startswith("--") or statement.endswith(";") for statement in statements)
+
+
+def test_pending_skips_applied_and_rejects_changed_migrations(runner):
+    first, *rest = runner.migrations
+    assert runner._pending({first.version: first.checksum}) == rest
+    assert runner._pending({migration.version: migration.checksum for migration in runner.migrations}) == []
+    with pytest.raises(MigrationError):
+        runner._pending({first.version: "0" * 64})
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.row = None
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        server = self.server
+        server.queries.append(query)
+        if server.fail_on and server.fail_on in query:
+            raise pymysql.err.OperationalError(1064, "You have an error in your SQL syntax")
+        if query.startswith("SELECT version, checksum FROM schema_migrations"):
+            self.rows = [{"version": version, "checksum": checksum} for version, checksum in server.applied.items()]
+        elif query.startswith("SELECT GET_LOCK"):
+            self.row = {"locked": int(server.lock_free)}
+        elif query.startswith("SHOW TABLES LIKE 'schema_migrations'"):
+            self.row = {"table": "schema_migrations"}
+        elif query.startswith("INSERT INTO schema_migrations"):
+            server.staged[params[0]] = params[2]
+
+    def fetchone(self):
+        return self.row
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeServer:
+    """
+    Заменитель pymysql.connect: таблица schema_migrations, блокировка GET_LOCK и транзакции
+    """
+
+    def __init__(self, applied=None, lock_free=True, fail_on=None):
+        self.applied = dict(applied or {})
+        self.staged = {}
+        self.lock_free = lock_free
+        self.fail_on = fail_on
+        self.queries = []
+        self.closed = 0
+
+    def connect(self, database=None):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def begin(self):
+        self.server.staged = {}
+
+    def commit(self):
+        self.server.applied.update(self.server.staged)
+
+    def rollback(self):
+        self.server.staged = {}
+
+    def close(self):
+        self.server.closed += 1
+
+
+@pytest.fixture
+def migrations(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB", "test")
+    (tmp_path / "0001_baseline.sql").write_text("CREATE TABLE a (id INT);\n")
+    (tmp_path / "0002_second.sql").write_text("-- Второй шаг\nCREATE TABLE b (id INT);\n")
+    return CreateSQL(str(tmp_path))
+
+
+def use(runner, server, monkeypatch):
+    monkeypatch.setattr(runner, "_connect", server.connect)
+    return server
+
+
+def test_migrate_applies_pending_under_lock(migrations, monkeypatch):
+    first = migrations.migrations[0]
+    server = use(migrations, FakeServer({first.version: first.checksum}), monkeypatch)
+    assert migrations.migrate() == 1
+    assert server.applied == {1: first.checksum, 2: migrations.migrations[1].checksum}
+    lock, release = server.queries.index("SELECT GET_LOCK('schema_migrations', 300) AS locked"), len(server.queries) - 1
+    assert server.queries.index("CREATE TABLE b (id INT)") > lock
+    assert server.queries[release] == "SELECT RELEASE_LOCK('schema_migrations')"
+    assert "CREATE TABLE a (id INT)" not in server.queries and server.closed == 2
+
+
+def test_changed_migration_stops_before_anything_runs(migrations, monkeypatch):
+    server = use(migrations, FakeServer({1: "0" * 64}), monkeypatch)
+    with pytest.raises(MigrationError, match="was changed"):
+        migrations.migrate()
+    assert not any(query.startswith(("CREATE", "SELECT GET_LOCK")) for query in server.queries)
+    assert server.applied == {1: "0" * 64} and server.closed == 1
+
+
+def test_lock_timeout_raises_without_applying(migrations, monkeypatch):
+    server = use(migrations, FakeServer(lock_free=False), monkeypatch)
+    with pytest.raises(MigrationError, match="lock"):
+        migrations.migrate()
+    assert not any(query.startswith(("CREATE TABLE", "SHOW TABLES")) for query in server.queries)
+    assert server.applied == {} and server.closed == 2
+
+
+def test_failed_migration_rolled_back_and_lock_released(migrations, monkeypatch):
+    server = use(migrations, FakeServer(fail_on="CREATE TABLE b"), monkeypatch)
+    with pytest.raises(pymysql.err.OperationalError):
+        migrations.migrate()
+    # Первая миграция зафиксирована, вторая откатилась вместе с записью о ней
+    assert list(server.applied) == [1]
+    assert server.queries[-1] == "SELECT RELEASE_LOCK('schema_migrations')" and server.closed == 2
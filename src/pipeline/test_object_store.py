@@ -0,0 +1,12 @@
+import sys
+import subprocess
+from src import path_to_project
+
+
+def test_disabled_store_does_not_import_s3_client():
+    # Отдельный интерпретатор: в этом процессе клиент мог импортировать другой тест
+    code = ("import sys; from src.utils.object_store import object_store; "
+            "print(object_store, 'src.script.selectel_cloud' in sys.modules, 'aiobotocore' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], cwd=path_to_project(), capture_output=True, text=True,
+                            check=True).stdout
+    assert output.split() == ["None", "False", "False"]
@@ -0,0 +1,74 @@
+import json
+import re
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from src.database.models import Category
+from src.utils import pagination
+
+
+class StreamingStandIn:
+    """
+    Заменитель db.stream: читает sqlite порциями, как небуферизованный курсор
+    """
+
+    def __init__(self, sqlite):
+        self.sqlite = sqlite
+        self.chunk_sizes = []
+
+    def stream(self, query, params=None, chunk_size: int = 500):
+        cursor = self.sqlite.execute(re.sub(r"%s", "?", query), params or ())
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            self.chunk_sizes.append(len(rows))
+            yield rows
+
+
+@pytest.fixture
+def client(stand_in_db, monkeypatch):
+    stand_in_db.pool.sqlite.executemany("INSERT INTO categories (name) VALUES (?)",
+                                        [(f"category{index}",) for index in range(7)])
+    stand_in_db.pool.sqlite.execute("DELETE FROM categories WHERE id = 3")
+    monkeypatch.setattr(pagination, "async_db", stand_in_db)
+    monkeypatch.setattr(pagination, "db", StreamingStandIn(stand_in_db.pool.sqlite))
+    monkeypatch.setattr(pagination, "STREAM_CHUNK_SIZE", 4)
+    app = FastAPI()
+
+    @app.get("/categories/")
+    async def categories(response: Response, after_id: int = 0, limit: int = 3, stream: bool = False):
+        if stream:
+            return pagination.stream_ndjson("categories", Category)
+        return await pagination.fetch_page(response, "categories", after_id, limit)
+
+    return TestClient(app)
+
+
+def test_pages_follow_next_cursor_header(client):
+    pages, cursor = [], 0
+    while cursor is not None:
+        response = client.get("/categories/", params={"after_id": cursor, "limit": 3})
+        assert response.status_code == 200
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+    # Курсор - id последней строки страницы, пропуск id 3 не сдвигает страницы
+    assert pages == [[1, 2, 4], [5, 6, 7], []]
+
+    response = client.get("/categories/", params={"after_id": 4, "limit": 5})
+    assert [row["id"] for row in response.json()] == [5, 6, 7] and "X-Next-Cursor" not in response.headers
+
+
+def test_page_size_capped(client, monkeypatch):
+    monkeypatch.setattr(pagination, "MAX_PAGE_SIZE", 2)
+    response = client.get("/categories/", params={"limit": 100})
+    assert [row["id"] for row in response.json()] == [1, 2] and response.headers["X-Next-Cursor"] == "2"
+
+
+def test_stream_ndjson_yields_every_row_in_chunks(client):
+    response = client.get("/categories/", params={"stream": True})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [1, 2, 4, 5, 6, 7]
+    assert rows[0] == {"id": 1, "name": "category0"}
+    assert pagination.db.chunk_sizes == [4, 2]
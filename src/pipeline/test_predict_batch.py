@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.database.models import Predict
+from src.repository import bulk_inference_repository
+from src.services import predict_batch_services
+
+
+@pytest.fixture
+def database(stand_in_sync_db, monkeypatch):
+    stand_in_sync_db.sqlite.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT, subcategory_id INT);
+        CREATE TABLE video (id INTEGER PRIMARY KEY, url TEXT, inference_id INT);
+        CREATE TABLE inference_categories (id INTEGER PRIMARY KEY AUTOINCREMENT, category_ids TEXT);
+        CREATE TABLE inference_subcategories (id INTEGER PRIMARY KEY, category_id INT, subcategory_ids TEXT);
+        CREATE TABLE inference_tags (id INTEGER PRIMARY KEY, subcategory_id INT NOT NULL, tag_ids TEXT);
+        CREATE TABLE inference_category_links (inference_id INT, category_id INT,
+                                               PRIMARY KEY (inference_id, category_id));
+        CREATE TABLE inference_subcategory_links (inference_id INT, subcategory_id INT,
+                                                  PRIMARY KEY (inference_id, subcategory_id));
+        CREATE TABLE inference_tag_links (inference_id INT, tag_id INT, PRIMARY KEY (inference_id, tag_id));
+        INSERT INTO categories (id, name) VALUES (1, 'Спорт'), (2, 'Музыка');
+        INSERT INTO tags (id, name, subcategory_id) VALUES (10, 'Футбол', 7), (11, 'Хоккей', 8);
+        INSERT INTO video (id, url) VALUES (1, 'https://rutube.ru/video/a/'), (2, 'https://rutube.ru/video/b/');
+        -- Чужие строки между вставками: id не обязаны идти подряд
+        INSERT INTO inference_categories (id, category_ids) VALUES (40, '2');
+    """)
+    monkeypatch.setattr(bulk_inference_repository, "db", stand_in_sync_db)
+    monkeypatch.setattr("src.repository.inference_links_repository.db", stand_in_sync_db)
+    return stand_in_sync_db
+
+
+def test_batch_maps_model_labels_and_saves_with_real_subcategory(database):
+    predictions = {"https://rutube.ru/video/a/": ["Хоккей", "Спорт", "Футбол", "Неизвестно"],
+                   "https://rutube.ru/video/b/": ["Музыка"],
+                   "https://rutube.ru/video/c/": ["Неизвестно"]}
+
+    async def predict(item: Predict):
+        if item.Url not in predictions:
+            raise HTTPException(status_code=404, detail="Video not found")
+        return predictions[item.Url]
+
+    items = [Predict(url=url) for url in [*predictions, "https://rutube.ru/video/d/"]]
+    results = asyncio.run(predict_batch_services.predict_batch(items, predict))
+
+    assert [result.Result for result in results[:3]] == list(predictions.values())
+    assert results[3].Error == "Video not found" and results[3].InferenceID is None
+    # Метки без категорий не сохраняются, но ответ модели отдается как есть
+    assert results[2].Error is None and results[2].InferenceID is None
+    first, second = results[0].InferenceID, results[1].InferenceID
+    assert first > 40 and second > first
+    rows = database.fetch_all("SELECT id, category_ids FROM inference_categories WHERE id > 40 ORDER BY id")
+    assert rows == [{"id": first, "category_ids": "1"}, {"id": second, "category_ids": "2"}]
+    assert database.fetch_all("SELECT * FROM inference_tags") == [{"id": first, "subcategory_id": 8,
+                                                                   "tag_ids": "11,10"}]
+    assert database.fetch_all("SELECT url, inference_id FROM video ORDER BY id") == [
+        {"url": "https://rutube.ru/video/a/", "inference_id": first},
+        {"url": "https://rutube.ru/video/b/", "inference_id": second}]
+    links = database.fetch_all("SELECT subcategory_id FROM inference_subcategory_links WHERE inference_id = %s "
+                               "ORDER BY subcategory_id", (first,))
+    assert [row["subcategory_id"] for row in links] == [7, 8]
+
+
+def test_repeated_predictions_reuse_video_inference(database):
+    predictions = {"https://rutube.ru/video/a/": ["Спорт", "Футбол"], "https://rutube.ru/video/b/": ["Музыка"]}
+
+    async def predict(item: Predict):
+        return predictions[item.Url]
+
+    items = [Predict(url=url) for url in predictions]
+    first = asyncio.run(predict_batch_services.predict_batch(items, predict))
+    # Второе видео с той же ссылкой и своим inference
+    database.execute_query("INSERT INTO inference_categories (id, category_ids) VALUES (50, '1')")
+    database.execute_query("INSERT INTO video (id, url, inference_id) VALUES (3, 'https://rutube.ru/video/b/', 50)")
+    # Тот же ответ (попадание в кеш) ничего не пишет, новый ответ обновляет строку на месте
+    predictions["https://rutube.ru/video/a/"] = ["Спорт", "Хоккей"]
+    second = asyncio.run(predict_batch_services.predict_batch(items, predict))
+
+    assert [result.InferenceID for result in second] == [result.InferenceID for result in first]
+    a, b = (result.InferenceID for result in first)
+    assert database.fetch_all("SELECT id, category_ids FROM inference_categories ORDER BY id") == [
+        {"id": 40, "category_ids": "2"}, {"id": a, "category_ids": "1"}, {"id": b, "category_ids": "2"}]
+    assert database.fetch_all("SELECT * FROM inference_tags") == [{"id": a, "subcategory_id": 8, "tag_ids": "11"}]
+    videos = database.fetch_all("SELECT inference_id FROM video ORDER BY id")
+    assert [row["inference_id"] for row in videos] == [a, b, b]
+    links = database.fetch_all("SELECT tag_id FROM inference_tag_links WHERE inference_id = %s", (a,))
+    assert [row["tag_id"] for row in links] == [11]
+    changes = database.sqlite.total_changes
+    asyncio.run(predict_batch_services.predict_batch(items, predict))
+    assert database.sqlite.total_changes == changes
+
+
+def test_batch_size_checked_before_work(database, monkeypatch):
+    monkeypatch.setattr(predict_batch_services, "BATCH_MAX_ITEMS", 1)
+    calls = []
+
+    async def predict(item: Predict):
+        calls.append(item)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(predict_batch_services.predict_batch([Predict(url="a"), Predict(url="b")], predict))
+    assert error.value.status_code == 400 and calls == []
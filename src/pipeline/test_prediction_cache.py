@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from src.utils import prediction_cache as cache_module
+from src.utils import ttl_cache
+from src.utils.prediction_cache import PredictionCache, normalize_url
+
+URL = "https://www.Rutube.ru/video/abc?t=10"
+PREDICTION = [{"category": "Спорт", "score": 0.9}, {"tag": "Футбол", "score": 0.7}]
+
+
+class Model:
+    """
+    Заменитель модели: считает вызовы и возвращает список, как предсказатель
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return PREDICTION
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def database(stand_in_db, monkeypatch):
+    stand_in_db.pool.sqlite.executescript("""
+        CREATE TABLE prediction_cache (model_version TEXT, url_hash TEXT, url TEXT, result TEXT, expires_at INT,
+                                       PRIMARY KEY (model_version, url_hash));
+        CREATE TABLE video (id INTEGER PRIMARY KEY, url TEXT, inference_id INT);
+        INSERT INTO video (id, url, inference_id) VALUES (1, 'https://rutube.ru/video/abc/', 5);
+    """)
+    monkeypatch.setattr(cache_module, "async_db", stand_in_db)
+    return stand_in_db
+
+
+def rows(database):
+    return database.pool.sqlite.execute("SELECT model_version, url, result FROM prediction_cache").fetchall()
+
+
+def test_normalize_url():
+    assert normalize_url(URL) == "https://rutube.ru/video/abc/"
+    assert normalize_url("http://rutube.ru/video/abc/#x") == "https://rutube.ru/video/abc/"
+
+
+def test_memory_tier_hit_miss_ttl_and_invalidate(clock):
+    cache, model = PredictionCache("m1", ttl=60, use_persisted=False), Model()
+
+    async def scenario():
+        results = [await cache.get_or_compute(URL, model), await cache.get_or_compute(normalize_url(URL), model)]
+        clock[0] += 61
+        results.append(await cache.get_or_compute(URL, model))
+        await cache.invalidate(URL)
+        results.append(await cache.get_or_compute(URL, model))
+        return results
+
+    assert asyncio.run(scenario()) == [PREDICTION] * 4
+    assert model.calls == 3
+    assert cache.stats()["hits"] == 1 and cache.stats()["computed"] == 3
+
+
+def test_persisted_tier_returns_computed_value_per_model_version(database, clock):
+    model = Model()
+
+    async def scenario():
+        first = await PredictionCache("m1").get_or_compute(URL, model)
+        # Новый процесс: пустая память, предсказание берется из базы как есть
+        restarted = PredictionCache("m1")
+        second = await restarted.get_or_compute("https://rutube.ru/video/abc/", model)
+        # Другая версия модели не видит чужие строки
+        other = PredictionCache("m2")
+        third = await other.get_or_compute(URL, model)
+        return first, second, third, restarted.stats(), other.stats()
+
+    first, second, third, restarted, other = asyncio.run(scenario())
+    assert first == second == third == PREDICTION and isinstance(second, list)
+    assert model.calls == 2
+    assert restarted["persisted_hits"] == 1 and restarted["computed"] == 0
+    assert other["persisted_misses"] == 1 and other["computed"] == 1
+    assert sorted(row["model_version"] for row in rows(database)) == ["m1", "m2"]
+
+
+def test_persisted_tier_ttl_and_invalidate_leave_video_alone(database, clock):
+    model = Model()
+
+    async def scenario():
+        await PredictionCache("m1", persisted_ttl=100).get_or_compute(URL, model)
+        clock[0] += 101
+        await PredictionCache("m1", persisted_ttl=100).get_or_compute(URL, model)
+        await PredictionCache("m2").get_or_compute(URL, model)
+        cache = PredictionCache("m1")
+        await cache.invalidate(URL, persisted=True)
+        after_url = sorted(row["model_version"] for row in rows(database))
+        await cache.get_or_compute(URL, model)
+        await cache.invalidate(persisted=True)
+        return after_url
+
+    after_url = asyncio.run(scenario())
+    # Просроченная строка пересчитана, сброс затрагивает только текущую модель
+    assert model.calls == 4
+    assert after_url == ["m2"] and [row["model_version"] for row in rows(database)] == ["m2"]
+    assert database.pool.sqlite.execute("SELECT inference_id FROM video").fetchone() == {"inference_id": 5}
+
+
+def test_unserializable_prediction_is_not_persisted(database, clock):
+    async def compute():
+        return {"embedding": object()}
+
+    value = asyncio.run(PredictionCache("m1").get_or_compute(URL, compute))
+    assert "embedding" in value and rows(database) == []
@@ -0,0 +1,63 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.utils import rate_limiter
+from src.utils.rate_limiter import BucketLimit, MemoryBucketStore, RateLimiter, RateLimitMiddleware
+
+VALID_KEYS = {"key-a", "key-b"}
+
+
+async def identify(headers):
+    # Заменитель проверки API ключа: личность только для известных ключей
+    api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+    return "key:" + api_key if api_key in VALID_KEYS else None
+
+
+def make_client(limiter):
+    app = FastAPI()
+
+    @app.get("/public/predict/")
+    async def predict():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limiter=limiter)
+    return TestClient(app)
+
+
+def statuses(client, keys):
+    return [client.get("/public/predict/", headers={"X-API-Key": key}).status_code for key in keys]
+
+
+def test_forged_keys_do_not_bypass_ip_bucket(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: 1000.0)
+    limiter = RateLimiter(MemoryBucketStore(), {"/public": BucketLimit(rate=1, burst=3)}, identify=identify)
+    client = make_client(limiter)
+    assert statuses(client, [f"forged-{index}" for index in range(5)]) == [200, 200, 200, 429, 429]
+    response = client.get("/public/predict/", headers={"X-API-Key": "key-a"})
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+
+
+def test_validated_key_charges_its_own_bucket_too(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: 1000.0)
+    limiter = RateLimiter(MemoryBucketStore(), {"/public": BucketLimit(rate=1, burst=3)}, identify=identify)
+
+    async def scenario():
+        scopes = [{"type": "http", "client": (f"10.0.0.{index}", 1), "headers": [(b"x-api-key", b"key-a")]}
+                  for index in range(4)]
+        keys = [await limiter.identity_key(scope) for scope in scopes]
+        return [(await limiter.check(f"/public:{key}", BucketLimit(1, 3)))[0] for key in keys]
+
+    # Разные IP с одним подтвержденным ключом делят корзину ключа
+    assert asyncio.run(scenario()) == [True, True, True, False]
+    assert asyncio.run(limiter.identity_key({"headers": [(b"x-api-key", b"forged")]})) is None
+
+
+def test_memory_store_evicts_least_recently_used(monkeypatch):
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: 1000.0)
+    store, limit = MemoryBucketStore(max_size=2), BucketLimit(rate=1, burst=1)
+    assert store.take("a", limit)[0] and store.take("b", limit)[0]
+    assert not store.take("a", limit)[0]
+    store.take("c", limit)
+    # "b" использовалась давнее всех и вытеснена, "a" осталась пустой
+    assert store.stats() == {"buckets": 2, "max_size": 2, "evictions": 1}
+    assert not store.take("a", limit)[0] and store.take("b", limit)[0]
@@ -0,0 +1,210 @@
+import os
+import asyncio
+import hashlib
+import itertools
+import pytest
+from contextlib import asynccontextmanager
+
+pytest.importorskip("aiobotocore")
+
+from botocore.exceptions import ClientError
+from src.script import selectel_cloud
+from src.script.selectel_cloud import S3Client, TransferError, multipart_etag
+
+PART_SIZE = 1024
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self, amt: int = None) -> bytes:
+        chunk, self.data = self.data[:amt], self.data[amt:] if amt else b""
+        return chunk
+
+
+class FakeS3:
+    """
+    Заменитель S3 клиента в памяти: multipart upload, head и get с Range.
+    fail(operation, part) решает, упадет ли очередной вызов.
+    """
+
+    def __init__(self, fail=lambda operation, part: False):
+        self.fail = fail
+        self.objects = {}
+        self.uploads = {}
+        self.upload_ids = itertools.count(1)
+        self.calls = {"upload_part": 0, "get_object": 0}
+        self.active = 0
+        self.max_active = 0
+        self.bodies = set()
+        self.observe = lambda: None
+
+    def _maybe_fail(self, operation: str, part: int):
+        if self.fail(operation, part):
+            raise ClientError({"Error": {"Code": "InternalError", "Message": "injected"}}, operation)
+
+    async def create_multipart_upload(self, Bucket, Key, Metadata):
+        upload_id = str(next(self.upload_ids))
+        self.uploads[upload_id] = {"key": Key, "metadata": Metadata, "parts": {}}
+        return {"UploadId": upload_id}
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, ContentMD5):
+        self.calls["upload_part"] += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            self.bodies.add(id(Body))
+            self.observe()
+            await asyncio.sleep(0)
+            self._maybe_fail("upload_part", PartNumber)
+            self.uploads[UploadId]["parts"][PartNumber] = bytes(Body)
+            return {"ETag": f'"{hashlib.md5(Body).hexdigest()}"'}
+        finally:
+            self.active -= 1
+
+    async def list_parts(self, Bucket, Key, UploadId, PartNumberMarker):
+        parts = self.uploads[UploadId]["parts"]
+        return {"Parts": [{"PartNumber": number, "ETag": f'"{hashlib.md5(parts[number]).hexdigest()}"'}
+                          for number in sorted(parts) if number > PartNumberMarker], "IsTruncated": False}
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        upload = self.uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        etag = multipart_etag([hashlib.md5(upload["parts"][number]).hexdigest() for number in numbers])
+        self.objects[Key] = {"data": b"".join(upload["parts"][number] for number in numbers),
+                             "etag": f'"{etag}"', "metadata": upload["metadata"]}
+        return {"ETag": f'"{etag}"'}
+
+    async def head_object(self, Bucket, Key):
+        stored = self.objects[Key]
+        return {"ContentLength": len(stored["data"]), "ETag": stored["etag"], "Metadata": stored["metadata"]}
+
+    async def get_object(self, Bucket, Key, Range=None, IfMatch=None):
+        self.calls["get_object"] += 1
+        stored = self.objects[Key]
+        if Range is None:
+            return {"Body": FakeBody(stored["data"])}
+        start, end = (int(value) for value in Range[len("bytes="):].split("-"))
+        self._maybe_fail("get_object", start // PART_SIZE + 1)
+        assert IfMatch == stored["etag"]
+        return {"Body": FakeBody(stored["data"][start:end + 1])}
+
+    async def put_object(self, Bucket, Key, Body, ContentMD5):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(0)
+            self.objects[Key] = {"data": bytes(Body), "etag": f'"{hashlib.md5(Body).hexdigest()}"', "metadata": {}}
+            return {"ETag": self.objects[Key]["etag"]}
+        finally:
+            self.active -= 1
+
+
+class FakeSession:
+    def __init__(self, fake: FakeS3):
+        self.fake = fake
+        self.clients = 0
+
+    @asynccontextmanager
+    async def create_client(self, service, **config):
+        self.clients += 1
+        yield self.fake
+
+
+def make_client(fake: FakeS3) -> S3Client:
+    client = S3Client("key", "secret", "https://s3.example", "bucket")
+    client.session = FakeSession(fake)
+    return client
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(selectel_cloud, "RETRY_BACKOFF", 0)
+
+
+def test_parallel_upload_and_download_retry_failed_parts(tmp_path):
+    source = tmp_path / "video.bin"
+    source.write_bytes(os.urandom(PART_SIZE * 7 + 100))
+    attempts = {}
+
+    def fail_once(operation, part):
+        attempts[operation, part] = attempts.get((operation, part), 0) + 1
+        return attempts[operation, part] == 1
+
+    fake = FakeS3(fail_once)
+    client = make_client(fake)
+
+    async def transfer():
+        async with client:
+            etag = await client.upload_file_in_chunks(str(source), part_size=PART_SIZE, concurrency=3)
+            await client.download_file_in_chunks("video.bin", str(tmp_path / "copy.bin"), concurrency=3)
+        return etag
+
+    etag = asyncio.run(transfer())
+    assert etag.endswith("-8") and fake.calls["upload_part"] == fake.calls["get_object"] == 16
+    assert 1 < fake.max_active <= 3
+    assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+    assert sorted(os.listdir(tmp_path)) == ["copy.bin", "video.bin"]
+
+
+def test_upload_resumes_from_missing_parts(tmp_path):
+    source = tmp_path / "video.bin"
+    source.write_bytes(os.urandom(PART_SIZE * 4))
+    fake = FakeS3(lambda operation, part: part == 3)
+    client = make_client(fake)
+
+    with pytest.raises(TransferError):
+        asyncio.run(client.upload_file_in_chunks(str(source), part_size=PART_SIZE, concurrency=1))
+    assert (tmp_path / "video.bin.upload.json").exists()
+
+    fake.fail = lambda operation, part: False
+    fake.calls["upload_part"] = 0
+    asyncio.run(client.upload_file_in_chunks(str(source), part_size=PART_SIZE, concurrency=2))
+    assert fake.calls["upload_part"] == 2
+    assert fake.objects["video.bin"]["data"] == source.read_bytes()
+    assert not (tmp_path / "video.bin.upload.json").exists()
+
+
+def test_streaming_reuses_buffers_and_reports_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(selectel_cloud, "STREAM_BUFFER_SIZE", 100)
+    source = tmp_path / "video.bin"
+    source.write_bytes(os.urandom(PART_SIZE * 12))
+    fake = FakeS3()
+    client = make_client(fake)
+    in_flight = []
+    fake.observe = lambda: in_flight.append(client.stats()["bytes_in_flight"])
+
+    asyncio.run(client.upload_file_in_chunks(str(source), part_size=PART_SIZE, concurrency=2))
+    asyncio.run(client.download_file_in_chunks("video.bin", str(tmp_path / "copy.bin"), concurrency=2))
+
+    assert len(fake.bodies) <= 2 and 0 < max(in_flight) <= 2 * PART_SIZE
+    assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+    stats = client.stats()
+    assert stats["bytes_in_flight"] == 0 and stats["active"] == [] and stats["transfers"] == 2
+    assert stats["uploaded_bytes"] == stats["downloaded_bytes"] == PART_SIZE * 12
+
+
+def test_open_client_is_shared_by_fan_out_calls():
+    fake = FakeS3()
+    client = make_client(fake)
+    objects = {f"frames/{number}.jpg": os.urandom(50 + number) for number in range(20)}
+
+    async def fan_out():
+        await client.open()
+        try:
+            await client.put_objects(objects, concurrency=4)
+            return await client.get_objects(list(objects) + ["frames/0.jpg"])
+        finally:
+            await client.close()
+
+    assert asyncio.run(fan_out()) == objects
+    assert client.session.clients == 1 and 1 < fake.max_active <= 4
+    stats = client.stats()
+    assert not stats["open"] and stats["uploaded_bytes"] == stats["downloaded_bytes"] == sum(map(len, objects.values()))
@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from src.utils.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight, calls = SingleFlight(), []
+
+    async def predict():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["Спорт"]
+
+    async def scenario():
+        results = await asyncio.gather(*[flight.do("video", predict) for _ in range(10)])
+        # После завершения ключ освобождается, следующий вызов выполняется заново
+        results.append(await flight.do("video", predict))
+        return results
+
+    results = asyncio.run(scenario())
+    assert results == [["Спорт"]] * 11 and len(calls) == 2
+    assert flight.stats() == {"calls": 11, "executions": 2, "shared": 9, "in_flight": 0}
+
+
+def test_exception_propagates_to_every_waiter():
+    flight, calls = SingleFlight(), []
+
+    async def broken():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("Video not found")
+
+    async def scenario():
+        return await asyncio.gather(*[flight.do("video", broken) for _ in range(5)], return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+
+    async def predict():
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("video", predict))
+        second = asyncio.create_task(flight.do("video", predict))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == 42
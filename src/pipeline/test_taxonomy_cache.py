@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from src.utils import taxonomy_cache as taxonomy_cache_module
+from src.utils.taxonomy_cache import TaxonomyCache, TaxonomySnapshot
+
+
+@pytest.fixture
+def sqlite(stand_in_db, monkeypatch):
+    stand_in_db.pool.sqlite.executescript("""
+        CREATE TABLE subcategories (id INTEGER PRIMARY KEY, name TEXT, category_id INT);
+        CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT, subcategory_id INT);
+        CREATE TABLE taxonomy_version (id INT PRIMARY KEY, version INT);
+        INSERT INTO taxonomy_version VALUES (1, 0);
+        INSERT INTO categories (id, name) VALUES (1, 'Sport'), (2, 'Music');
+        INSERT INTO subcategories VALUES (10, 'Football', 1);
+        INSERT INTO tags VALUES (100, 'Goal', 10), (101, 'Offside', 10);
+    """)
+    monkeypatch.setattr(taxonomy_cache_module, "async_db", stand_in_db)
+    return stand_in_db.pool.sqlite
+
+
+def test_snapshot_lookups_tree_and_pages(sqlite):
+    snapshot = asyncio.run(TaxonomyCache().get())
+    assert snapshot.category_by_name["sport"]["id"] == 1
+    # Как в MySQL: без учета регистра и пробелов в конце, но без свертки "ß" -> "ss"
+    assert snapshot.category_named("SPORT  ")["id"] == 1 and snapshot.tag_named("goal")["id"] == 100
+    assert snapshot.tag_named("Goal ")["id"] == 100
+    streets = TaxonomySnapshot(0, [{"id": 3, "name": "Straße"}], [], [])
+    assert streets.category_named("STRAẞE")["id"] == 3 and streets.category_named("STRASSE") is None
+    assert snapshot.tags[101]["name"] == "Offside"
+    assert [row["id"] for row in snapshot.page("categories", after_id=1)] == [2]
+    assert snapshot.tree()[0]["subcategories"][0]["tags"] == [{"id": 100, "name": "Goal"},
+                                                             {"id": 101, "name": "Offside"}]
+    with pytest.raises(TypeError):
+        snapshot.categories[3] = {"id": 3, "name": "Cinema"}
+
+
+def test_reads_are_served_from_memory_until_bump(sqlite):
+    async def scenario():
+        cache = TaxonomyCache()
+        first = await cache.get()
+        sqlite.execute("INSERT INTO tags VALUES (102, 'Corner', 10)")
+        unchanged = await cache.get()
+        await cache.bump()
+        return first, unchanged, await cache.get(), cache.stats()
+
+    first, unchanged, rebuilt, stats = asyncio.run(scenario())
+    assert unchanged is first and 102 not in first.tags
+    assert rebuilt.tags[102]["name"] == "Corner" and rebuilt.version == 1
+    assert stats["builds"] == 2 and stats["bumps"] == 1
@@ -0,0 +1,127 @@
+import io
+import itertools
+import pytest
+from contextlib import contextmanager
+from src.services import taxonomy_services
+from src.repository import taxonomy_repository
+from src.services.taxonomy_services import TaxonomyImport, read_rows
+
+
+class RecordingTaxonomy:
+    """
+    Заменитель taxonomy_repository и db: выдает ID по порядку и запоминает записанные строки,
+    теги из stored_tags считаются уже записанными в базу
+    """
+
+    def __init__(self, stored_tags=None):
+        self.ids = itertools.count(1)
+        self.written = {"categories": [], "subcategories": [], "tags": []}
+        self.stored_tags = dict(stored_tags or {})
+        self.transactions = 0
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield None
+
+    def upsert_categories(self, cursor, names):
+        self.written["categories"] += names
+        return {name: next(self.ids) for name in names}, len(names)
+
+    def upsert_subcategories(self, cursor, pairs):
+        self.written["subcategories"] += pairs
+        return {pair: next(self.ids) for pair in pairs}, len(pairs)
+
+    collation_key = staticmethod(taxonomy_repository.collation_key)
+
+    def insert_tags(self, cursor, pairs):
+        # INSERT IGNORE: существующий тег остается в своей подкатегории
+        created = [(subcategory_id, name) for subcategory_id, name in pairs
+                   if self.collation_key(name) not in self.stored_tags]
+        self.written["tags"] += created
+        self.stored_tags.update({self.collation_key(name): subcategory_id for subcategory_id, name in created})
+        return {name: self.stored_tags[self.collation_key(name)] for _, name in pairs}, len(created)
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    recording = RecordingTaxonomy()
+    monkeypatch.setattr(taxonomy_services, "db", recording)
+    monkeypatch.setattr(taxonomy_services, "taxonomy_repository", recording)
+    return recording
+
+
+def test_read_rows_csv_and_jsonl():
+    csv_text = "category,subcategory,tag\nSport, Football ,Goal\nSport,,\n"
+    assert list(read_rows(io.StringIO(csv_text), "csv")) == [("Sport", "Football", "Goal"), ("Sport", None, None)]
+    jsonl_text = '{"category": "Music", "subcategory": "Rock"}\n\n'
+    assert list(read_rows(io.StringIO(jsonl_text), "jsonl")) == [("Music", "Rock", None)]
+    with pytest.raises(ValueError):
+        list(read_rows(io.StringIO('{"category": "Music", "tag": "Guitar"}\n'), "jsonl"))
+
+
+def test_import_dedupes_in_memory_and_writes_in_chunks(recording):
+    rows = [("Sport", "Football", "Goal"), ("sport", "football", "goal"), ("Sport", "Football", "Offside"),
+            ("Sport", "Tennis", "Ace"), ("Music", None, None), ("Sport", "Football", "Goal")]
+    counters = TaxonomyImport(chunk_size=2).run(rows)
+    assert counters["rows"] == 6 and counters["duplicates"] == 2
+    assert recording.written["categories"] == ["Sport", "Music"]
+    assert [name for _, name in recording.written["subcategories"]] == ["Football", "Tennis"]
+    assert [name for _, name in recording.written["tags"]] == ["Goal", "Offside", "Ace"]
+    assert recording.transactions == counters["transactions"] == 2
+
+
+def test_tag_under_second_subcategory_is_reported_not_moved(recording):
+    rows = [("Sport", "Football", "Goal"), ("Sport", "Hockey", "goal "), ("Sport", "Hockey", "Puck")]
+    counters = TaxonomyImport(chunk_size=2).run(rows)
+    # ID выдаются по порядку: Sport - 1, Football - 2, Hockey - 3
+    football, hockey = 2, 3
+    assert recording.written["tags"] == [(football, "Goal"), (hockey, "Puck")]
+    assert counters["conflicts"] == 1
+    assert counters["conflicting_tags"] == [{"category": "Sport", "subcategory": "Hockey", "tag": "goal "}]
+
+
+def test_tag_stored_under_another_subcategory_is_not_moved(monkeypatch):
+    # Тег Goal уже хранится в базе в подкатегории с ID 99
+    recording = RecordingTaxonomy(stored_tags={"goal": 99})
+    monkeypatch.setattr(taxonomy_services, "db", recording)
+    monkeypatch.setattr(taxonomy_services, "taxonomy_repository", recording)
+    rows = [("Sport", "Football", "GOAL"), ("Sport", "Football", "Offside"), ("Sport", "Hockey", "Goal")]
+    counters = TaxonomyImport(chunk_size=2).run(rows)
+    assert recording.written["tags"] == [(2, "Offside")]
+    assert counters["tags"] == 1 and counters["conflicts"] == 2
+    assert [row["tag"] for row in counters["conflicting_tags"]] == ["GOAL", "Goal"]
+
+
+class CollationCursor:
+    """
+    Курсор, который, как MySQL, возвращает имена в том виде, в каком они уже записаны в базе
+    """
+
+    def __init__(self, stored):
+        self.stored = stored
+        self.queries = []
+        # Все переданные имена уже записаны, INSERT не добавляет строк
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+        self.params = params
+
+    def fetchall(self):
+        return [{"id": row_id, "name": name} for name, row_id in self.stored.items()
+                if name.rstrip(" ").lower() in {param.lower() for param in self.params}]
+
+    def fetchone(self):
+        # Сопоставление базы: "Cafe" совпадает с "Café"
+        return {"id": self.stored["Café"]}
+
+
+def test_upsert_categories_maps_ids_to_requested_names():
+    cursor = CollationCursor({"SPORT  ": 1, "Café": 2})
+    assert taxonomy_repository.upsert_categories(cursor, ["Sport", "Cafe"]) == ({"Sport": 1, "Cafe": 2}, 0)
+    assert cursor.queries[-1] == "SELECT id FROM categories WHERE name = %s"
@@ -0,0 +1,152 @@
+import asyncio
+import pytest
+from contextlib import contextmanager
+from fastapi import HTTPException
+from pymysql.err import IntegrityError, OperationalError
+from src.utils import usage_meter as meter_module
+from src.utils.usage_meter import UsageMeter, DUPLICATE_ENTRY
+
+
+class UsageCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=None):
+        if query.startswith("INSERT INTO api_key_usage_flushes"):
+            if params[0] in self.database.flushes:
+                raise IntegrityError(DUPLICATE_ENTRY, "Duplicate entry")
+            self.database.staged_flushes.add(params[0])
+        elif query.startswith("SELECT api_key, used"):
+            self.rows = [{"api_key": api_key, "used": self.database.used.get(api_key, 0) +
+                          self.database.staged.get(api_key, 0)} for api_key in params]
+
+    def executemany(self, query, params_list):
+        self.database.batches.append(list(params_list))
+        for api_key, used in params_list:
+            self.database.staged[api_key] = self.database.staged.get(api_key, 0) + used
+
+    def fetchall(self):
+        return self.rows
+
+
+class UsageDatabase:
+    """
+    Заменитель db и async_db для таблиц api_key_usage и api_key_usage_flushes
+    с транзакциями; lose_ack теряет подтверждение уже зафиксированной записи
+    """
+
+    def __init__(self):
+        self.used, self.flushes = {}, set()
+        self.staged, self.staged_flushes = {}, set()
+        self.batches = []
+        self.fail_before_commit = 0
+        self.lose_ack = 0
+
+    @contextmanager
+    def transaction(self):
+        self.staged, self.staged_flushes = {}, set()
+        yield self
+        if self.fail_before_commit:
+            self.fail_before_commit -= 1
+            raise OperationalError(2013, "Lost connection")
+        for api_key, used in self.staged.items():
+            self.used[api_key] = self.used.get(api_key, 0) + used
+        self.flushes |= self.staged_flushes
+        if self.lose_ack:
+            self.lose_ack -= 1
+            raise OperationalError(2013, "Lost connection")
+
+    def cursor(self):
+        return UsageCursor(self)
+
+    async def fetch_one(self, query, params=None):
+        # Имитируем сетевой запрос, чтобы конкурентные запросы переключали задачи
+        await asyncio.sleep(0)
+        return {"used": self.used[params[0]]} if params[0] in self.used else None
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = UsageDatabase()
+    monkeypatch.setattr(meter_module, "db", database)
+    monkeypatch.setattr(meter_module, "async_db", database)
+    return database
+
+
+def test_usage_counted_in_memory_and_flushed_in_one_batch(database):
+    database.used["key-a"] = 5
+    meter = UsageMeter()
+
+    async def scenario():
+        for _ in range(3):
+            await meter.reserve("key-a", usage_limit=10)
+        await meter.reserve("key-b", usage_limit=10, amount=2)
+        # Работа не выполнена: резерв возвращается
+        await meter.reserve("key-a", usage_limit=10, amount=2)
+        meter.refund("key-a", 2)
+        with pytest.raises(HTTPException) as error:
+            await meter.reserve("key-a", usage_limit=10, amount=3)
+        assert error.value.status_code == 429
+        await meter.flush()
+        await meter.flush()
+
+    asyncio.run(scenario())
+    assert database.batches == [[("key-a", 3), ("key-b", 2)]]
+    assert database.used == {"key-a": 8, "key-b": 2}
+    assert meter.stats() == {"keys": 2, "pending": 0, "flushes": 1, "flush_errors": 0, "rejected": 1}
+
+
+def test_concurrent_reservations_do_not_exceed_limit(database):
+    database.used["key-a"] = 8
+    meter = UsageMeter()
+
+    async def scenario():
+        return await asyncio.gather(*(meter.reserve("key-a", usage_limit=10) for _ in range(5)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert results.count(None) == 2 and all(error.status_code == 429 for error in results if error is not None)
+    assert meter.stats()["pending"] == 2
+
+
+def test_failed_flush_retried_with_same_id_without_double_count(database):
+    meter = UsageMeter()
+
+    async def scenario():
+        await meter.reserve("key-a", usage_limit=100, amount=4)
+        # Запись не зафиксирована: приращения остаются до следующей попытки
+        database.fail_before_commit = 1
+        await meter.flush()
+        assert database.used == {} and meter.stats()["pending"] == 4
+        # Запись зафиксирована, но подтверждение потеряно: повтор распознается по flush_id
+        database.lose_ack = 1
+        await meter.flush()
+        await meter.reserve("key-a", usage_limit=100)
+        await meter.flush()
+        await meter.flush()
+
+    asyncio.run(scenario())
+    assert database.used == {"key-a": 5}
+    assert len(database.flushes) == 2
+    assert meter.stats()["flush_errors"] == 2 and meter.stats()["pending"] == 0
+
+
+def test_totals_loaded_after_restart(database):
+    database.used["key-a"] = 9
+
+    async def scenario():
+        meter = UsageMeter()
+        await meter.reserve("key-a", usage_limit=10)
+        with pytest.raises(HTTPException):
+            await meter.reserve("key-a", usage_limit=10)
+        await meter.stop()
+
+    asyncio.run(scenario())
+    assert database.used == {"key-a": 10}
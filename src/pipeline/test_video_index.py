@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from src.utils import video_index as video_index_module
+from src.utils.video_index import VideoIndex
+
+
+@pytest.fixture
+def index(stand_in_db, monkeypatch):
+    stand_in_db.pool.sqlite.executescript("""
+        CREATE TABLE video (id INTEGER PRIMARY KEY, inference_id INT);
+        CREATE TABLE inference_category_links (inference_id INT, category_id INT);
+        CREATE TABLE inference_subcategory_links (inference_id INT, subcategory_id INT);
+        CREATE TABLE inference_tag_links (inference_id INT, tag_id INT);
+        CREATE TABLE video_index_version (id INT PRIMARY KEY, version INT);
+        INSERT INTO video_index_version VALUES (1, 0);
+        INSERT INTO video VALUES (1, 10), (2, 20), (3, 30), (4, NULL);
+        INSERT INTO inference_category_links VALUES (10, 1), (20, 1), (30, 2);
+        INSERT INTO inference_tag_links VALUES (10, 5), (10, 6), (20, 6), (30, 5);
+    """)
+    monkeypatch.setattr(video_index_module, "async_db", stand_in_db)
+    index = VideoIndex()
+    asyncio.run(index.refresh_videos([1, 2, 3, 4]))
+    return index
+
+
+def test_and_or_search_with_pages_and_totals(index):
+    assert index.search([("category", 1), ("tag", 6)], "and") == ([1, 2], 2)
+    assert index.search([("category", 2), ("tag", 6)], "or", after_id=1, limit=1) == ([2], 3)
+    assert index.search([("tag", 99)], "or") == ([], 0)
+
+
+def test_index_follows_changed_and_deleted_links(index, stand_in_db):
+    stand_in_db.pool.sqlite.executescript("""
+        DELETE FROM inference_tag_links WHERE inference_id = 10 AND tag_id = 6;
+        DELETE FROM video WHERE id = 3;
+    """)
+    asyncio.run(index.refresh_inferences([10, 30]))
+    assert index.search([("tag", 6)]) == ([2], 1)
+    assert index.search([("tag", 5)]) == ([1], 1)
+    assert index.counts([1, 2, 3])["category"] == [(1, 2)]
+    assert index.stats()["videos"] == 2
+
+
+def test_search_stops_at_full_page_and_estimates_total(index):
+    class Postings(list):
+        # Считает обращения к элементам списка, включая бинарный поиск
+        def __getitem__(self, position):
+            Postings.seen += 1
+            return super().__getitem__(position)
+
+    Postings.seen = 0
+    index._postings[("tag", 7)] = Postings(range(1, 1001))
+    index._postings[("tag", 8)] = Postings(range(1, 1001))
+    assert index.search([("tag", 7), ("tag", 8)], "and", after_id=500, limit=2) == ([501, 502], 1000)
+    assert Postings.seen < 50
+    Postings.seen = 0
+    page, total = index.search([("tag", 7), ("tag", 8)], "or", limit=3)
+    # Оценка для or не больше числа видео в индексе
+    assert page == [1, 2, 3] and total == index.stats()["videos"] and Postings.seen < 50
+
+
+def test_index_reloaded_after_change_in_other_process(index, stand_in_db, monkeypatch):
+    monkeypatch.setattr(VideoIndex, "_read_all", staticmethod(lambda: stand_in_db.pool.sqlite.execute(
+        "SELECT v.id AS video_id, v.inference_id, 'tag' AS kind, l.tag_id AS term_id FROM video v "
+        "JOIN inference_tag_links l ON l.inference_id = v.inference_id").fetchall()))
+
+    async def scenario():
+        index.refresh_interval = 0.01
+        await index.start()
+        # Своя запись увеличивает версию, но не вызывает перезагрузку
+        await index.refresh_videos([1])
+        await asyncio.sleep(0.05)
+        loads = index.stats()["loads"]
+        # Другой процесс добавил тег и увеличил версию
+        stand_in_db.pool.sqlite.executescript("""
+            INSERT INTO inference_tag_links VALUES (20, 9);
+            UPDATE video_index_version SET version = version + 1 WHERE id = 1;
+        """)
+        await asyncio.sleep(0.05)
+        await index.stop()
+        return loads
+
+    assert asyncio.run(scenario()) == 1
+    assert index.search([("tag", 9)]) == ([2], 1)
+    assert index.stats()["loads"] == 2 and index.stats()["version"] == 3
@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, List, Set, Tuple
+from src.database.my_connector import db
+from src.database.models import Inference
+from src.repository.inference_links_repository import write_links, parse_ids
+from src.utils.custom_logging import setup_logging
+
+log = setup_logging()
+
+
+def find_labels(names: Iterable[str]) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Ищет категории и теги по именам двумя запросами по индексам name.
+
+    Args:
+        names (Iterable[str]): Имена категорий и тегов.
+
+    Returns:
+        Tuple[Dict[str, int], Dict[str, int]]: ID категорий и ID тегов по их именам.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}, {}
+    placeholders = ", ".join(["%s"] * len(names))
+    categories = db.fetch_all(f"SELECT id, name FROM categories WHERE name IN ({placeholders})", names)
+    tags = db.fetch_all(f"SELECT id, name FROM tags WHERE name IN ({placeholders})", names)
+    return {row["name"]: row["id"] for row in categories}, {row["name"]: row["id"] for row in tags}
+
+
+def _tag_rows(cursor, pairs: List[Tuple[int, Inference]]) -> List[Tuple[int, int, str]]:
+    # Подкатегория в inference_tags - подкатегория первого из тегов inference, найденного в таблице tags
+    tag_ids = {tag_id for _, inference in pairs for tag_id in parse_ids(inference.TagIDS)}
+    subcategories = {}
+    if tag_ids:
+        cursor.execute(f"SELECT id, subcategory_id FROM tags WHERE id IN ({', '.join(['%s'] * len(tag_ids))})",
+                       sorted(tag_ids))
+        subcategories = {row["id"]: row["subcategory_id"] for row in cursor.fetchall()}
+    rows = []
+    for inference_id, inference in pairs:
+        known = [tag_id for tag_id in parse_ids(inference.TagIDS) if tag_id in subcategories]
+        if known:
+            rows.append((inference_id, subcategories[known[0]], inference.TagIDS))
+        elif inference.TagIDS:
+            log.warning(f"Skip tags {inference.TagIDS} of inference {inference_id}: no such tags")
+    return rows
+
+
+def save_video_inferences(pairs: List[Tuple[str, Inference]]) -> Dict[str, int]:
+    """
+    Сохраняет результаты предсказаний для видео по их ссылкам в одной транзакции
+    вместе со связями в таблицах связей inference.
+
+    Видео, у которого уже есть inference, сохраняет его ID: строка обновляется
+    на месте, а если результат не изменился (например, попадание в кеш предсказаний),
+    ничего не пишется. Новые строки создаются только для видео без inference,
+    ссылки без видео в базе пропускаются, поэтому строк без видео не остается.
+    Если у видео с одной ссылкой были разные inference, все они получают первый,
+    а остальные, на которые больше не ссылается ни одно видео, удаляются.
+
+    ID новой строки берется из lastrowid ее собственного INSERT: при
+    многострочном INSERT id подряд не гарантированы (innodb_autoinc_lock_mode = 2,
+    auto_increment_increment).
+
+    Args:
+        pairs (List[Tuple[str, Inference]]): Пары (url видео, результат предсказания).
+
+    Returns:
+        Dict[str, int]: ID inference по ссылке для видео, найденных в базе.
+    """
+    inferences = dict(pairs)
+    if not inferences:
+        return {}
+    urls = list(inferences)
+    placeholders = ", ".join(["%s"] * len(urls))
+    with db.transaction() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT v.url, v.inference_id, c.category_ids, t.tag_ids FROM video v "
+                           "LEFT JOIN inference_categories c ON c.id = v.inference_id "
+                           "LEFT JOIN inference_tags t ON t.id = v.inference_id "
+                           f"WHERE v.url IN ({placeholders}) ORDER BY v.id FOR UPDATE", urls)
+            videos = cursor.fetchall()
+            current = {}
+            for video in videos:
+                if video["inference_id"] is not None:
+                    current.setdefault(video["url"], video)
+            changed = [url for url, video in current.items()
+                       if (video["category_ids"], video["tag_ids"]) != (inferences[url].CategoryIDS,
+                                                                       inferences[url].TagIDS)]
+            ids = {url: video["inference_id"] for url, video in current.items()}
+            created = list(dict.fromkeys(video["url"] for video in videos if video["url"] not in current))
+            for url in created:
+                cursor.execute("INSERT INTO inference_categories (category_ids) VALUES (%s)",
+                               (inferences[url].CategoryIDS,))
+                ids[url] = cursor.lastrowid
+            if changed:
+                cursor.executemany("UPDATE inference_categories SET category_ids = %s WHERE id = %s",
+                                   [(inferences[url].CategoryIDS, ids[url]) for url in changed])
+                # Прежние теги и подкатегории заменяются результатом предсказания
+                for table in ("inference_tags", "inference_subcategories"):
+                    cursor.execute(f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(changed))})",
+                                   [ids[url] for url in changed])
+            written = [(ids[url], inferences[url]) for url in created + changed]
+            tag_rows = _tag_rows(cursor, written)
+            if tag_rows:
+                cursor.executemany("INSERT INTO inference_tags (id, subcategory_id, tag_ids) VALUES (%s, %s, %s)",
+                                   tag_rows)
+            if written:
+                write_links(cursor, [{"id": inference_id, "category_ids": inference.CategoryIDS,
+                                      "subcategory_ids": None, "tag_ids": inference.TagIDS}
+                                     for inference_id, inference in written])
+            relinked = [video for video in videos if video["inference_id"] != ids[video["url"]]]
+            if relinked:
+                cursor.executemany("UPDATE video SET inference_id = %s WHERE url = %s",
+                                   list(dict.fromkeys((ids[video["url"]], video["url"]) for video in relinked)))
+            _delete_unused(cursor, {video["inference_id"] for video in relinked} - {None})
+    return {url: ids[url] for url in urls if url in ids}
+
+
+def _delete_unused(cursor, inference_ids: Set[int]):
+    # Строка inference_categories удаляется только без видео: внешний ключ video удалил бы и видео
+    if not inference_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(inference_ids))
+    cursor.execute(f"SELECT DISTINCT inference_id FROM video WHERE inference_id IN ({placeholders})",
+                   sorted(inference_ids))
+    unused = sorted(inference_ids - {row["inference_id"] for row in cursor.fetchall()})
+    if unused:
+        placeholders = ", ".join(["%s"] * len(unused))
+        for table in ("inference_tags", "inference_subcategories", "inference_categories"):
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", unused)
@@ -0,0 +1,183 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.database.my_connector import db
+from src.database.my_async_connector import async_db
+from src.utils.custom_logging import setup_logging
+
+log = setup_logging()
+
+"""
+
+Связи inference с категориями, подкатегориями и тегами в таблицах
+inference_category_links, inference_subcategory_links и inference_tag_links.
+
+Строки "1,2,4" в inference_categories.category_ids, inference_subcategories.subcategory_ids
+и inference_tags.tag_ids остаются форматом API, а обратный поиск ("все видео с тегом X")
+идет по индексам таблиц связей. Подкатегории inference - это подкатегории из
+inference_subcategories вместе с подкатегориями его тегов.
+
+"""
+
+# Колонка id в каждой таблице связей
+LINK_TABLES = {"category_id": "inference_category_links",
+               "subcategory_id": "inference_subcategory_links",
+               "tag_id": "inference_tag_links"}
+
+# Исходные строки всех списков inference
+SOURCE_QUERY = ("SELECT c.id, c.category_ids, s.subcategory_ids, t.tag_ids FROM inference_categories c "
+                "LEFT JOIN inference_subcategories s ON s.id = c.id "
+                "LEFT JOIN inference_tags t ON t.id = c.id")
+
+
+def parse_ids(value: Optional[str]) -> List[int]:
+    """
+    Разбирает строку "1,2,4" в список чисел без повторов.
+
+    Пробелы и пустые элементы пропускаются, нечисловые элементы
+    пропускаются с предупреждением, чтобы одна испорченная строка
+    не останавливала миграцию.
+
+    Args:
+        value (Optional[str]): Строка ID через запятую.
+
+    Returns:
+        List[int]: ID в порядке первого появления.
+    """
+    ids = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if not item.isdigit():
+            log.warning(f"Skip malformed id {item!r} in {value!r}")
+            continue
+        if int(item) not in ids:
+            ids.append(int(item))
+    return ids
+
+
+def write_links(cursor, rows: List[Dict]):
+    """
+    Заменяет связи inference из строк с ключами id, category_ids, subcategory_ids, tag_ids.
+    Выполняется курсором вызывающей транзакции.
+    """
+    ids = [row["id"] for row in rows]
+    placeholders = ", ".join(["%s"] * len(ids))
+    for table in LINK_TABLES.values():
+        cursor.execute(f"DELETE FROM {table} WHERE inference_id IN ({placeholders})", ids)
+    links = {column: [(row["id"], linked_id) for row in rows for linked_id in parse_ids(row[source])]
+             for column, source in (("category_id", "category_ids"),
+                                    ("subcategory_id", "subcategory_ids"),
+                                    ("tag_id", "tag_ids"))}
+    for column, pairs in links.items():
+        if pairs:
+            cursor.executemany(f"INSERT IGNORE INTO {LINK_TABLES[column]} (inference_id, {column}) VALUES (%s, %s)",
+                               pairs)
+    cursor.execute("INSERT IGNORE INTO inference_subcategory_links (inference_id, subcategory_id) "
+                   "SELECT l.inference_id, t.subcategory_id FROM inference_tag_links l "
+                   f"JOIN tags t ON t.id = l.tag_id WHERE l.inference_id IN ({placeholders})", ids)
+
+
+def sync_inferences(inference_ids: Iterable[int]):
+    """
+    Перестраивает связи inference по их строкам ID в одной транзакции.
+    Вызывается после создания и изменения inference; при удалении связи
+    удаляются каскадно внешним ключом.
+
+    Args:
+        inference_ids (Iterable[int]): ID строк inference_categories.
+    """
+    inference_ids = [int(inference_id) for inference_id in inference_ids]
+    if not inference_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(inference_ids))
+    with db.transaction() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{SOURCE_QUERY} WHERE c.id IN ({placeholders})", inference_ids)
+            rows = cursor.fetchall()
+            if rows:
+                write_links(cursor, rows)
+
+
+def migrate_comma_lists(chunk_size: int = 1000) -> int:
+    """
+    Переносит строки ID всех inference, у которых еще нет связей, в таблицы связей.
+
+    При установке строки переносит миграция migrations/0004_inference_links.sql,
+    функция нужна для повторного переноса вручную
+    (python -m src.repository.inference_links_repository). Таблица
+    читается порциями по первичному ключу, каждая порция записывается своей
+    транзакцией, поэтому прерванный перенос можно просто запустить снова.
+
+    Args:
+        chunk_size (int): Количество inference в одной транзакции.
+
+    Returns:
+        int: Количество перенесенных inference.
+    """
+    migrated, after_id = 0, 0
+    while True:
+        rows = db.fetch_all(f"{SOURCE_QUERY} WHERE c.id > %s AND NOT EXISTS "
+                            "(SELECT 1 FROM inference_category_links l WHERE l.inference_id = c.id) "
+                            "ORDER BY c.id LIMIT %s", (after_id, chunk_size))
+        if not rows:
+            break
+        with db.transaction() as connection:
+            with connection.cursor() as cursor:
+                write_links(cursor, rows)
+        migrated += len(rows)
+        after_id = rows[-1]["id"]
+    if migrated:
+        log.info(f"Migrated {migrated} inferences to link tables")
+    return migrated
+
+
+async def get_links(inference_id: int) -> Dict[str, List[int]]:
+    """
+    Возвращает ID категорий, подкатегорий и тегов inference из таблиц связей.
+    """
+    links = {}
+    for column, table in LINK_TABLES.items():
+        rows = await async_db.fetch_all(f"SELECT {column} FROM {table} WHERE inference_id = %s ORDER BY {column}",
+                                        (inference_id,))
+        links[f"{column}s"] = [row[column] for row in rows]
+    return links
+
+
+def lookup_filter(category_id: Optional[int] = None, subcategory_id: Optional[int] = None,
+                  tag_id: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Выбирает таблицу связей для обратного поиска; задан должен быть ровно один ID.
+    """
+    given = [(column, value) for column, value in (("category_id", category_id),
+                                                   ("subcategory_id", subcategory_id),
+                                                   ("tag_id", tag_id)) if value is not None]
+    if len(given) != 1:
+        raise ValueError("Exactly one of category_id, subcategory_id, tag_id is required")
+    return given[0]
+
+
+async def find_video_inferences(column: str, value: int, after_id: int = 0, limit: int = 100) -> List[Dict]:
+    """
+    Обратный поиск: видео, inference которых связан с категорией, подкатегорией или тегом.
+
+    Поиск идет по индексу (column, inference_id) таблицы связей и индексу
+    video.inference_id, страницы отдаются по возрастанию id видео.
+
+    Args:
+        column (str): category_id, subcategory_id или tag_id.
+        value (int): ID категории, подкатегории или тега.
+        after_id (int): Курсор - id последнего видео предыдущей страницы.
+        limit (int): Размер страницы.
+
+    Returns:
+        List[Dict]: Строки с алиасами модели VideoInference.
+    """
+    return await async_db.fetch_all(
+        f"SELECT v.id, v.id AS video_id, v.inference_id FROM {LINK_TABLES[column]} l "
+        f"JOIN video v ON v.inference_id = l.inference_id "
+        f"WHERE l.{column} = %s AND v.id > %s ORDER BY v.id LIMIT %s",
+        (value, after_id, limit))
+
+
+if __name__ == "__main__":
+    migrate_comma_lists()
@@ -0,0 +1,60 @@
+from typing import Callable, Optional, Tuple
+from src.database.my_connector import db
+
+"""
+
+Счетчики ссылок на загруженные файлы в таблице media_objects. Файл хранится
+под именем sha256 содержимого, строка (name_object, sha256) одна на файл.
+
+Последняя ссылка удаляет строку, а файл удаляется только после фиксации этого
+DELETE, иначе откат транзакции оставил бы строку без файла. Перед удалением файла
+имя (name_object, filename) снова блокируется (FOR UPDATE): если параллельная
+загрузка того же содержимого уже создала строку заново, файл принадлежит ей
+и остается, а новая строка ждет, пока файл не будет удален.
+
+"""
+
+
+def acquire_media_object(name_object: str, sha256: str, filename: str, size: int) -> Tuple[str, int]:
+    """
+    Добавляет ссылку на файл с содержимым sha256, создавая строку для нового содержимого.
+
+    Returns:
+        Tuple[str, int]: Имя сохраненного файла (для повтора - имя первой загрузки) и число ссылок.
+    """
+    with db.transaction() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO media_objects (name_object, sha256, filename, size, refcount) "
+                           "VALUES (%s, %s, %s, %s, 1) ON DUPLICATE KEY UPDATE refcount = refcount + 1",
+                           (name_object, sha256, filename, size))
+            cursor.execute("SELECT filename, refcount FROM media_objects WHERE name_object = %s AND sha256 = %s",
+                           (name_object, sha256))
+            row = cursor.fetchone()
+    return row["filename"], row["refcount"]
+
+
+def release_media_object(name_object: str, filename: str, remove: Callable[[], None]) -> Optional[int]:
+    """
+    Убирает ссылку на файл; для последней ссылки удаляет строку и после фиксации вызывает remove.
+
+    Returns:
+        Optional[int]: Оставшееся число ссылок или None, если файл не учтен.
+    """
+    with db.transaction() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, refcount FROM media_objects WHERE name_object = %s AND filename = %s "
+                           "FOR UPDATE", (name_object, filename))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            if row["refcount"] > 1:
+                cursor.execute("UPDATE media_objects SET refcount = refcount - 1 WHERE id = %s", (row["id"],))
+                return row["refcount"] - 1
+            cursor.execute("DELETE FROM media_objects WHERE id = %s", (row["id"],))
+    with db.transaction() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM media_objects WHERE name_object = %s AND filename = %s FOR UPDATE",
+                           (name_object, filename))
+            if cursor.fetchone() is None:
+                remove()
+    return 0
@@ -0,0 +1,100 @@
+from typing import Callable, Dict, Iterator, List, Tuple
+from src.database.my_connector import db
+
+# Строки таксономии для экспорта: категория, подкатегория, тег (подкатегории и тега может не быть)
+EXPORT_QUERY = ("SELECT c.name AS category, s.name AS subcategory, t.name AS tag FROM categories c "
+                "LEFT JOIN subcategories s ON s.category_id = c.id "
+                "LEFT JOIN tags t ON t.subcategory_id = s.id "
+                "ORDER BY c.id, s.id, t.id")
+
+
+def collation_key(name: str) -> str:
+    # Имена сравниваются как в utf8mb4_general_ci (PAD SPACE): без учета регистра и пробелов в конце
+    return name.rstrip(" ").lower()
+
+
+def _values(rows: int, columns: int) -> str:
+    row = "(" + ", ".join(["%s"] * columns) + ")"
+    return ", ".join([row] * rows)
+
+
+def _by_requested(cursor, requested: list, rows: List[Dict], requested_key: Callable, row_key: Callable,
+                  value: str, exact_query: str) -> Dict:
+    # Строки базы сопоставляются с переданными именами по collation_key; если сопоставление
+    # базы шире (например, буквы с диакритикой), строка ищется ее собственным сравнением
+    stored = {row_key(row): row[value] for row in rows}
+    result = {}
+    for item in requested:
+        if requested_key(item) not in stored:
+            cursor.execute(exact_query, list(item) if isinstance(item, tuple) else [item])
+            stored[requested_key(item)] = cursor.fetchone()[value]
+        result[item] = stored[requested_key(item)]
+    return result
+
+
+def _name_key(row: Dict) -> str:
+    return collation_key(row["name"])
+
+
+def upsert_categories(cursor, names: List[str]) -> Tuple[Dict[str, int], int]:
+    """
+    Добавляет категории одним многострочным INSERT, существующие не меняются.
+
+    Returns:
+        Tuple[Dict[str, int], int]: ID категорий по переданному имени и число новых категорий.
+    """
+    cursor.execute(f"INSERT INTO categories (name) VALUES {_values(len(names), 1)} "
+                   "ON DUPLICATE KEY UPDATE name = name", names)
+    # Для существующей строки ON DUPLICATE KEY UPDATE без изменений дает 0 затронутых строк
+    created = cursor.rowcount
+    cursor.execute(f"SELECT id, name FROM categories WHERE name IN ({', '.join(['%s'] * len(names))})", names)
+    ids = _by_requested(cursor, names, cursor.fetchall(), collation_key, _name_key,
+                        "id", "SELECT id FROM categories WHERE name = %s")
+    return ids, created
+
+
+def upsert_subcategories(cursor, pairs: List[Tuple[int, str]]) -> Tuple[Dict[Tuple[int, str], int], int]:
+    """
+    Добавляет подкатегории (category_id, name), уникальные внутри категории.
+
+    Returns:
+        Tuple[Dict[Tuple[int, str], int], int]: ID подкатегорий по переданной паре (category_id, name)
+            и число новых подкатегорий.
+    """
+    params = [value for pair in pairs for value in pair]
+    cursor.execute(f"INSERT INTO subcategories (category_id, name) VALUES {_values(len(pairs), 2)} "
+                   "ON DUPLICATE KEY UPDATE name = name", params)
+    created = cursor.rowcount
+    cursor.execute(f"SELECT id, category_id, name FROM subcategories WHERE (category_id, name) IN "
+                   f"({_values(len(pairs), 2)})", params)
+    ids = _by_requested(cursor, pairs, cursor.fetchall(),
+                        lambda pair: (pair[0], collation_key(pair[1])),
+                        lambda row: (row["category_id"], collation_key(row["name"])),
+                        "id", "SELECT id FROM subcategories WHERE category_id = %s AND name = %s")
+    return ids, created
+
+
+def insert_tags(cursor, pairs: List[Tuple[int, str]]) -> Tuple[Dict[str, int], int]:
+    """
+    Добавляет теги (subcategory_id, name). Имя тега уникально во всей таблице,
+    существующий тег остается в своей подкатегории.
+
+    Returns:
+        Tuple[Dict[str, int], int]: Подкатегория, в которой тег хранится, по переданному имени
+            (отличается от переданной, если тег уже был в другой) и число новых тегов.
+    """
+    params = [value for pair in pairs for value in pair]
+    cursor.execute(f"INSERT IGNORE INTO tags (subcategory_id, name) VALUES {_values(len(pairs), 2)}", params)
+    created = cursor.rowcount
+    names = [name for _, name in pairs]
+    cursor.execute(f"SELECT name, subcategory_id FROM tags WHERE name IN ({', '.join(['%s'] * len(names))})", names)
+    subcategories = _by_requested(cursor, names, cursor.fetchall(), collation_key, _name_key,
+                                  "subcategory_id", "SELECT subcategory_id FROM tags WHERE name = %s")
+    return subcategories, created
+
+
+def stream_taxonomy(chunk_size: int = 1000) -> Iterator[List[Dict]]:
+    """
+    Порциями отдает строки таксономии небуферизованным курсором.
+    """
+    yield from db.stream(EXPORT_QUERY, chunk_size=chunk_size)
@@ -0,0 +1,97 @@
+from typing import Dict, List, Optional
+from src.database.my_async_connector import async_db
+
+"""
+
+Сессии загрузки частями в таблицах upload_sessions и upload_chunks.
+Файл собирается на диске, в базе хранится только какие части приняты и их sha256.
+
+Перед записью части запрос занимает ее строкой с пустым sha256 и своим writer:
+строка добавляется одним INSERT ... SELECT только для открытой сессии, а сессия
+переходит в completing, только если ни одна часть не пишется. Поэтому запись
+части и завершение загрузки не пересекаются, а вторая запись той же части отклоняется.
+
+"""
+
+SESSION_COLUMNS = ("id", "name_object", "filename", "size", "chunk_size", "sha256", "updated_at")
+
+
+async def create_upload(session: Dict):
+    await async_db.execute_query(
+        f"INSERT INTO upload_sessions ({', '.join(SESSION_COLUMNS)}) "
+        f"VALUES ({', '.join(['%s'] * len(SESSION_COLUMNS))})",
+        tuple(session[column] for column in SESSION_COLUMNS))
+
+
+async def get_upload(upload_id: str) -> Optional[Dict]:
+    return await async_db.fetch_one("SELECT * FROM upload_sessions WHERE id = %s", (upload_id,))
+
+
+async def get_chunks(upload_id: str) -> List[Dict]:
+    # Только принятые части, занятые для записи не учитываются
+    return await async_db.fetch_all("SELECT chunk_index, size, sha256 FROM upload_chunks WHERE upload_id = %s "
+                                    "AND sha256 IS NOT NULL ORDER BY chunk_index", (upload_id,))
+
+
+async def claim_chunk(upload_id: str, chunk_index: int, writer: str, now: int, stale_before: int) -> bool:
+    # Повторно отправленная принятая часть снова недостающая, занятая дольше срока считается брошенной;
+    # части завершаемой или завершенной загрузки не удаляются
+    await async_db.execute_query("DELETE FROM upload_chunks WHERE upload_id = %s AND chunk_index = %s "
+                                 "AND (sha256 IS NOT NULL OR updated_at < %s) AND EXISTS "
+                                 "(SELECT 1 FROM upload_sessions WHERE id = %s AND status = 'open')",
+                                 (upload_id, chunk_index, stale_before, upload_id))
+    cursor = await async_db.execute_query(
+        "INSERT IGNORE INTO upload_chunks (upload_id, chunk_index, size, sha256, writer, updated_at) "
+        "SELECT id, %s, 0, NULL, %s, %s FROM upload_sessions WHERE id = %s AND status = 'open'",
+        (chunk_index, writer, now, upload_id))
+    if cursor.rowcount != 1:
+        return False
+    await async_db.execute_query("UPDATE upload_sessions SET updated_at = %s WHERE id = %s", (now, upload_id))
+    return True
+
+
+async def save_chunk(upload_id: str, chunk_index: int, writer: str, size: int, sha256: str) -> bool:
+    # Часть принимается, только если она все еще занята этим запросом
+    cursor = await async_db.execute_query("UPDATE upload_chunks SET size = %s, sha256 = %s, writer = NULL "
+                                          "WHERE upload_id = %s AND chunk_index = %s AND writer = %s",
+                                          (size, sha256, upload_id, chunk_index, writer))
+    return cursor.rowcount == 1
+
+
+async def release_chunk(upload_id: str, chunk_index: int, writer: str):
+    await async_db.execute_query("DELETE FROM upload_chunks WHERE upload_id = %s AND chunk_index = %s "
+                                 "AND writer = %s", (upload_id, chunk_index, writer))
+
+
+async def claim_upload(upload_id: str, now: int) -> bool:
+    cursor = await async_db.execute_query("UPDATE upload_sessions SET status = 'completing', updated_at = %s "
+                                          "WHERE id = %s AND status = 'open' AND NOT EXISTS "
+                                          "(SELECT 1 FROM upload_chunks WHERE upload_id = %s AND sha256 IS NULL)",
+                                          (now, upload_id, upload_id))
+    return cursor.rowcount == 1
+
+
+async def reopen_upload(upload_id: str):
+    await async_db.execute_query("UPDATE upload_sessions SET status = 'open' WHERE id = %s AND status = 'completing'",
+                                 (upload_id,))
+
+
+async def complete_upload(upload_id: str, stored_filename: str):
+    await async_db.execute_query("UPDATE upload_sessions SET status = 'completed', stored_filename = %s "
+                                 "WHERE id = %s", (stored_filename, upload_id))
+    await async_db.execute_query("DELETE FROM upload_chunks WHERE upload_id = %s", (upload_id,))
+
+
+async def expired_uploads(before: int, limit: int) -> List[Dict]:
+    return await async_db.fetch_all("SELECT * FROM upload_sessions WHERE status IN ('open', 'completing') "
+                                    "AND updated_at < %s LIMIT %s", (before, limit))
+
+
+async def delete_upload(upload_id: str, status: str) -> bool:
+    # Удаляет только сессию в прочитанном статусе: из параллельных удалений срабатывает одно
+    cursor = await async_db.execute_query("DELETE FROM upload_sessions WHERE id = %s AND status = %s",
+                                          (upload_id, status))
+    if cursor.rowcount != 1:
+        return False
+    await async_db.execute_query("DELETE FROM upload_chunks WHERE upload_id = %s", (upload_id,))
+    return True
@@ -1,52 +1,368 @@
 import os
+import json
+import math
+import base64
+import hashlib
+import time
 import asyncio
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, contextmanager, AsyncExitStack
+from typing import Awaitable, Callable, Dict, Iterable, List, Tuple
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
-from botocore.exceptions import ClientError
+from botocore.exceptions import BotoCoreError, ClientError
+from src.utils.custom_logging import setup_logging
+from env import Env
+
+log = setup_logging()
+
+CHUNK_SIZE = 10 * 1024 * 1024  # Размер части в байтах (10 МБ), S3 требует не меньше 5 МБ для всех частей кроме последней
+CONCURRENCY = 4  # Одновременно передаваемых частей
+MAX_RETRIES = 3  # Повторов одной части после ошибки
+RETRY_BACKOFF = 0.5  # Секунд до первого повтора (удваивается)
+STREAM_BUFFER_SIZE = 1024 * 1024  # Размер порции при потоковом скачивании части
+MAX_POOL_CONNECTIONS = 10  # Соединений в пуле клиента (по умолчанию botocore)
+
+
+class TransferError(Exception):
+    """
+    Передача не завершена: часть не прошла после всех повторов или не совпал хеш
+    """
+
+
+def read_part_into(path: str, offset: int, buffer: bytearray) -> int:
+    with open(path, "rb") as file:
+        file.seek(offset)
+        return file.readinto(buffer)
+
+
+def file_md5(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def multipart_etag(part_md5s: List[str]) -> str:
+    # ETag объекта из частей: md5 от склеенных md5 частей и количество частей
+    return hashlib.md5(b"".join(bytes.fromhex(md5) for md5 in part_md5s)).hexdigest() + f"-{len(part_md5s)}"
+
+
+class BufferPool:
+    """
+    Переиспользуемые буферы одного размера: одновременно занято не больше
+    буферов, чем одновременно передается частей, поэтому память не зависит от размера файла
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._free = []
+
+    @contextmanager
+    def buffer(self):
+        buffer = self._free.pop() if self._free else bytearray(self.size)
+        try:
+            yield buffer
+        finally:
+            self._free.append(buffer)
+
+
+class TransferProgress:
+    """
+    Счетчики одной передачи: размер, передано, в полете (части в процессе передачи) и скорость
+    """
+
+    def __init__(self, object_name: str, direction: str, total: int):
+        self.object_name = object_name
+        self.direction = direction
+        self.total = total
+        self.done = 0
+        self.in_flight = 0
+        self.started = time.monotonic()
+
+    @contextmanager
+    def part(self, size: int):
+        self.in_flight += size
+        try:
+            yield
+            self.done += size
+        finally:
+            self.in_flight -= size
+
+    def stats(self) -> dict:
+        seconds = time.monotonic() - self.started
+        return {"object_name": self.object_name, "direction": self.direction, "total": self.total,
+                "done": self.done, "in_flight": self.in_flight, "seconds": round(seconds, 3),
+                "bytes_per_second": round(self.done / seconds) if seconds > 0 else 0}
+
+
+class TransferState:
+    """
+    Состояние передачи в JSON файле рядом с файлом, чтобы продолжить ее после обрыва
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                self.data = json.load(file)
+        except (OSError, ValueError):
+            self.data = {}
+
+    def save(self):
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self.data, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        self.data = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def run_window(items: Iterable, worker: Callable[..., Awaitable], concurrency: int = CONCURRENCY):
+    """
+    Выполняет worker для всех items, не больше concurrency одновременно.
+    При первой ошибке остальные задачи отменяются и ошибка пробрасывается.
+    """
+    items = iter(items)
+
+    async def run():
+        for item in items:
+            await worker(item)
+
+    tasks = [asyncio.create_task(run()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
-CHUNK_SIZE = 10 * 1024 * 1024  # Размер порции в байтах (10 МБ)
 
 class S3Client:
-    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket_name: str):
+    """
+    Клиент S3 совместимого хранилища Selectel.
+
+    Большие файлы передаются частями параллельно: загрузка - настоящим
+    multipart upload, скачивание - запросами диапазонов байт. Одновременно
+    передается не больше concurrency частей, часть повторяется после ошибки
+    до MAX_RETRIES раз. md5 каждой части сверяется с ETag, после передачи
+    сверяется ETag всего объекта. Состояние передачи хранится в файлах
+    *.upload.json и *.download.json, повторный вызов продолжает с недостающих частей.
+
+    Данные идут потоком: части читаются из файла в переиспользуемые буферы
+    (readinto) и отправляются как memoryview без копирования, скачиваемая
+    часть пишется в файл порциями по STREAM_BUFFER_SIZE. Память передачи
+    ограничена concurrency * part_size и не зависит от размера объекта.
+
+    Внутри async with S3Client(...) или между open и close все вызовы
+    используют один клиент и его пул соединений (сервер держит такой клиент
+    весь срок работы процесса), иначе клиент создается на вызов.
+
+    Методы:
+    - from_env: Создать клиент по переменным окружения S3_*.
+    - open/close: Открыть/закрыть общий клиент.
+    - upload_file: Загрузить файл (большой - частями).
+    - upload_file_in_chunks: Загрузить файл частями (multipart upload).
+    - download_file_in_chunks: Скачать объект частями по диапазонам.
+    - get_objects/put_objects: Параллельно прочитать/записать много небольших объектов.
+    - stats: Байты в полете, скорость текущих передач и итоговые счетчики.
+    """
+
+    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket_name: str,
+                 max_pool_connections: int = MAX_POOL_CONNECTIONS, keepalive_timeout: float = 15,
+                 connect_timeout: float = 60, read_timeout: float = 60):
         self.config = {
             "aws_access_key_id": access_key,
             "aws_secret_access_key": secret_key,
             "endpoint_url": endpoint_url,
+            # keepalive_timeout - секунд жизни простаивающего соединения в пуле aiohttp
+            "config": AioConfig(max_pool_connections=max_pool_connections, connect_timeout=connect_timeout,
+                                read_timeout=read_timeout, connector_args={"keepalive_timeout": keepalive_timeout}),
         }
         self.bucket_name = bucket_name
+        self.max_pool_connections = max_pool_connections
         self.session = get_session()
+        self._client = None
+        self._exit_stack = None
+        self._transfers: Dict[int, TransferProgress] = {}
+        self._counters = {"uploaded_bytes": 0, "downloaded_bytes": 0, "transfers": 0, "clients_created": 0}
+
+    @classmethod
+    def from_env(cls, **kwargs) -> "S3Client":
+        env = Env()
+        return cls(access_key=env.__getattr__("S3_ACCESS_KEY"), secret_key=env.__getattr__("S3_SECRET_KEY"),
+                   endpoint_url=env.__getattr__("S3_ENDPOINT_URL"), bucket_name=env.__getattr__("S3_BUCKET"),
+                   **kwargs)
+
+    @contextmanager
+    def _track(self, object_name: str, direction: str, total: int):
+        progress = TransferProgress(object_name, direction, total)
+        self._transfers[id(progress)] = progress
+        try:
+            yield progress
+        finally:
+            del self._transfers[id(progress)]
+            self._counters[f"{direction}ed_bytes"] += progress.done
+            self._counters["transfers"] += 1
+            log.info(f"Transfer finished: {progress.stats()}")
+
+    def stats(self) -> dict:
+        transfers = [progress.stats() for progress in self._transfers.values()]
+        return {"open": self._client is not None, "max_pool_connections": self.max_pool_connections,
+                "bytes_in_flight": sum(transfer["in_flight"] for transfer in transfers),
+                "active": transfers, **self._counters}
+
+    async def open(self):
+        if self._client is None:
+            self._exit_stack = AsyncExitStack()
+            self._client = await self._exit_stack.enter_async_context(self.session.create_client("s3", **self.config))
+            self._counters["clients_created"] += 1
+
+    async def close(self):
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            self._client = None
+            self._exit_stack = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
 
     @asynccontextmanager
     async def get_client(self):
+        if self._client is not None:
+            yield self._client
+            return
+        self._counters["clients_created"] += 1
         async with self.session.create_client("s3", **self.config) as client:
             yield client
 
+    @staticmethod
+    async def _retry(what: str, call: Callable[[], Awaitable], verify: Callable = None):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                result = await call()
+                if verify is None or verify(result):
+                    return result
+                error = TransferError(f"{what}: checksum mismatch")
+            except (ClientError, BotoCoreError, OSError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt == MAX_RETRIES:
+                raise TransferError(f"{what} failed after {MAX_RETRIES + 1} attempts") from error
+            log.warning(f"{what} failed ({error}), retry {attempt + 1}")
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
     async def upload_file(self, file_path: str, object_name: str):
         try:
+            size = os.path.getsize(file_path)
+            if size > CHUNK_SIZE:
+                # Большой файл идет частями, чтобы память не росла с его размером
+                await self.upload_file_in_chunks(file_path, object_name)
+                return
             async with self.get_client() as client:
-                with open(file_path, "rb") as file:  # Открываем файл в бинарном режиме
-                    await client.put_object(
-                        Bucket=self.bucket_name,
-                        Key=object_name,
-                        Body=file,
-                    )
-                print(f"File {object_name} uploaded to {self.bucket_name}")
-        except ClientError as e:
-            print(f"Error uploading file: {e}")
+                with self._track(object_name, "upload", size) as progress, progress.part(size):
+                    with open(file_path, "rb") as file:  # Открываем файл в бинарном режиме
+                        await client.put_object(
+                            Bucket=self.bucket_name,
+                            Key=object_name,
+                            Body=file,
+                        )
+                log.info(f"File {object_name} uploaded to {self.bucket_name}")
+        except (ClientError, TransferError) as e:
+            log.error(f"Error uploading file: {e}")
 
-    async def upload_file_in_chunks(self, file_path: str):
-        part_number = 0
-        try:
-            with open(file_path, "rb") as file:
-                while True:
-                    chunk = file.read(CHUNK_SIZE)
-                    if not chunk:  # Если нет данных, выходим из цикла
-                        break
-                    part_number += 1
-                    object_name = f"{os.path.basename(file_path)}.part{part_number}"
-                    await self.upload_chunk(chunk, object_name)  # Загружаем часть
-        except Exception as e:
-            print(f"Error uploading file in chunks: {e}")
+    async def _uploaded_parts(self, client, state: TransferState) -> Dict[str, dict]:
+        # Части, которые есть в хранилище и совпадают с сохраненным md5
+        parts, marker = {}, 0
+        while True:
+            response = await client.list_parts(Bucket=self.bucket_name, Key=state.data["object_name"],
+                                               UploadId=state.data["upload_id"], PartNumberMarker=marker)
+            for part in response.get("Parts", []):
+                saved = state.data["parts"].get(str(part["PartNumber"]))
+                if saved and part["ETag"].strip('"') == saved["md5"]:
+                    parts[str(part["PartNumber"])] = saved
+            if not response.get("IsTruncated"):
+                return parts
+            marker = response["NextPartNumberMarker"]
+
+    async def upload_file_in_chunks(self, file_path: str, object_name: str = None, part_size: int = CHUNK_SIZE,
+                                    concurrency: int = CONCURRENCY) -> str:
+        """
+        Загружает файл через multipart upload, параллельно и с продолжением после обрыва.
+
+        Args:
+            file_path (str): Путь к файлу.
+            object_name (str): Ключ объекта, по умолчанию имя файла.
+            part_size (int): Размер части в байтах.
+            concurrency (int): Одновременно загружаемых частей.
+
+        Returns:
+            str: ETag загруженного объекта.
+        """
+        object_name = object_name or os.path.basename(file_path)
+        stat = os.stat(file_path)
+        parts_count = max(1, math.ceil(stat.st_size / part_size))
+        source = {"object_name": object_name, "size": stat.st_size, "mtime": stat.st_mtime, "part_size": part_size}
+        state = TransferState(file_path + ".upload.json")
+        async with self.get_client() as client:
+            if state.data and all(state.data.get(key) == value for key, value in source.items()):
+                try:
+                    state.data["parts"] = await self._uploaded_parts(client, state)
+                    log.info(f"Resume upload of {object_name}, {len(state.data['parts'])}/{parts_count} parts done")
+                except ClientError as e:
+                    log.warning(f"Can not resume upload of {object_name}: {e}")
+                    state.data = {}
+            else:
+                state.data = {}
+            if not state.data:
+                # part-size нужен при скачивании, чтобы сверить ETag объекта из частей
+                response = await client.create_multipart_upload(Bucket=self.bucket_name, Key=object_name,
+                                                                Metadata={"part-size": str(part_size)})
+                state.data = {**source, "upload_id": response["UploadId"], "parts": {}}
+                state.save()
+            parts = state.data["parts"]
+            pool = BufferPool(part_size)
+
+            async def upload(part_number: int):
+                with pool.buffer() as buffer:
+                    length = await asyncio.to_thread(read_part_into, file_path, (part_number - 1) * part_size, buffer)
+                    md5 = hashlib.md5(memoryview(buffer)[:length])
+                    # botocore не принимает memoryview, целая часть уходит самим буфером,
+                    # копируется только последняя неполная часть
+                    data = buffer if length == len(buffer) else buffer[:length]
+                    with progress.part(length):
+                        await self._retry(
+                            f"Upload part {part_number} of {object_name}",
+                            lambda: client.upload_part(Bucket=self.bucket_name, Key=object_name,
+                                                       UploadId=state.data["upload_id"], PartNumber=part_number,
+                                                       Body=data, ContentMD5=base64.b64encode(md5.digest()).decode()),
+                            verify=lambda response: response["ETag"].strip('"') == md5.hexdigest())
+                parts[str(part_number)] = {"md5": md5.hexdigest()}
+                state.save()
+
+            with self._track(object_name, "upload", stat.st_size) as progress:
+                await run_window([number for number in range(1, parts_count + 1) if str(number) not in parts],
+                                 upload, concurrency)
+            part_md5s = [parts[str(number)]["md5"] for number in range(1, parts_count + 1)]
+            response = await self._retry(
+                f"Complete upload of {object_name}",
+                lambda: client.complete_multipart_upload(
+                    Bucket=self.bucket_name, Key=object_name, UploadId=state.data["upload_id"],
+                    MultipartUpload={"Parts": [{"PartNumber": number, "ETag": f'"{md5}"'}
+                                               for number, md5 in enumerate(part_md5s, start=1)]}))
+        etag = response["ETag"].strip('"')
+        if etag != multipart_etag(part_md5s):
+            raise TransferError(f"Uploaded object {object_name} has ETag {etag}, expected {multipart_etag(part_md5s)}")
+        state.clear()
+        log.info(f"File {object_name} uploaded to {self.bucket_name} in {parts_count} parts")
+        return etag
 
     async def upload_chunk(self, chunk: bytes, object_name: str):
         try:
@@ -56,39 +372,149 @@ class S3Client:
                     Key=object_name,
                     Body=chunk,
                 )
-                print(f"Chunk {object_name} uploaded to {self.bucket_name}")
+                log.info(f"Chunk {object_name} uploaded to {self.bucket_name}")
         except ClientError as e:
-            print(f"Error uploading chunk: {e}")
+            log.error(f"Error uploading chunk: {e}")
 
-    async def download_file_in_chunks(self, base_name: str, parts: int, destination_path: str):
-        with open(destination_path, "wb") as outfile:
-            for part_number in range(1, parts + 1):
-                object_name = f"{base_name}.part{part_number}"
-                try:
-                    async with self.get_client() as client:
-                        response = await client.get_object(Bucket=self.bucket_name, Key=object_name)
-                        data = await response["Body"].read()
-                        outfile.write(data)
-                        print(f"Downloaded {object_name} to {destination_path}")
-                except ClientError as e:
-                    print(f"Error downloading part {part_number}: {e}")
+    def _verify_download(self, destination_path: str, etag: str, part_md5s: List[str]) -> bool:
+        if "-" not in etag:
+            return file_md5(destination_path) == etag
+        if int(etag.rsplit("-", 1)[1]) != len(part_md5s):
+            # Объект загружен частями другого размера, сверить его ETag нельзя
+            log.warning(f"Can not verify ETag {etag} of {destination_path}, part size differs from upload")
+            return True
+        return multipart_etag(part_md5s) == etag
 
-async def main():
-    s3_client = S3Client(
-        access_key="6a80caeb53cb433da21014b2da5fb30d",
-        secret_key="33799c6dcd35450fa4df11fdaf09b8a4",
-        endpoint_url="https://s3.ru-1.storage.selcloud.ru",
-        bucket_name="6554674",
-    )
+    async def download_file_in_chunks(self, object_name: str, destination_path: str, part_size: int = None,
+                                      concurrency: int = CONCURRENCY) -> str:
+        """
+        Скачивает объект параллельными запросами диапазонов байт с продолжением после обрыва.
+
+        Args:
+            object_name (str): Ключ объекта.
+            destination_path (str): Путь к файлу назначения.
+            part_size (int): Размер части, по умолчанию размер частей при загрузке.
+            concurrency (int): Одновременно скачиваемых частей.
+
+        Returns:
+            str: Путь к скачанному файлу.
+        """
+        async with self.get_client() as client:
+            head = await self._retry(f"Head {object_name}",
+                                     lambda: client.head_object(Bucket=self.bucket_name, Key=object_name))
+            size, etag = head["ContentLength"], head["ETag"].strip('"')
+            part_size = part_size or int(head.get("Metadata", {}).get("part-size", CHUNK_SIZE))
+            parts_count = math.ceil(size / part_size)
+            state = TransferState(destination_path + ".download.json")
+            source = {"object_name": object_name, "etag": etag, "size": size, "part_size": part_size}
+            if not (state.data and all(state.data.get(key) == value for key, value in source.items())
+                    and os.path.exists(destination_path)):
+                # Файл сразу получает итоговый размер, части пишутся по своим смещениям
+                with open(destination_path, "wb") as file:
+                    file.truncate(size)
+                state.data = {**source, "parts": {}}
+                state.save()
+            parts = state.data["parts"]
+
+            async def download(part_number: int):
+                start = (part_number - 1) * part_size
+                length = min(size, start + part_size) - start
+
+                async def get() -> Tuple[int, str]:
+                    # If-Match: объект не должен измениться между частями
+                    response = await client.get_object(Bucket=self.bucket_name, Key=object_name,
+                                                       Range=f"bytes={start}-{start + length - 1}",
+                                                       IfMatch=head["ETag"])
+                    # Часть пишется по мере чтения из сокета, в памяти не больше одной порции
+                    md5, written = hashlib.md5(), 0
+                    with open(destination_path, "r+b") as file:
+                        file.seek(start)
+                        async with response["Body"] as body:
+                            while True:
+                                chunk = await body.read(STREAM_BUFFER_SIZE)
+                                if not chunk:
+                                    break
+                                md5.update(chunk)
+                                written += await asyncio.to_thread(file.write, chunk)
+                    return written, md5.hexdigest()
+
+                with progress.part(length):
+                    _, md5 = await self._retry(f"Download part {part_number} of {object_name}", get,
+                                               verify=lambda result: result[0] == length)
+                parts[str(part_number)] = {"md5": md5}
+                state.save()
+
+            with self._track(object_name, "download", size) as progress:
+                await run_window([number for number in range(1, parts_count + 1) if str(number) not in parts],
+                                 download, concurrency)
+        part_md5s = [parts[str(number)]["md5"] for number in range(1, parts_count + 1)]
+        if not await asyncio.to_thread(self._verify_download, destination_path, etag, part_md5s):
+            state.clear()
+            raise TransferError(f"Downloaded {object_name} does not match ETag {etag}")
+        state.clear()
+        log.info(f"Downloaded {object_name} to {destination_path} in {parts_count} parts")
+        return destination_path
+
+    async def get_objects(self, object_names: Iterable[str], concurrency: int = None) -> Dict[str, bytes]:
+        """
+        Параллельно читает объекты целиком, не больше concurrency запросов одновременно.
+
+        Args:
+            object_names (Iterable[str]): Ключи объектов.
+            concurrency (int): Одновременных запросов, по умолчанию размер пула соединений.
+
+        Returns:
+            Dict[str, bytes]: Содержимое по ключам.
+        """
+        object_names = list(dict.fromkeys(object_names))
+        objects = {}
+        async with self.get_client() as client:
 
-    # Загрузка .zip файла в части
-    await s3_client.upload_file_in_chunks("C:/App/ReactProject/domains/NaRuTagAI/server/data/audio.zip")
+            async def get(object_name: str):
+                async def read() -> bytes:
+                    response = await client.get_object(Bucket=self.bucket_name, Key=object_name)
+                    async with response["Body"] as body:
+                        return await body.read()
+
+                objects[object_name] = await self._retry(f"Get {object_name}", read)
+                progress.done += len(objects[object_name])
+
+            with self._track(f"{len(object_names)} objects", "download", 0) as progress:
+                await run_window(object_names, get, concurrency or self.max_pool_connections)
+        return objects
+
+    async def put_objects(self, objects: Dict[str, bytes], concurrency: int = None):
+        """
+        Параллельно записывает объекты, не больше concurrency запросов одновременно.
+
+        Args:
+            objects (Dict[str, bytes]): Содержимое по ключам.
+            concurrency (int): Одновременных запросов, по умолчанию размер пула соединений.
+        """
+        async with self.get_client() as client:
+
+            async def put(object_name: str):
+                data = objects[object_name]
+                with progress.part(len(data)):
+                    await self._retry(f"Put {object_name}", lambda: client.put_object(
+                        Bucket=self.bucket_name, Key=object_name, Body=data,
+                        ContentMD5=base64.b64encode(hashlib.md5(data).digest()).decode()))
+
+            total = sum(len(data) for data in objects.values())
+            with self._track(f"{len(objects)} objects", "upload", total) as progress:
+                await run_window(list(objects), put, concurrency or self.max_pool_connections)
+
+
+async def main():
+    async with S3Client.from_env() as s3_client:
+        # Загрузка .zip файла частями
+        await s3_client.upload_file_in_chunks("C:/App/ReactProject/domains/NaRuTagAI/server/data/audio.zip")
 
-    # Скачивание частей и сборка в единый файл
-    # await s3_client.download_file_in_chunks("audio.zip", part_number, "downloaded_audio.zip")
+        # Скачивание частями в один файл
+        # await s3_client.download_file_in_chunks("audio.zip", "downloaded_audio.zip")
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
     except Exception as e:
-        print(f"An error occurred: {e}")
+        log.exception(f"An error occurred: {e}")
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+from src import path_to_config
+from src.database.models import Predict, PredictBatchResult, Inference
+from src.repository import bulk_inference_repository
+from src.utils.config_parser import ConfigParser
+from src.utils.custom_logging import setup_logging
+from src.utils.list_to_str import encode_list_to_string
+
+log = setup_logging()
+config = ConfigParser.parse(path_to_config())
+
+BATCH_WORKERS = int(config["Predict"]["batch_workers"])
+BATCH_MAX_ITEMS = int(config["Predict"]["batch_max_items"])
+
+
+def check_batch_size(items: List[Predict]):
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Too many items in batch, max {BATCH_MAX_ITEMS}")
+
+
+async def predict_batch(items: List[Predict],
+                        predict: Callable[[Predict], Awaitable[Any]]) -> List[PredictBatchResult]:
+    """
+    Обрабатывает список ссылок не более чем BATCH_WORKERS одновременно, чтобы один
+    запрос не занимал все места контроля допуска (Admission.max_concurrency).
+
+    Ошибка одного элемента не прерывает остальные: она возвращается в поле error
+    этого элемента. Результаты переводятся в Inference (to_inferences) и сохраняются
+    одной транзакцией для видео с той же ссылкой (save_results).
+
+    Args:
+        items (List[Predict]): Ссылки на видео.
+        predict (Callable): Асинхронное предсказание для одной ссылки.
+
+    Returns:
+        List[PredictBatchResult]: Результаты в порядке items.
+    """
+    check_batch_size(items)
+    semaphore = asyncio.Semaphore(BATCH_WORKERS)
+
+    async def run(item: Predict) -> PredictBatchResult:
+        async with semaphore:
+            try:
+                return PredictBatchResult(url=item.Url, result=await predict(item))
+            except HTTPException as ex:
+                return PredictBatchResult(url=item.Url, error=str(ex.detail))
+            except Exception as ex:
+                log.exception(f"Error predict {item.Url}", exc_info=ex)
+                return PredictBatchResult(url=item.Url, error=str(ex) or type(ex).__name__)
+
+    results = await asyncio.gather(*[run(item) for item in items])
+    await run_in_threadpool(save_results, results)
+    return results
+
+
+def _labels(prediction: Any) -> List[str]:
+    # Модель возвращает список предсказанных меток - имен категорий и тегов
+    if not isinstance(prediction, list):
+        return []
+    return [label for label in prediction if isinstance(label, str)]
+
+
+def to_inferences(predictions: List[Any]) -> List[Optional[Inference]]:
+    """
+    Переводит ответы модели в модели Inference: имена категорий и тегов из списка
+    предсказанных меток заменяются их ID. Метки, которых нет в таксономии, пропускаются.
+
+    Args:
+        predictions (List[Any]): Ответы модели.
+
+    Returns:
+        List[Optional[Inference]]: Inference или None, если не найдено ни одной категории.
+    """
+    labels = [_labels(prediction) for prediction in predictions]
+    categories, tags = bulk_inference_repository.find_labels(label for names in labels for label in names)
+    inferences = []
+    for names in labels:
+        category_ids = list(dict.fromkeys(categories[name] for name in names if name in categories))
+        tag_ids = list(dict.fromkeys(tags[name] for name in names if name in tags))
+        inferences.append(Inference(category_ids=encode_list_to_string(category_ids),
+                                    tag_ids=encode_list_to_string(tag_ids) or None) if category_ids else None)
+    return inferences
+
+
+def save_results(results: List[PredictBatchResult]):
+    """
+    Сохраняет успешные предсказания для видео с теми же ссылками и проставляет InferenceID.
+    Если сохранить не удалось, ответ модели остается в result, а в error - причина.
+    """
+    predicted = [result for result in results if result.Error is None]
+    if not predicted:
+        return
+    try:
+        to_save = [(result.Url, inference)
+                   for result, inference in zip(predicted, to_inferences([result.Result for result in predicted]))
+                   if inference is not None]
+        ids = bulk_inference_repository.save_video_inferences(to_save)
+    except Exception as ex:
+        log.exception("Error saving batch inferences", exc_info=ex)
+        for result in predicted:
+            result.Error = "Prediction succeeded but was not saved"
+        return
+    for result in predicted:
+        result.InferenceID = ids.get(result.Url)
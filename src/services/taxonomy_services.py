@@ -0,0 +1,223 @@
+import os
+import io
+import csv
+import json
+import time
+import argparse
+from typing import IO, Iterable, Iterator, Optional, Tuple
+from src import path_to_config
+from src.database.my_connector import db
+from src.repository import taxonomy_repository
+from src.utils.config_parser import ConfigParser
+from src.utils.custom_logging import setup_logging
+
+log = setup_logging()
+config = ConfigParser.parse(path_to_config())
+
+IMPORT_CHUNK_SIZE = int(config["Taxonomy"]["import_chunk_size"])
+# Сколько строк с тегом из другой подкатегории возвращается в отчете импорта
+MAX_REPORTED_CONFLICTS = 100
+
+# Колонки CSV и ключи JSONL
+FIELDS = ("category", "subcategory", "tag")
+FORMATS = ("csv", "jsonl")
+
+Row = Tuple[str, Optional[str], Optional[str]]
+
+
+def format_from_name(filename: Optional[str], default: str = "csv") -> str:
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    return extension if extension in FORMATS else default
+
+
+def _clean(row: dict, line: int) -> Row:
+    category, subcategory, tag = ((str(row.get(field) or "").strip() or None) for field in FIELDS)
+    if category is None:
+        raise ValueError(f"Line {line}: category is required")
+    if tag is not None and subcategory is None:
+        raise ValueError(f"Line {line}: tag {tag!r} has no subcategory")
+    return category, subcategory, tag
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Row]:
+    """
+    Построчно читает таксономию из CSV (заголовок category,subcategory,tag) или JSONL.
+
+    Args:
+        stream (IO[str]): Текстовый поток.
+        fmt (str): csv или jsonl.
+
+    Yields:
+        Row: (категория, подкатегория или None, тег или None).
+
+    Raises:
+        ValueError: Если строка не соответствует формату.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is None or "category" not in reader.fieldnames:
+            raise ValueError("CSV header must contain category, subcategory, tag columns")
+        for line, row in enumerate(reader, start=2):
+            yield _clean(row, line)
+    elif fmt == "jsonl":
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line}: {e}")
+            if not isinstance(row, dict):
+                raise ValueError(f"Line {line}: object expected")
+            yield _clean(row, line)
+    else:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+
+
+class TaxonomyImport:
+    """
+    Массовый импорт категорий, подкатегорий и тегов.
+
+    Строки обрабатываются порциями по chunk_size, каждая порция - одна транзакция
+    из трех многострочных INSERT. ID уже записанных категорий и подкатегорий
+    и записанные теги запоминаются, поэтому повторы во входных данных не доходят
+    до базы. Существующие строки не меняются: тег, который уже хранится в другой
+    подкатегории или во входных данных встречается в нескольких, остается в первой,
+    остальные строки попадают в отчет. Счетчики считают только новые строки.
+
+    Методы:
+    - run: Импортировать строки и вернуть счетчики.
+    """
+
+    def __init__(self, chunk_size: int = IMPORT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._categories = {}
+        self._subcategories = {}
+        self._tags = {}
+        self._conflicts = []
+        self._counters = {"rows": 0, "duplicates": 0, "categories": 0, "subcategories": 0, "tags": 0,
+                          "conflicts": 0, "transactions": 0}
+
+    def _write(self, chunk: list):
+        # Имена сравниваются как в сопоставлении MySQL, иначе ID из базы не найдутся по ключу
+        key = taxonomy_repository.collation_key
+        with db.transaction() as connection:
+            with connection.cursor() as cursor:
+                categories = list({key(category): category for category, _, _ in chunk
+                                   if key(category) not in self._categories}.values())
+                if categories:
+                    stored, created = taxonomy_repository.upsert_categories(cursor, categories)
+                    self._categories.update({key(name): category_id for name, category_id in stored.items()})
+                    self._counters["categories"] += created
+                subcategories = {(self._categories[key(category)], key(subcategory)):
+                                 (self._categories[key(category)], subcategory)
+                                 for category, subcategory, _ in chunk if subcategory}
+                subcategories = [pair for pair_key, pair in subcategories.items()
+                                 if pair_key not in self._subcategories]
+                if subcategories:
+                    stored, created = taxonomy_repository.upsert_subcategories(cursor, subcategories)
+                    self._subcategories.update({(category_id, key(name)): subcategory_id
+                                                for (category_id, name), subcategory_id in stored.items()})
+                    self._counters["subcategories"] += created
+                # Имя тега уникально во всей таблице: тег остается в первой подкатегории - той,
+                # где он уже хранится в базе, или первой во входных данных; остальные строки - конфликты
+                tags, later = {}, []
+                for category, subcategory, tag in chunk:
+                    if tag:
+                        subcategory_id = self._subcategories[(self._categories[key(category)], key(subcategory))]
+                        tag_key = key(tag)
+                        if tag_key in self._tags or tag_key in tags:
+                            later.append((category, subcategory, tag, subcategory_id))
+                        else:
+                            tags[tag_key] = (subcategory_id, tag, category, subcategory)
+                if tags:
+                    stored, created = taxonomy_repository.insert_tags(
+                        cursor, [(subcategory_id, tag) for subcategory_id, tag, _, _ in tags.values()])
+                    for tag_key, (subcategory_id, tag, category, subcategory) in tags.items():
+                        self._tags[tag_key] = stored[tag]
+                        if stored[tag] != subcategory_id:
+                            self._conflict(category, subcategory, tag)
+                    self._counters["tags"] += created
+                for category, subcategory, tag, subcategory_id in later:
+                    if self._tags[key(tag)] != subcategory_id:
+                        self._conflict(category, subcategory, tag)
+        self._counters["transactions"] += 1
+
+    def _conflict(self, category: str, subcategory: str, tag: str):
+        self._counters["conflicts"] += 1
+        if len(self._conflicts) < MAX_REPORTED_CONFLICTS:
+            self._conflicts.append({"category": category, "subcategory": subcategory, "tag": tag})
+        log.warning(f"Tag {tag!r} already belongs to another subcategory, {category}/{subcategory} skipped")
+
+    def run(self, rows: Iterable[Row]) -> dict:
+        started = time.monotonic()
+        chunk, seen = [], set()
+        for row in rows:
+            self._counters["rows"] += 1
+            key = tuple(taxonomy_repository.collation_key(name) if name else name for name in row)
+            if key in seen:
+                self._counters["duplicates"] += 1
+                continue
+            seen.add(key)
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                self._write(chunk)
+                chunk = []
+        if chunk:
+            self._write(chunk)
+        self._counters["seconds"] = round(time.monotonic() - started, 3)
+        log.info(f"Taxonomy imported: {self._counters}")
+        return {**self._counters, "conflicting_tags": list(self._conflicts)}
+
+
+def import_taxonomy(stream: IO[str], fmt: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Импортирует таксономию из текстового потока CSV или JSONL.
+
+    Returns:
+        dict: Счетчики прочитанных строк, повторов и записанных сущностей
+            и строки с тегами, которые уже принадлежат другой подкатегории.
+    """
+    return TaxonomyImport(chunk_size).run(read_rows(stream, fmt))
+
+
+def export_taxonomy(fmt: str) -> Iterator[str]:
+    """
+    Отдает всю таксономию в CSV или JSONL порциями строк, не загружая ее в память.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {', '.join(FORMATS)}")
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        for rows in taxonomy_repository.stream_taxonomy():
+            writer.writerows([row[field] for field in FIELDS] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.getvalue():
+            yield buffer.getvalue()
+    else:
+        for rows in taxonomy_repository.stream_taxonomy():
+            yield "".join(json.dumps({field: row[field] for field in FIELDS}, ensure_ascii=False) + "\n"
+                          for row in rows)
+
+
+if __name__ == "__main__":
+    # python -m src.services.taxonomy_services import taxonomy.csv
+    # python -m src.services.taxonomy_services export taxonomy.jsonl
+    parser = argparse.ArgumentParser(description="Bulk import/export of categories, subcategories and tags")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default=None)
+    parser.add_argument("--chunk_size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    file_format = args.format or format_from_name(args.path)
+    if args.action == "import":
+        with open(args.path, "r", encoding="utf-8", newline="") as f:
+            import_taxonomy(f, file_format, args.chunk_size)
+    else:
+        with open(args.path, "w", encoding="utf-8", newline="") as f:
+            for text in export_taxonomy(file_format):
+                f.write(text)
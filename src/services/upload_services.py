@@ -0,0 +1,296 @@
+import os
+import math
+import time
+import asyncio
+import hashlib
+from uuid import uuid4
+from typing import AsyncIterator, Optional, Tuple
+from fastapi import HTTPException, status
+from src import path_to_config
+from src.database.models import UploadInit, UploadSession, UploadStatus
+from src.repository import upload_repository
+from src.utils.config_parser import ConfigParser
+from src.utils.custom_logging import setup_logging
+from src.utils.write_file_into_server import (upload_dir, store_file, release_file_from_server, file_extension,
+                                              CHUNK_SIZE)
+
+log = setup_logging()
+config = ConfigParser.parse(path_to_config())
+
+DEFAULT_CHUNK_SIZE = int(config["Upload"]["default_chunk_size"])
+MAX_CHUNK_SIZE = int(config["Upload"]["max_chunk_size"])
+MAX_SIZE = int(config["Upload"]["max_size"])
+CHUNK_CLAIM_TIMEOUT = int(config["Upload"]["chunk_claim_timeout"])
+EXPIRE_AFTER = int(config["Upload"]["expire_after"])
+
+"""
+
+Возобновляемая загрузка больших видео частями: init -> PUT части N по смещению
+N * chunk_size -> complete. Части пишутся сразу по своему смещению в файл,
+созданный с итоговым размером (разреженный), поэтому их можно слать в любом
+порядке и параллельно, а после обрыва - дослать только недостающие (missing
+в состоянии загрузки). Каждая часть хешируется при записи, sha256 части
+сверяется с заголовком клиента и сохраняется в upload_chunks. При complete файл
+хешируется целиком и переносится в хранилище по содержимому (write_file_into_server).
+Часть пишет один запрос, и пока она пишется, загрузка не завершается (upload_repository).
+Загрузки без активности дольше Upload.expire_after удаляет UploadExpiry.
+
+"""
+
+
+def part_path(session: dict) -> str:
+    return os.path.join(upload_dir(session["name_object"]), f".{session['id']}.upload")
+
+
+def _create_sparse(path: str, size: int):
+    with open(path, "wb") as file:
+        file.truncate(size)
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def chunks_total(session: dict) -> int:
+    return math.ceil(session["size"] / session["chunk_size"])
+
+
+async def _session(upload_id: str) -> dict:
+    session = await upload_repository.get_upload(upload_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Upload {upload_id} not found")
+    return session
+
+
+async def get_upload(upload_id: str) -> UploadSession:
+    """
+    Состояние загрузки: принятые байты и номера недостающих частей.
+    """
+    session = await _session(upload_id)
+    chunks = await upload_repository.get_chunks(upload_id)
+    received = {chunk["chunk_index"] for chunk in chunks}
+    return UploadSession(id=session["id"], filename=session["filename"], size=session["size"],
+                         chunk_size=session["chunk_size"], chunks_total=chunks_total(session),
+                         received_bytes=session["size"] if session["status"] == UploadStatus.COMPLETED
+                         else sum(chunk["size"] for chunk in chunks),
+                         missing=[index for index in range(chunks_total(session)) if index not in received]
+                         if session["status"] != UploadStatus.COMPLETED else [],
+                         status=session["status"], stored_filename=session["stored_filename"])
+
+
+async def create_upload(upload: UploadInit) -> UploadSession:
+    """
+    Начинает загрузку: создает файл итогового размера и запись сессии.
+
+    Args:
+        upload (UploadInit): Имя, размер, размер части и ожидаемый sha256 файла.
+
+    Returns:
+        UploadSession: Состояние новой загрузки.
+    """
+    file_extension(upload.Filename)
+    if upload.Size > MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f"File is too large, max {MAX_SIZE} bytes")
+    chunk_size = upload.ChunkSize or DEFAULT_CHUNK_SIZE
+    if chunk_size > MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Chunk size is too large, max {MAX_CHUNK_SIZE}")
+    session = {"id": str(uuid4()), "name_object": upload.NameObject, "filename": upload.Filename,
+               "size": upload.Size, "chunk_size": chunk_size, "sha256": upload.Sha256,
+               "updated_at": int(time.time())}
+    await asyncio.to_thread(_create_sparse, part_path(session), upload.Size)
+    await upload_repository.create_upload(session)
+    log.info(f"Upload {session['id']} started: {upload.Filename}, {upload.Size} bytes")
+    return await get_upload(session["id"])
+
+
+async def write_chunk(upload_id: str, index: int, offset: int, body: AsyncIterator[bytes],
+                      checksum: Optional[str] = None) -> UploadSession:
+    """
+    Потоково пишет часть index по ее смещению, в памяти только текущая порция тела запроса.
+
+    Args:
+        upload_id (str): ID загрузки.
+        index (int): Номер части с нуля.
+        offset (int): Смещение части, должно быть index * chunk_size.
+        body (AsyncIterator[bytes]): Тело запроса.
+        checksum (Optional[str]): Ожидаемый sha256 части.
+
+    Returns:
+        UploadSession: Состояние загрузки после записи части.
+    """
+    session = await _session(upload_id)
+    if session["status"] != UploadStatus.OPEN:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Upload {upload_id} is {session['status']}, chunks are not accepted")
+    if not 0 <= index < chunks_total(session):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Chunk index must be in [0, {chunks_total(session)})")
+    if offset != index * session["chunk_size"]:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Chunk {index} must start at offset {index * session['chunk_size']}")
+    length = min(session["chunk_size"], session["size"] - offset)
+    # Пока часть пишется, она считается недостающей: неудачная повторная отправка
+    # уже принятой части портит ее байты на диске
+    writer, now = str(uuid4()), int(time.time())
+    if not await upload_repository.claim_chunk(upload_id, index, writer, now, now - CHUNK_CLAIM_TIMEOUT):
+        session = await _session(upload_id)
+        if session["status"] != UploadStatus.OPEN:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail=f"Upload {upload_id} is {session['status']}, chunks are not accepted")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Chunk {index} is being written by another request")
+    try:
+        digest, written = await _write_part(session, index, offset, length, body)
+        if checksum is not None and checksum.lower() != digest:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Chunk {index} checksum mismatch")
+    except BaseException:
+        await upload_repository.release_chunk(upload_id, index, writer)
+        raise
+    # Часть засчитывается, только если после записи она все еще занята этим запросом
+    # (загрузку не отменили и брошенную запись не перехватили)
+    if not await upload_repository.save_chunk(upload_id, index, writer, written, digest):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail=f"Upload {upload_id} changed while chunk {index} was written, send it again")
+    return await get_upload(upload_id)
+
+
+async def _write_part(session: dict, index: int, offset: int, length: int,
+                      body: AsyncIterator[bytes]) -> Tuple[str, int]:
+    digest, written = hashlib.sha256(), 0
+    file = await asyncio.to_thread(open, part_path(session), "r+b")
+    try:
+        await asyncio.to_thread(file.seek, offset)
+        async for piece in body:
+            written += len(piece)
+            if written > length:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"Chunk {index} is larger than {length} bytes")
+            digest.update(piece)
+            await asyncio.to_thread(file.write, piece)
+    finally:
+        await asyncio.to_thread(file.close)
+    if written != length:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Chunk {index} has {written} bytes, expected {length}")
+    return digest.hexdigest(), written
+
+
+async def complete_upload(upload_id: str) -> UploadSession:
+    """
+    Завершает загрузку, когда приняты все части: сверяет sha256 файла
+    и переносит его в хранилище по содержимому. Повторный вызов возвращает то же состояние.
+
+    Args:
+        upload_id (str): ID загрузки.
+
+    Returns:
+        UploadSession: Состояние завершенной загрузки.
+    """
+    session = await _session(upload_id)
+    if session["status"] != UploadStatus.COMPLETED:
+        state = await get_upload(upload_id)
+        if state.Missing:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail=f"Upload {upload_id} misses {len(state.Missing)} chunks, "
+                                       f"first {state.Missing[0]}")
+        # Завершает только один из параллельных вызовов и только когда ни одна часть не пишется,
+        # части после этого не принимаются
+        if not await upload_repository.claim_upload(upload_id, int(time.time())):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail=f"Upload {upload_id} is already being completed or chunks are being written")
+        try:
+            # Между проверкой и захватом часть могли отправить заново
+            state = await get_upload(upload_id)
+            if state.Missing:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                    detail=f"Upload {upload_id} misses chunk {state.Missing[0]}")
+            path = part_path(session)
+            sha256 = await asyncio.to_thread(_sha256, path)
+            if session["sha256"] and session["sha256"] != sha256:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                    detail=f"File sha256 {sha256} does not match expected {session['sha256']}")
+            session["stored_filename"] = await store_file(session["name_object"], path, sha256,
+                                                          file_extension(session["filename"]), session["size"])
+        except BaseException:
+            await upload_repository.reopen_upload(upload_id)
+            raise
+        if os.path.exists(path):
+            # Такое содержимое уже хранилось: store_file только добавил ссылку на него
+            await asyncio.to_thread(os.remove, path)
+        await upload_repository.complete_upload(upload_id, session["stored_filename"])
+        log.info(f"Upload {upload_id} completed as {session['name_object']}/{session['stored_filename']}")
+    return await get_upload(upload_id)
+
+
+async def abort_upload(upload_id: str):
+    """
+    Отменяет незавершенную загрузку и удаляет ее файл. Для завершенной загрузки
+    удаляет ссылку на сохраненный файл, файл удаляется вместе с последней ссылкой.
+    """
+    session = await _session(upload_id)
+    if session["status"] == UploadStatus.COMPLETING:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Upload {upload_id} is being completed")
+    # Ссылку освобождает и файл удаляет только тот вызов, который удалил сессию
+    if not await upload_repository.delete_upload(upload_id, session["status"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Upload {upload_id} not found")
+    await _release(session)
+
+
+async def _release(session: dict):
+    if session["status"] == UploadStatus.COMPLETED:
+        await release_file_from_server(session["name_object"], session["stored_filename"])
+    elif os.path.exists(part_path(session)):
+        await asyncio.to_thread(os.remove, part_path(session))
+
+
+async def expire_uploads(limit: int = 100) -> int:
+    """
+    Удаляет загрузки без активности дольше Upload.expire_after вместе с их разреженными файлами.
+
+    Returns:
+        int: Количество удаленных загрузок.
+    """
+    expired = 0
+    for session in await upload_repository.expired_uploads(int(time.time()) - EXPIRE_AFTER, limit):
+        if await upload_repository.delete_upload(session["id"], session["status"]):
+            await _release(session)
+            expired += 1
+    if expired:
+        log.info(f"Expired {expired} abandoned uploads")
+    return expired
+
+
+class UploadExpiry:
+    """
+    Периодическое удаление брошенных загрузок.
+
+    Методы:
+    - start/stop: Запустить/остановить проверку раз в interval секунд.
+    """
+
+    def __init__(self, interval: float = 3600):
+        self.interval = interval
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await expire_uploads()
+            except Exception as ex:
+                log.exception("Error expiring uploads", exc_info=ex)
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,109 @@
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+from fastapi import HTTPException, status
+
+# Приоритеты в порядке обслуживания: вызовы сервера раньше публичных
+PRIORITIES = ("server", "public")
+
+
+class AdmissionController:
+    """
+    Контроль допуска и сброс нагрузки для предсказаний.
+
+    Одновременно выполняется не больше max_concurrency предсказаний, остальные ждут
+    в очереди, причем ожидающие вызовы сервера получают место раньше публичных.
+    Новый вызов сразу получает 503, если очередь длиннее max_queue или оценка
+    ожидания (очередь * среднее время предсказания / max_concurrency) больше
+    max_wait секунд. Для публичных вызовов пороги умножаются на public_share,
+    поэтому при перегрузке они отсекаются первыми.
+
+    Методы:
+    - run: Выполнить предсказание после допуска.
+    - stats: Текущая очередь, оценка ожидания и доля отказов.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 64, max_wait: float = 30,
+                 public_share: float = 0.5):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.public_share = public_share
+        self._in_flight = 0
+        self._waiters = {priority: deque() for priority in PRIORITIES}
+        # Экспоненциальные скользящие средние времени предсказания и ожидания в очереди
+        self._service_time = 1.0
+        self._queue_wait = 0.0
+        self._counters = {"admitted": 0, "rejected": 0}
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def estimated_wait(self, queued: int) -> float:
+        if self._in_flight < self.max_concurrency and queued == 0:
+            return 0.0
+        return (queued + 1) * self._service_time / self.max_concurrency
+
+    def _admit(self, priority: str):
+        share = 1.0 if priority == "server" else self.public_share
+        # Публичный вызов встает за всеми ожидающими, серверный - только за серверными
+        ahead = self.queued if priority == "public" else len(self._waiters["server"])
+        wait = self.estimated_wait(ahead)
+        if ahead >= self.max_queue * share or wait > self.max_wait * share:
+            self._counters["rejected"] += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Server is overloaded, try again later",
+                                headers={"Retry-After": str(max(1, math.ceil(wait)))})
+        self._counters["admitted"] += 1
+
+    async def _acquire(self, priority: str):
+        if self._in_flight < self.max_concurrency and self.queued == 0:
+            self._in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Место уже было передано этому вызову - возвращаем его
+                self._release()
+            else:
+                self._waiters[priority].remove(future)
+            raise
+
+    def _release(self):
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    # Место передается ожидающему без уменьшения _in_flight
+                    future.set_result(None)
+                    return
+        self._in_flight -= 1
+
+    async def run(self, priority: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._admit(priority)
+        submitted = time.monotonic()
+        await self._acquire(priority)
+        started = time.monotonic()
+        self._queue_wait = 0.9 * self._queue_wait + 0.1 * (started - submitted)
+        try:
+            return await fn()
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.monotonic() - started)
+            self._release()
+
+    def stats(self) -> dict:
+        total = self._counters["admitted"] + self._counters["rejected"]
+        return {"in_flight": self._in_flight,
+                "queued": {priority: len(waiters) for priority, waiters in self._waiters.items()},
+                "estimated_wait": round(self.estimated_wait(self.queued), 3),
+                "queue_wait_avg": round(self._queue_wait, 3),
+                "service_time_avg": round(self._service_time, 3),
+                "rejection_rate": round(self._counters["rejected"] / total, 4) if total else 0,
+                **self._counters}
@@ -0,0 +1,84 @@
+from typing import Any, Callable, List, NamedTuple, Optional
+from fastapi import HTTPException, Security, status
+from fastapi.security import APIKeyHeader
+from starlette.concurrency import run_in_threadpool
+from src.database.my_async_connector import async_db
+from src.utils.ttl_cache import TTLCache, MISSING
+
+api_key_header = APIKeyHeader(name="X-API-Key")
+
+# Ответы проверки, которые означают недействительный ключ и кешируются как отрицательные
+INVALID_KEY_STATUSES = (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN, status.HTTP_404_NOT_FOUND)
+
+
+class InvalidKey(NamedTuple):
+    """
+    Отрицательная запись кеша: из нее на каждое попадание создается новое исключение,
+    чтобы не пробрасывать повторно один объект с растущим traceback
+    """
+    status_code: int
+    detail: Any
+    headers: Optional[dict]
+
+    def error(self) -> HTTPException:
+        return HTTPException(status_code=self.status_code, detail=self.detail, headers=self.headers)
+
+
+class APIKeyValidator:
+    """
+    Зависимость FastAPI, кеширующая результат проверки API ключа.
+
+    Действительный ключ хранится ttl секунд, недействительный - negative_ttl секунд,
+    поэтому на попадании в кеш не нужны ни запрос к базе, ни расшифровка Fernet.
+    При изменении или удалении ключа запись сбрасывается сразу.
+
+    Методы:
+    - __call__: Проверить ключ из заголовка X-API-Key.
+    - invalidate: Сбросить записи для ключей.
+    - clear: Очистить кеш.
+    - key_by_id: Найти ключ по его ID в базе, чтобы сбросить его после изменения.
+    - keys_by_user: Найти все ключи пользователя, чтобы сбросить их при его удалении.
+    - stats: Размер кеша и счетчики попаданий/промахов.
+    """
+
+    def __init__(self, validate: Callable[[str], Any], max_size: int = 10000, ttl: float = 300,
+                 negative_ttl: float = 30):
+        self.validate = validate
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    async def __call__(self, api_key: str = Security(api_key_header)) -> Any:
+        cached = self._cache.get(api_key)
+        if cached is not MISSING:
+            if isinstance(cached, InvalidKey):
+                raise cached.error()
+            return cached
+        try:
+            data = await run_in_threadpool(self.validate, api_key)
+        except HTTPException as ex:
+            if ex.status_code in INVALID_KEY_STATUSES:
+                self._cache.set(api_key, InvalidKey(ex.status_code, ex.detail, ex.headers), ttl=self.negative_ttl)
+            raise
+        self._cache.set(api_key, data)
+        return data
+
+    def invalidate(self, *api_keys: Optional[str]):
+        for api_key in api_keys:
+            if api_key is not None:
+                self._cache.pop(api_key)
+
+    def clear(self):
+        self._cache.clear()
+
+    @staticmethod
+    async def key_by_id(api_key_id: int) -> Optional[str]:
+        row = await async_db.fetch_one("SELECT api_key FROM api_keys WHERE id = %s", (api_key_id,))
+        return row["api_key"] if row else None
+
+    @staticmethod
+    async def keys_by_user(user_id: int) -> List[str]:
+        rows = await async_db.fetch_all("SELECT api_key FROM api_keys WHERE user_id = %s", (user_id,))
+        return [row["api_key"] for row in rows]
+
+    def stats(self) -> dict:
+        return self._cache.stats()
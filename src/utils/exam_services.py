@@ -1,49 +1,134 @@
-from typing import Callable, List, Any
-from fastapi import HTTPException, status
+import re
+from typing import Any, Callable, List, Optional, Union
+from fastapi import HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from pymysql.err import IntegrityError
+from src.database.my_connector import db
 from src.utils.custom_logging import setup_logging
 
 log = setup_logging()
 
+# Имена таблиц и колонок подставляются в запрос напрямую, поэтому допускаем только идентификаторы
+IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
 
-def check_for_duplicates(
+# Источник строк: имя таблицы (запрос по индексу) или, как раньше, функция get_all
+Source = Union[str, Callable[[], List[Any]]]
+
+# Код ошибки MySQL: нарушен уникальный ключ
+DUPLICATE_ENTRY = 1062
+
+
+def _check_identifiers(*names: str):
+    for name in names:
+        if not IDENTIFIER.match(name):
+            raise ValueError(f"Invalid SQL identifier: {name}")
+
+
+def _find_id(
+    table: str,
+    column: str,
+    value: Any,
+    exclude_id: Optional[int] = None
+) -> Optional[int]:
+    _check_identifiers(table, column)
+    # Сравнение идет по индексу и по правилам сопоставления колонки (без учета регистра
+    # и пробелов в конце), то есть так же, как уникальный ключ проверяет INSERT
+    query = f"SELECT `id` FROM `{table}` WHERE `{column}` = %s"
+    params = [value]
+    if exclude_id is not None:
+        query += " AND `id` <> %s"
+        params.append(int(exclude_id))
+    row = db.fetch_one(query + " LIMIT 1", params)
+    return row["id"] if row else None
+
+
+def _scan_id(
     get_all: Callable[[], List[Any]],
+    attr_name: str,
+    attr_value: Any,
+    exclude_id: Optional[int] = None
+) -> Optional[int]:
+    for item in get_all():
+        if exclude_id is not None and int(item.ID) == int(exclude_id):
+            continue
+        if getattr(item, attr_name) == attr_value:
+            return item.ID
+    return None
+
+
+def exists(
+    table: str,
+    column: str,
+    value: Any,
+    exclude_id: Optional[int] = None
+) -> bool:
+    """
+    Проверяет наличие строки с column = value одним запросом по индексу.
+    Значения сравниваются по сопоставлению колонки (utf8mb4_general_ci): без учета
+    регистра и пробелов в конце, как taxonomy_repository.collation_key.
+
+    Args:
+        table (str): Имя таблицы.
+        column (str): Имя проверяемой колонки.
+        value (Any): Искомое значение.
+        exclude_id (int): ID строки, которую не нужно учитывать (при обновлении).
+
+    Returns:
+        bool: True, если такая строка есть.
+    """
+    return _find_id(table, column, value, exclude_id) is not None
+
+
+def _lookup(get_all: Source, attr_name: str, attr_value: Any, exclude_id: Optional[int] = None) -> Optional[int]:
+    if isinstance(get_all, str):
+        return _find_id(get_all, attr_name, attr_value, exclude_id)
+    return _scan_id(get_all, attr_name, attr_value, exclude_id)
+
+
+def check_for_duplicates(
+    get_all: Source,
     check_id: int,
     attr_name: str,
     attr_value: Any,
     exception_detail: str
 ):
-    existing_items = get_all()
-    for item in existing_items:
-        if int(item.ID) == int(check_id):
-            continue
-        if getattr(item, attr_name) == attr_value:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=exception_detail)
+    """
+    get_all - имя таблицы (тогда attr_name - колонка) или функция, возвращающая все записи
+    (тогда attr_name - атрибут модели, записи перебираются в Python).
+    """
+    if _lookup(get_all, attr_name, attr_value, exclude_id=check_id) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=exception_detail)
 
 
 def check_if_exists(
-    get_all: Callable[[], List[Any]],
+    get_all: Source,
     attr_name: str,
     attr_value: Any,
     exception_detail: str,
 ):
-    existing_items = get_all()
-    for item in existing_items:
-        if getattr(item, attr_name) == attr_value:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=exception_detail
-            )
+    if _lookup(get_all, attr_name, attr_value) is not None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=exception_detail
+        )
 
 
 def return_id_if_exists(
-    get_all: Callable[[], List[Any]],
+    get_all: Source,
     attr_name: str,
     attr_value: Any
-):
-    existing_items = get_all()
-    for item in existing_items:
-        if getattr(item, attr_name) == attr_value:
-            return item.ID
-    return None
+) -> Optional[int]:
+    return _lookup(get_all, attr_name, attr_value)
+
+
+async def duplicate_entry_handler(request: Request, ex: IntegrityError):
+    """
+    Нарушение уникального ключа при записи (параллельный запрос успел раньше проверки)
+    возвращается клиенту как 409, остальные ошибки целостности - как и раньше, 500.
+    """
+    if ex.args and ex.args[0] == DUPLICATE_ENTRY:
+        log.warning(f"Duplicate entry on {request.url.path}: {ex.args[1] if len(ex.args) > 1 else ex}")
+        return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": "Already exists"})
+    raise ex
@@ -1,16 +1,93 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 import bcrypt
+from src import path_to_config
+from src.utils.config_parser import ConfigParser
 
+config = ConfigParser.parse(path_to_config())
 
-def hash_password(password: str) -> bytes:
-    salt = bcrypt.gensalt()
+# Стоимость bcrypt (2^rounds итераций), можно менять для замеров
+BCRYPT_ROUNDS = int(config["Hashing"]["bcrypt_rounds"])
+
+
+def _hashpw(password: str) -> bytes:
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     pwd_bytes: bytes = password.encode()
     return bcrypt.hashpw(pwd_bytes, salt)
 
 
-def validate_password(password: str, hashed_password: str) -> bool:
+def _checkpw(password: str, hashed_password: str) -> bool:
     # Преобразуем хэш пароля из строки в байты, если он хранится в виде строки
     if isinstance(hashed_password, str):
         hashed_password = hashed_password.encode('utf-8')  # Преобразуем строку в байты
 
     # Преобразуем пароль в байты и сравниваем с хэшированным паролем
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+class HashingPool:
+    """
+    Отдельный пул потоков для bcrypt, чтобы хеширование не занимало общие потоки.
+
+    В пуле выполняется только сам bcrypt: сервисы регистрации и входа работают
+    в обычном пуле потоков и ждут здесь лишь хеш или проверку пароля.
+    bcrypt отпускает GIL, поэтому workers потоков хешируют параллельно.
+    Одновременно принимается не больше max_concurrency операций, остальные ждут.
+    Время ожидания в очереди и время самого хеширования считаются отдельно.
+
+    Методы:
+    - call: Выполнить функцию в пуле и дождаться результата в вызывающем потоке.
+    - stats: Средние и максимальные времена ожидания и хеширования.
+    """
+
+    def __init__(self, workers: int = 4, max_concurrency: int = 16):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._counters = {"operations": 0, "wait_total": 0.0, "wait_max": 0.0,
+                          "hash_total": 0.0, "hash_max": 0.0}
+
+    def _timed(self, submitted: float, fn: Callable, *args) -> Any:
+        started = time.monotonic()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.monotonic()
+            with self._lock:
+                self._counters["operations"] += 1
+                self._counters["wait_total"] += started - submitted
+                self._counters["wait_max"] = max(self._counters["wait_max"], started - submitted)
+                self._counters["hash_total"] += finished - started
+                self._counters["hash_max"] = max(self._counters["hash_max"], finished - started)
+
+    def call(self, fn: Callable, *args) -> Any:
+        submitted = time.monotonic()
+        with self._semaphore:
+            return self._executor.submit(self._timed, submitted, fn, *args).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            operations = self._counters["operations"]
+            return {"operations": operations,
+                    "workers": self.workers,
+                    "bcrypt_rounds": BCRYPT_ROUNDS,
+                    "wait_avg": round(self._counters["wait_total"] / operations, 4) if operations else 0,
+                    "wait_max": round(self._counters["wait_max"], 4),
+                    "hash_avg": round(self._counters["hash_total"] / operations, 4) if operations else 0,
+                    "hash_max": round(self._counters["hash_max"], 4)}
+
+
+hashing_pool = HashingPool(workers=int(config["Hashing"]["workers"]),
+                           max_concurrency=int(config["Hashing"]["max_concurrency"]))
+
+
+def hash_password(password: str) -> bytes:
+    return hashing_pool.call(_hashpw, password)
+
+
+def validate_password(password: str, hashed_password: str) -> bool:
+    return hashing_pool.call(_checkpw, password, hashed_password)
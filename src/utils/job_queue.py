@@ -0,0 +1,182 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional
+from uuid import uuid4
+from src.database.models import JobStatus
+from src.utils.custom_logging import setup_logging
+
+log = setup_logging()
+
+
+class QueueFullError(Exception):
+    """
+    В очереди уже max_queued задач
+    """
+
+
+class Job:
+    """
+    Задача очереди: входные данные, состояние и результат
+    """
+
+    def __init__(self, payload: Any, owner: Optional[str] = None):
+        self.id = str(uuid4())
+        self.payload = payload
+        self.owner = owner
+        self.status = JobStatus.QUEUED
+        self.result = None
+        self.error = None
+        self.attempts = 0
+        self.created_at = datetime.now()
+        self.finished_at = None
+        self.finished_monotonic = None
+
+    def dump(self) -> dict:
+        return {"id": self.id, "status": self.status, "result": self.result, "error": self.error,
+                "attempts": self.attempts, "created_at": self.created_at, "finished_at": self.finished_at}
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JobStatus.DONE, JobStatus.FAILED, JobStatus.CANCELLED)
+
+
+class JobQueue:
+    """
+    Очередь фоновых задач внутри процесса.
+
+    Задачи выполняют workers фоновых обработчиков, то есть не больше workers
+    одновременно. Упавшая задача повторяется до max_retries раз с удваивающейся
+    задержкой. Задачу можно отменить и в очереди, и во время выполнения.
+    Завершенные задачи хранятся keep_finished секунд. Задача с владельцем (API ключ)
+    видна и отменяется только по тому же владельцу.
+
+    Методы:
+    - start: Запустить обработчики.
+    - stop: Остановить обработчики.
+    - submit: Поставить задачу в очередь и сразу вернуть ее.
+    - get: Получить задачу по ID (с проверкой владельца).
+    - cancel: Отменить задачу (с проверкой владельца).
+    - stats: Количество задач по состояниям.
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[Any]], workers: int = 2, max_retries: int = 2,
+                 retry_backoff: float = 5, max_queued: int = 1000, keep_finished: float = 3600):
+        self.handler = handler
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._jobs: Dict[str, Job] = {}
+        # Индексы, чтобы submit не перебирал все задачи: ожидающие задачи
+        # и завершенные в порядке завершения
+        self._queued: Dict[str, Job] = {}
+        self._finished: Dict[str, Job] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._queue = None
+        self._workers = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, payload: Any, owner: Optional[str] = None) -> Job:
+        self._purge()
+        if len(self._queued) >= self.max_queued:
+            raise QueueFullError(f"Job queue is full ({self.max_queued})")
+        job = Job(payload, owner)
+        self._jobs[job.id] = job
+        self._queued[job.id] = job
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        """
+        Задача по ID. Если задан owner, чужая задача не отличается от несуществующей.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        return job
+
+    def cancel(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        job = self.get(job_id, owner)
+        if job is None or job.finished:
+            return job
+        self._finish(job, JobStatus.CANCELLED)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return job
+
+    def _finish(self, job: Job, status: JobStatus, result: Any = None, error: str = None):
+        self._queued.pop(job.id, None)
+        self._finished[job.id] = job
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = datetime.now()
+        job.finished_monotonic = time.monotonic()
+
+    def _purge(self):
+        # Завершенные задачи упорядочены по времени завершения, проверяем только самые старые
+        border = time.monotonic() - self.keep_finished
+        while self._finished:
+            job = next(iter(self._finished.values()))
+            if job.finished_monotonic >= border:
+                break
+            del self._finished[job.id]
+            del self._jobs[job.id]
+
+    def _retry_later(self, job: Job):
+        delay = self.retry_backoff * 2 ** (job.attempts - 1)
+        asyncio.get_running_loop().call_later(delay, self._queue.put_nowait, job.id)
+
+    async def _work(self):
+        while True:
+            job = self._jobs.get(await self._queue.get())
+            # Задача могла быть отменена или удалена, пока ждала в очереди
+            if job is None or job.status != JobStatus.QUEUED:
+                continue
+            job.status = JobStatus.RUNNING
+            self._queued.pop(job.id, None)
+            job.attempts += 1
+            task = asyncio.create_task(self.handler(job.payload))
+            self._running[job.id] = task
+            try:
+                result = await task
+                if job.status != JobStatus.CANCELLED:
+                    self._finish(job, JobStatus.DONE, result=result)
+            except asyncio.CancelledError:
+                if job.status != JobStatus.CANCELLED:
+                    # Отменен сам обработчик (остановка сервера), а не задача
+                    task.cancel()
+                    raise
+            except Exception as ex:
+                if job.status == JobStatus.CANCELLED:
+                    continue
+                error = str(getattr(ex, "detail", None) or ex) or type(ex).__name__
+                if job.attempts <= self.max_retries:
+                    log.warning(f"Job {job.id} failed ({error}), retry {job.attempts}/{self.max_retries}")
+                    job.status = JobStatus.QUEUED
+                    self._queued[job.id] = job
+                    job.error = error
+                    self._retry_later(job)
+                else:
+                    log.exception(f"Job {job.id} failed", exc_info=ex)
+                    self._finish(job, JobStatus.FAILED, error=error)
+            finally:
+                self._running.pop(job.id, None)
+
+    def stats(self) -> dict:
+        counts = {status.value: 0 for status in JobStatus}
+        for job in self._jobs.values():
+            counts[job.status.value] += 1
+        return {**counts, "workers": self.workers}
@@ -1,3 +1,9 @@
+import re
+
+# Формат "число,число,..."
+NUMBERS_STRING = re.compile(r"\d+(,\d+)*")
+
+
 def encode_list_to_string(numbers_list):
     """
     Функция принимает список чисел и возвращает строку,
@@ -27,8 +33,8 @@ def decode_string_to_list(numbers_string):
     Raises:
         ValueError: Если строка не соответствует формату.
     """
-    # Проверяем, что строка не пустая и состоит только из чисел и запятых
-    if not numbers_string or not all(char.isdigit() or char == ',' for char in numbers_string):
+    # Проверяем строку одним регулярным выражением, а не посимвольно
+    if not numbers_string or not NUMBERS_STRING.fullmatch(numbers_string):
         raise ValueError("Строка не соответствует формату 'число,число,...'")
 
     # Разделяем строку по запятым и преобразуем элементы обратно в числа
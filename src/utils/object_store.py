@@ -0,0 +1,34 @@
+from typing import TYPE_CHECKING, Optional
+from src import path_to_config
+from src.utils.config_parser import ConfigParser
+
+if TYPE_CHECKING:
+    from src.script.selectel_cloud import S3Client
+
+config = ConfigParser.parse(path_to_config())
+
+
+def create_object_store() -> Optional["S3Client"]:
+    """
+    Создает общий S3 клиент процесса, если хранилище включено в config.yaml (ObjectStore.enabled).
+
+    Сервер открывает его при старте и закрывает при остановке, поэтому
+    предсказания, загрузки и задачи с датасетами используют один пул
+    прогретых соединений вместо нового клиента и TLS рукопожатия на каждый вызов.
+    Ключи и адрес хранилища берутся из .env: S3_ACCESS_KEY, S3_SECRET_KEY, S3_ENDPOINT_URL, S3_BUCKET.
+    Клиент (и aiobotocore) импортируется только для включенного хранилища.
+
+    Returns:
+        Optional[S3Client]: Клиент или None, если хранилище выключено.
+    """
+    settings = config["ObjectStore"]
+    if not settings["enabled"]:
+        return None
+    from src.script.selectel_cloud import S3Client
+    return S3Client.from_env(max_pool_connections=int(settings["max_pool_connections"]),
+                             keepalive_timeout=float(settings["keepalive_timeout"]),
+                             connect_timeout=float(settings["connect_timeout"]),
+                             read_timeout=float(settings["read_timeout"]))
+
+
+object_store = create_object_store()
@@ -0,0 +1,91 @@
+from typing import NamedTuple, Optional, Type
+from pydantic import BaseModel
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from src.database.my_connector import db, config
+from src.database.my_async_connector import async_db
+
+PAGE_SIZE = int(config["Pagination"]["page_size"])
+MAX_PAGE_SIZE = int(config["Pagination"]["max_page_size"])
+STREAM_CHUNK_SIZE = int(config["Pagination"]["stream_chunk_size"])
+
+
+class ListQuery(NamedTuple):
+    """
+    Запрос списка сущности: SELECT ... FROM ... и колонка ключа курсора
+    """
+    select: str
+    id_column: str
+    where: Optional[str] = None
+
+
+# Колонки переименованы в алиасы моделей из src/database/models.py
+LIST_QUERIES = {
+    "videos": ListQuery(
+        "SELECT id, url, title, description, duration, date_upload FROM video", "id"),
+    "users": ListQuery(
+        "SELECT id, email, password, created_at FROM users", "id"),
+    "categories": ListQuery(
+        "SELECT id, name FROM categories", "id"),
+    "tags": ListQuery(
+        "SELECT id, name FROM tags", "id"),
+    "api_keys": ListQuery(
+        "SELECT id, api_key AS `key`, user_id, created_at FROM api_keys", "id"),
+    "inferences": ListQuery(
+        "SELECT c.id, c.category_ids, t.tag_ids FROM inference_categories c "
+        "LEFT JOIN inference_tags t ON t.id = c.id", "c.id"),
+    "video_inferences": ListQuery(
+        "SELECT id, id AS video_id, inference_id FROM video", "id", "inference_id IS NOT NULL"),
+}
+
+
+def _build(entity: str, keyset: bool) -> str:
+    list_query = LIST_QUERIES[entity]
+    conditions = [list_query.where] if list_query.where else []
+    if keyset:
+        conditions.append(f"{list_query.id_column} > %s")
+    query = list_query.select
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {list_query.id_column}"
+    if keyset:
+        query += " LIMIT %s"
+    return query
+
+
+async def fetch_page(response: Response, entity: str, after_id: int = 0, limit: int = PAGE_SIZE) -> list:
+    """
+    Возвращает страницу строк с id > after_id (keyset пагинация по первичному ключу).
+
+    Курсор следующей страницы передается в заголовке X-Next-Cursor,
+    на последней странице заголовок отсутствует.
+
+    Args:
+        response (Response): Ответ FastAPI для установки заголовка.
+        entity (str): Ключ из LIST_QUERIES.
+        after_id (int): Курсор - id последней строки предыдущей страницы.
+        limit (int): Размер страницы (не больше MAX_PAGE_SIZE).
+
+    Returns:
+        list: Строки страницы.
+    """
+    limit = min(limit, MAX_PAGE_SIZE)
+    rows = await async_db.fetch_all(_build(entity, keyset=True), (after_id, limit))
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1]["id"])
+    return rows
+
+
+def stream_ndjson(entity: str, model: Type[BaseModel]) -> StreamingResponse:
+    """
+    Отдает всю таблицу в формате NDJSON (одна JSON строка на запись),
+    читая ее порциями небуферизованным курсором, так что память не растет
+    с размером таблицы.
+    """
+    query = _build(entity, keyset=False)
+
+    def generate():
+        for rows in db.stream(query, chunk_size=STREAM_CHUNK_SIZE):
+            yield "".join(model.model_validate(row).model_dump_json(by_alias=True) + "\n" for row in rows)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
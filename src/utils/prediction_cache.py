@@ -0,0 +1,122 @@
+import json
+import time
+import hashlib
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlsplit, urlunsplit
+from src.database.my_async_connector import async_db
+from src.utils.custom_logging import setup_logging
+from src.utils.ttl_cache import TTLCache, MISSING
+
+log = setup_logging()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Приводит ссылку на видео к единому виду, чтобы разные записи одного видео
+    попадали в одну запись кеша: https, хост без www в нижнем регистре,
+    путь со слешем на конце, без параметров запроса и якоря.
+
+    Args:
+        url (str): Ссылка на видео.
+
+    Returns:
+        str: Нормализованная ссылка.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = parts.path if parts.path.endswith("/") else parts.path + "/"
+    return urlunsplit(("https", host, path, "", ""))
+
+
+class PredictionCache:
+    """
+    Кеш предсказаний по нормализованной ссылке на видео.
+
+    Первый уровень - LRU кеш в памяти с ограничением размера и времени жизни.
+    Второй уровень - таблица prediction_cache с ответом модели в JSON, общая
+    для всех процессов. Оба уровня хранят ровно то, что вернул compute, и
+    ключом включают версию модели, поэтому смена модели не отдает старые
+    предсказания. Таблицы видео и inference кеш не читает и не меняет.
+
+    Методы:
+    - get_or_compute: Вернуть предсказание из кеша или вычислить его.
+    - invalidate: Сбросить запись или весь кеш текущей модели (в том числе сохраненный уровень).
+    - stats: Счетчики попаданий и промахов по уровням.
+    """
+
+    def __init__(self, model_version: str, max_size: int = 10000, ttl: float = 86400,
+                 use_persisted: bool = True, persisted_ttl: float = 2592000):
+        self.model_version = model_version
+        self.use_persisted = use_persisted
+        self.persisted_ttl = persisted_ttl
+        self._memory = TTLCache(max_size=max_size, ttl=ttl)
+        self._counters = {"persisted_hits": 0, "persisted_misses": 0, "computed": 0}
+
+    def _key(self, url: str) -> tuple:
+        return self.model_version, normalize_url(url)
+
+    @staticmethod
+    def _url_hash(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+    async def _load_persisted(self, url: str) -> Any:
+        row = await async_db.fetch_one(
+            "SELECT result FROM prediction_cache WHERE model_version = %s AND url_hash = %s AND expires_at > %s",
+            (self.model_version, self._url_hash(url), int(time.time())))
+        if row is None:
+            return MISSING
+        return json.loads(row["result"])
+
+    async def _save_persisted(self, url: str, value: Any):
+        try:
+            result = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as ex:
+            log.warning(f"Prediction for {url} is not JSON serializable, not persisted: {ex}")
+            return
+        await async_db.execute_query(
+            "REPLACE INTO prediction_cache (model_version, url_hash, url, result, expires_at) "
+            "VALUES (%s, %s, %s, %s, %s)",
+            (self.model_version, self._url_hash(url), normalize_url(url), result,
+             int(time.time() + self.persisted_ttl)))
+
+    async def get_or_compute(self, url: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+        key = self._key(url)
+        value = self._memory.get(key)
+        if value is not MISSING:
+            return value
+        if self.use_persisted:
+            value = await self._load_persisted(url)
+            if value is not MISSING:
+                self._counters["persisted_hits"] += 1
+                self._memory.set(key, value)
+                return value
+            self._counters["persisted_misses"] += 1
+        value = await compute()
+        self._counters["computed"] += 1
+        self._memory.set(key, value)
+        if self.use_persisted:
+            try:
+                await self._save_persisted(url, value)
+            except Exception as ex:
+                # Предсказание уже получено, ошибка записи кеша не должна его терять
+                log.exception(f"Error persisting prediction for {url}", exc_info=ex)
+        return value
+
+    async def invalidate(self, url: Optional[str] = None, persisted: bool = False):
+        if url is None:
+            self._memory.clear()
+        else:
+            self._memory.pop(self._key(url))
+        if persisted:
+            # Удаляются только строки кеша текущей модели, сохраненные inference и видео не меняются
+            if url is None:
+                await async_db.execute_query("DELETE FROM prediction_cache WHERE model_version = %s",
+                                             (self.model_version,))
+            else:
+                await async_db.execute_query("DELETE FROM prediction_cache WHERE model_version = %s AND url_hash = %s",
+                                             (self.model_version, self._url_hash(url)))
+
+    def stats(self) -> dict:
+        return {**self._memory.stats(), **self._counters}
@@ -0,0 +1,189 @@
+import math
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+
+class BucketLimit:
+    """
+    Параметры корзины: rate токенов в секунду, не больше burst накопленных
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+
+
+def refill(tokens: float, updated_at: float, now: float, limit: BucketLimit) -> float:
+    return min(limit.burst, tokens + (now - updated_at) * limit.rate)
+
+
+class MemoryBucketStore:
+    """
+    Корзины токенов в памяти процесса.
+
+    take не содержит await, поэтому в цикле событий выполняется целиком
+    и не требует блокировок. Хранится не больше max_size корзин: при
+    переполнении вытесняется давно не использованная (LRU), поэтому поток
+    запросов с новыми ключами не раздувает память.
+    """
+
+    blocking = False
+
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._evictions = 0
+
+    def take(self, key: str, limit: BucketLimit, cost: float = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (limit.burst, now))
+        tokens = refill(tokens, updated_at, now, limit)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+            self._evictions += 1
+        return allowed, 0 if allowed else (cost - tokens) / limit.rate
+
+    def stats(self) -> dict:
+        return {"buckets": len(self._buckets), "max_size": self.max_size, "evictions": self._evictions}
+
+
+class SQLiteBucketStore:
+    """
+    Корзины токенов в локальном файле SQLite, общие для всех процессов сервера на машине.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS buckets "
+                               "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, limit: BucketLimit, cost: float = 1) -> Tuple[bool, float]:
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = refill(*(row or (limit.burst, now)), now, limit)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            connection.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                               (key, tokens, now))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return allowed, 0 if allowed else (cost - tokens) / limit.rate
+
+
+class RateLimiter:
+    """
+    Ограничение частоты запросов корзинами токенов.
+
+    Каждый запрос списывает токен из корзины IP клиента. Заголовки X-API-Key
+    и Authorization присылает сам клиент, поэтому по ним корзина не выбирается:
+    если identify подтвердил личность (например, проверил API ключ), запрос
+    дополнительно списывает токен из корзины этой личности. Лимит выбирается по
+    самому длинному совпадающему префиксу пути из routes, иначе используется default.
+
+    Методы:
+    - limit_for: Префикс и лимит для пути.
+    - client_key: Ключ корзины IP клиента.
+    - identity_key: Ключ корзины подтвержденной личности или None.
+    - check: Взять токен и вернуть (разрешено, секунд до повтора).
+    - stats: Счетчики разрешенных и отклоненных запросов.
+    """
+
+    def __init__(self, store, routes: Dict[str, BucketLimit], default: Optional[BucketLimit] = None,
+                 identify: Optional[Callable[[Dict[bytes, bytes]], Awaitable[Optional[str]]]] = None):
+        self.store = store
+        self.default = default
+        # Проверяет учетные данные из заголовков и возвращает личность или None
+        self.identify = identify
+        # Длинные префиксы проверяются первыми
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self._counters = {"allowed": 0, "rejected": 0}
+
+    def limit_for(self, path: str) -> Tuple[str, Optional[BucketLimit]]:
+        for prefix, limit in self.routes:
+            if path.startswith(prefix):
+                return prefix, limit
+        return "default", self.default
+
+    @staticmethod
+    def _hashed(identity: str) -> str:
+        # Ключи и токены не храним в открытом виде
+        return hashlib.sha256(identity.encode()).hexdigest()
+
+    @staticmethod
+    def client_key(scope) -> str:
+        client = scope.get("client")
+        return RateLimiter._hashed("ip:" + (client[0] if client else "unknown"))
+
+    async def identity_key(self, scope) -> Optional[str]:
+        if self.identify is None:
+            return None
+        identity = await self.identify(dict(scope.get("headers") or []))
+        return self._hashed(identity) if identity is not None else None
+
+    async def check(self, key: str, limit: BucketLimit) -> Tuple[bool, float]:
+        if self.store.blocking:
+            allowed, retry_after = await run_in_threadpool(self.store.take, key, limit)
+        else:
+            allowed, retry_after = self.store.take(key, limit)
+        self._counters["allowed" if allowed else "rejected"] += 1
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        store = self.store.stats() if hasattr(self.store, "stats") else {}
+        return {**self._counters, "store": type(self.store).__name__, **store}
+
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware: отвечает 429 с заголовком Retry-After, если корзина клиента пуста
+    """
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        prefix, limit = self.limiter.limit_for(scope["path"])
+        if limit is not None:
+            allowed, retry_after = await self.limiter.check(f"{prefix}:{self.limiter.client_key(scope)}", limit)
+            if allowed:
+                # Учетные данные проверяются только после корзины IP, перебор ключей ее не обходит
+                identity_key = await self.limiter.identity_key(scope)
+                if identity_key is not None:
+                    allowed, retry_after = await self.limiter.check(f"{prefix}:{identity_key}", limit)
+            if not allowed:
+                response = JSONResponse({"detail": "Too many requests"}, status_code=429,
+                                        headers={"Retry-After": str(math.ceil(retry_after))})
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Объединение одновременных запросов с одинаковым ключом.
+
+    Пока вычисление для ключа выполняется, все новые вызовы с тем же ключом
+    ждут его результат (или исключение) вместо запуска собственного.
+    Отмена одного из ожидающих не прерывает общее вычисление.
+
+    Методы:
+    - do: Выполнить fn для ключа или присоединиться к уже идущему вычислению.
+    - stats: Количество вызовов, запусков и присоединений.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._counters = {"calls": 0, "executions": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self._counters["calls"] += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self._counters["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self._counters["shared"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        # Забираем исключение, даже если все ожидающие уже отменены
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {**self._counters, "in_flight": len(self._in_flight)}
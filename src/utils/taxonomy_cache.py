@@ -0,0 +1,145 @@
+import asyncio
+import time
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+from src.database.my_async_connector import async_db
+from src.repository.taxonomy_repository import collation_key
+from src.utils.custom_logging import setup_logging
+
+log = setup_logging()
+
+
+def _frozen(mapping: dict) -> Mapping:
+    return MappingProxyType(mapping)
+
+
+class TaxonomySnapshot:
+    """
+    Неизменяемый снимок таксономии: словари по ID и имени и дерево
+    категория -> подкатегории -> теги. Имена ищутся по collation_key, как их
+    сравнивает MySQL: без учета регистра и пробелов в конце.
+    """
+
+    __slots__ = ("version", "categories", "subcategories", "tags", "category_ids", "tag_ids",
+                 "category_by_name", "tag_by_name", "category_children", "subcategory_children")
+
+    def __init__(self, version: int, categories: List[Dict], subcategories: List[Dict], tags: List[Dict]):
+        self.version = version
+        self.categories = _frozen({row["id"]: _frozen(dict(row)) for row in categories})
+        self.subcategories = _frozen({row["id"]: _frozen(dict(row)) for row in subcategories})
+        self.tags = _frozen({row["id"]: _frozen(dict(row)) for row in tags})
+        self.category_ids = tuple(sorted(self.categories))
+        self.tag_ids = tuple(sorted(self.tags))
+        self.category_by_name = _frozen({collation_key(row["name"]): row for row in self.categories.values()})
+        self.tag_by_name = _frozen({collation_key(row["name"]): row for row in self.tags.values()})
+        category_children, subcategory_children = {}, {}
+        for row in sorted(self.subcategories.values(), key=lambda row: row["id"]):
+            category_children.setdefault(row["category_id"], []).append(row["id"])
+        for row in sorted(self.tags.values(), key=lambda row: row["id"]):
+            subcategory_children.setdefault(row["subcategory_id"], []).append(row["id"])
+        self.category_children = _frozen({key: tuple(value) for key, value in category_children.items()})
+        self.subcategory_children = _frozen({key: tuple(value) for key, value in subcategory_children.items()})
+
+    def category_named(self, name: str) -> Optional[Mapping]:
+        return self.category_by_name.get(collation_key(name))
+
+    def tag_named(self, name: str) -> Optional[Mapping]:
+        return self.tag_by_name.get(collation_key(name))
+
+    def page(self, kind: str, after_id: int = 0, limit: int = 100) -> List[Mapping]:
+        ids, rows = (self.category_ids, self.categories) if kind == "categories" else (self.tag_ids, self.tags)
+        start = bisect_right(ids, after_id)
+        return [rows[row_id] for row_id in ids[start:start + limit]]
+
+    def tree(self) -> List[Dict]:
+        return [{"id": category_id, "name": self.categories[category_id]["name"],
+                 "subcategories": [{"id": subcategory_id, "name": self.subcategories[subcategory_id]["name"],
+                                    "tags": [{"id": tag_id, "name": self.tags[tag_id]["name"]}
+                                             for tag_id in self.subcategory_children.get(subcategory_id, ())]}
+                                   for subcategory_id in self.category_children.get(category_id, ())]}
+                for category_id in self.category_ids]
+
+
+class TaxonomyCache:
+    """
+    Снимок таксономии в памяти процесса для чтения без запросов к базе.
+
+    Номер версии таксономии хранится в таблице taxonomy_version и увеличивается
+    при каждой записи категорий, подкатегорий и тегов через bump. После bump
+    в этом процессе следующий читатель строит новый снимок; изменения из других
+    процессов замечаются проверкой версии раз в refresh_interval секунд.
+
+    Методы:
+    - get: Текущий снимок (перестраивается, если устарел).
+    - bump: Отметить изменение таксономии.
+    - start/stop: Запустить/остановить проверку версии.
+    - stats: Версия, размеры и счетчики перестроений.
+    """
+
+    def __init__(self, refresh_interval: float = 30):
+        self.refresh_interval = refresh_interval
+        self._snapshot: Optional[TaxonomySnapshot] = None
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._counters = {"builds": 0, "bumps": 0, "build_seconds": 0.0}
+
+    @staticmethod
+    async def _version() -> int:
+        row = await async_db.fetch_one("SELECT version FROM taxonomy_version WHERE id = 1")
+        return row["version"] if row else 0
+
+    async def _build(self) -> TaxonomySnapshot:
+        started = time.monotonic()
+        # Изменение во время чтения снова помечает снимок устаревшим
+        self._stale = False
+        try:
+            version = await self._version()
+            categories = await async_db.fetch_all("SELECT id, name FROM categories")
+            subcategories = await async_db.fetch_all("SELECT id, name, category_id FROM subcategories")
+            tags = await async_db.fetch_all("SELECT id, name, subcategory_id FROM tags")
+        except Exception:
+            self._stale = True
+            raise
+        snapshot = TaxonomySnapshot(version, categories, subcategories, tags)
+        self._counters["builds"] += 1
+        self._counters["build_seconds"] = round(time.monotonic() - started, 4)
+        return snapshot
+
+    async def get(self) -> TaxonomySnapshot:
+        if self._stale or self._snapshot is None:
+            async with self._lock:
+                if self._stale or self._snapshot is None:
+                    self._snapshot = await self._build()
+        return self._snapshot
+
+    async def bump(self):
+        await async_db.execute_query("UPDATE taxonomy_version SET version = version + 1 WHERE id = 1")
+        self._stale = True
+        self._counters["bumps"] += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                if self._snapshot is not None and await self._version() != self._snapshot.version:
+                    self._stale = True
+            except Exception as ex:
+                log.exception("Error checking taxonomy version", exc_info=ex)
+
+    async def start(self):
+        await self.get()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        sizes = {"categories": len(snapshot.categories), "subcategories": len(snapshot.subcategories),
+                 "tags": len(snapshot.tags), "version": snapshot.version} if snapshot else {}
+        return {**sizes, "stale": self._stale, **self._counters}
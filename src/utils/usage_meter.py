@@ -0,0 +1,142 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+from uuid import uuid4
+from fastapi import HTTPException, status
+from pymysql.err import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from src.database.my_connector import db
+from src.database.my_async_connector import async_db
+from src.utils.custom_logging import setup_logging
+
+log = setup_logging()
+
+# Код ошибки MySQL для повторяющегося первичного ключа
+DUPLICATE_ENTRY = 1062
+
+
+class UsageMeter:
+    """
+    Учет использования API ключей в памяти с пакетной записью в базу.
+
+    Запросы считаются в памяти, лимит usage_limit проверяется по этим счетчикам,
+    поэтому проверка квоты не добавляет запросов на запись. Квота резервируется
+    до работы: reserve не содержит await между проверкой остатка и списанием,
+    поэтому в цикле событий выполняется целиком, и одновременные запросы не проходят
+    проверку по одному и тому же остатку. Если работа не выполнена, резерв
+    возвращается через refund. Раз в flush_interval
+    секунд накопленные приращения записываются одним многострочным
+    INSERT ... ON DUPLICATE KEY UPDATE.
+
+    Каждая запись помечена flush_id, который сохраняется в той же транзакции.
+    Если подтверждение записи потерялось, повтор с тем же flush_id распознается
+    и не увеличивает счетчики второй раз. После перезапуска счетчики
+    загружаются из базы, а не начинаются с нуля.
+
+    Методы:
+    - reserve: Зарезервировать использование ключа или отказать при превышении лимита.
+    - refund: Вернуть резерв за невыполненную работу.
+    - flush: Записать накопленные приращения в базу.
+    - start/stop: Запустить/остановить периодическую запись.
+    - stats: Количество ключей и неотправленных приращений.
+    """
+
+    def __init__(self, flush_interval: float = 10):
+        self.flush_interval = flush_interval
+        self._totals: Dict[str, int] = {}
+        self._pending: Dict[str, int] = defaultdict(int)
+        self._in_flight: Optional[Tuple[str, Dict[str, int]]] = None
+        self._task = None
+        self._lock = asyncio.Lock()
+        self._counters = {"flushes": 0, "flush_errors": 0, "rejected": 0}
+
+    async def _load(self, api_key: str) -> int:
+        row = await async_db.fetch_one("SELECT used FROM api_key_usage WHERE api_key = %s", (api_key,))
+        return row["used"] if row else 0
+
+    async def _ensure_loaded(self, api_key: str):
+        if api_key not in self._totals:
+            used = await self._load(api_key)
+            self._totals.setdefault(api_key, used + self._pending.get(api_key, 0))
+
+    async def reserve(self, api_key: str, usage_limit: int, amount: int = 1):
+        await self._ensure_loaded(api_key)
+        # От проверки до списания нет await
+        if self._totals[api_key] + amount > usage_limit:
+            self._counters["rejected"] += 1
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail="API key usage limit exceeded")
+        self._totals[api_key] += amount
+        self._pending[api_key] += amount
+
+    def refund(self, api_key: str, amount: int = 1):
+        if not amount:
+            return
+        # Если резерв уже записан в базу, отрицательное приращение уменьшит счетчик при следующей записи
+        self._totals[api_key] -= amount
+        self._pending[api_key] -= amount
+        if not self._pending[api_key]:
+            del self._pending[api_key]
+
+    def _write(self, flush_id: str, deltas: Dict[str, int]) -> Dict[str, int]:
+        with db.transaction() as connection:
+            with connection.cursor() as cursor:
+                try:
+                    cursor.execute("INSERT INTO api_key_usage_flushes (flush_id) VALUES (%s)", (flush_id,))
+                except IntegrityError as e:
+                    if e.args[0] != DUPLICATE_ENTRY:
+                        raise
+                    log.warning(f"Usage flush {flush_id} was already applied")
+                else:
+                    cursor.executemany(
+                        "INSERT INTO api_key_usage (api_key, used) VALUES (%s, %s) "
+                        "ON DUPLICATE KEY UPDATE used = used + VALUES(used)",
+                        list(deltas.items()))
+                # Отметки о записях нужны только для распознавания повторов
+                cursor.execute("DELETE FROM api_key_usage_flushes WHERE flushed_at < NOW() - INTERVAL 1 DAY")
+                # Заодно узнаем использование ключей другими процессами сервера
+                placeholders = ", ".join(["%s"] * len(deltas))
+                cursor.execute(f"SELECT api_key, used FROM api_key_usage WHERE api_key IN ({placeholders})",
+                               list(deltas))
+                return {row["api_key"]: row["used"] for row in cursor.fetchall()}
+
+    async def flush(self):
+        async with self._lock:
+            if self._in_flight is None:
+                if not self._pending:
+                    return
+                self._in_flight = (str(uuid4()), dict(self._pending))
+                self._pending.clear()
+            flush_id, deltas = self._in_flight
+            try:
+                stored = await run_in_threadpool(self._write, flush_id, deltas)
+            except Exception as ex:
+                # Приращения остаются в _in_flight и будут отправлены с тем же flush_id
+                self._counters["flush_errors"] += 1
+                log.exception("Error flushing API key usage", exc_info=ex)
+                return
+            self._in_flight = None
+            self._counters["flushes"] += 1
+            for api_key, used in stored.items():
+                self._totals[api_key] = used + self._pending.get(api_key, 0)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        pending = sum(self._pending.values())
+        if self._in_flight is not None:
+            pending += sum(self._in_flight[1].values())
+        return {"keys": len(self._totals), "pending": pending, **self._counters}
@@ -0,0 +1,225 @@
+import heapq
+import asyncio
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict
+from itertools import groupby, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from starlette.concurrency import run_in_threadpool
+from src.database.my_connector import db
+from src.database.my_async_connector import async_db
+from src.utils.custom_logging import setup_logging
+
+log = setup_logging()
+
+# Вид термина индекса -> колонка таблицы связей inference (src/repository/inference_links_repository.py)
+KINDS = {"category": ("inference_category_links", "category_id"),
+         "subcategory": ("inference_subcategory_links", "subcategory_id"),
+         "tag": ("inference_tag_links", "tag_id")}
+
+Term = Tuple[str, int]
+
+
+def terms_query(where: str) -> str:
+    # Термины видео из всех таблиц связей его inference
+    return " UNION ALL ".join(
+        f"SELECT v.id AS video_id, v.inference_id, '{kind}' AS kind, l.{column} AS term_id FROM video v "
+        f"JOIN {table} l ON l.inference_id = v.inference_id WHERE {where}"
+        for kind, (table, column) in KINDS.items())
+
+
+def after(postings: List[int], video_id: int) -> Iterator[int]:
+    # ID списка больше курсора, без копирования хвоста списка
+    return (postings[position] for position in range(bisect_right(postings, video_id), len(postings)))
+
+
+def contains(postings: List[int], video_id: int) -> bool:
+    position = bisect_left(postings, video_id)
+    return position < len(postings) and postings[position] == video_id
+
+
+class VideoIndex:
+    """
+    Обратный индекс в памяти: категория, подкатегория или тег -> отсортированный список ID видео.
+
+    Индекс загружается из таблиц связей при старте и обновляется по одному видео
+    при изменении VideoInference, inference или видео. Поиск с AND проходит
+    самый короткий список и проверяет остальные бинарным поиском, с OR -
+    сливает списки; оба останавливаются, как только страница заполнена,
+    поэтому время зависит от курсора и размера страницы, а не от размера каталога.
+
+    Индекс у каждого процесса сервера свой. Как и для таксономии, номер версии
+    хранится в таблице video_index_version и увеличивается при каждом refresh.
+    Раз в refresh_interval секунд версия сверяется с загруженной плюс
+    собственными увеличениями; если ее увеличил другой процесс, индекс строится заново.
+
+    Методы:
+    - load: Построить индекс заново из базы.
+    - refresh_videos: Перечитать термины видео из базы.
+    - refresh_inferences: Перечитать термины всех видео с этими inference.
+    - search: Страница ID видео по терминам и оценка количества совпадений.
+    - counts: Самые частые категории, подкатегории и теги набора видео.
+    - start/stop: Загрузить индекс и запустить/остановить проверку версии.
+    - stats: Размер индекса.
+    """
+
+    def __init__(self, refresh_interval: float = 30):
+        self.refresh_interval = refresh_interval
+        self._postings: Dict[Term, List[int]] = {}
+        self._terms: Dict[int, Set[Term]] = {}
+        self._by_inference: Dict[int, Set[int]] = defaultdict(set)
+        self._inference: Dict[int, int] = {}
+        # Версия из базы на момент загрузки и число своих увеличений после нее
+        self._version = 0
+        self._bumps = 0
+        self._task = None
+        self._counters = {"loads": 0, "refreshes": 0, "searches": 0}
+
+    @staticmethod
+    def _read_all() -> List[Dict]:
+        rows = []
+        for chunk in db.stream(terms_query("v.inference_id IS NOT NULL")):
+            rows.extend(chunk)
+        return rows
+
+    @staticmethod
+    async def _read_version() -> int:
+        row = await async_db.fetch_one("SELECT version FROM video_index_version WHERE id = 1")
+        return row["version"] if row else 0
+
+    async def load(self):
+        # Версия читается до строк: изменение во время чтения вызовет повторную загрузку
+        version = await self._read_version()
+        rows = await run_in_threadpool(self._read_all)
+        postings, terms = defaultdict(list), defaultdict(set)
+        by_inference, inference = defaultdict(set), {}
+        for row in rows:
+            terms[row["video_id"]].add((row["kind"], row["term_id"]))
+            by_inference[row["inference_id"]].add(row["video_id"])
+            inference[row["video_id"]] = row["inference_id"]
+        for video_id, video_terms in terms.items():
+            for term in video_terms:
+                postings[term].append(video_id)
+        for video_ids in postings.values():
+            video_ids.sort()
+        self._postings, self._terms = dict(postings), dict(terms)
+        self._by_inference, self._inference = by_inference, inference
+        self._version, self._bumps = version, 0
+        self._counters["loads"] += 1
+        log.info(f"Video index loaded: {len(self._terms)} videos, {len(self._postings)} terms")
+
+    def _set_video(self, video_id: int, terms: Set[Term], inference_id: Optional[int]):
+        old_terms = self._terms.pop(video_id, set())
+        for term in old_terms - terms:
+            postings = self._postings[term]
+            del postings[bisect_left(postings, video_id)]
+            if not postings:
+                del self._postings[term]
+        for term in terms - old_terms:
+            insort(self._postings.setdefault(term, []), video_id)
+        old_inference = self._inference.pop(video_id, None)
+        if old_inference is not None:
+            self._by_inference[old_inference].discard(video_id)
+            if not self._by_inference[old_inference]:
+                del self._by_inference[old_inference]
+        if terms:
+            self._terms[video_id] = terms
+            self._inference[video_id] = inference_id
+            self._by_inference[inference_id].add(video_id)
+
+    async def refresh_videos(self, video_ids: Iterable[int]):
+        video_ids = {int(video_id) for video_id in video_ids}
+        if not video_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(video_ids))
+        rows = await async_db.fetch_all(terms_query(f"v.id IN ({placeholders})"),
+                                        list(video_ids) * len(KINDS))
+        terms, inference = defaultdict(set), {}
+        for row in rows:
+            terms[row["video_id"]].add((row["kind"], row["term_id"]))
+            inference[row["video_id"]] = row["inference_id"]
+        # Видео без строк в ответе удалены или отвязаны от inference и уходят из индекса
+        for video_id in video_ids:
+            self._set_video(video_id, terms.get(video_id, set()), inference.get(video_id))
+        await async_db.execute_query("UPDATE video_index_version SET version = version + 1 WHERE id = 1")
+        self._bumps += 1
+        self._counters["refreshes"] += 1
+
+    async def refresh_inferences(self, inference_ids: Iterable[int]):
+        inference_ids = {int(inference_id) for inference_id in inference_ids}
+        if not inference_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(inference_ids))
+        rows = await async_db.fetch_all(f"SELECT id FROM video WHERE inference_id IN ({placeholders})",
+                                        list(inference_ids))
+        video_ids = {row["id"] for row in rows}
+        for inference_id in inference_ids:
+            video_ids |= self._by_inference.get(inference_id, set())
+        await self.refresh_videos(video_ids)
+
+    def search(self, terms: List[Term], mode: str = "and", after_id: int = 0,
+               limit: int = 100) -> Tuple[List[int], int]:
+        """
+        Ищет видео по терминам.
+
+        Args:
+            terms (List[Term]): Пары (вид, ID), вид - category, subcategory или tag.
+            mode (str): and - все термины, or - хотя бы один.
+            after_id (int): Курсор - ID последнего видео предыдущей страницы.
+            limit (int): Размер страницы.
+
+        Returns:
+            Tuple[List[int], int]: ID видео страницы по возрастанию и оценка числа совпадений:
+                точное число, если первая страница вместила все совпадения, иначе оценка сверху
+                (длина самого короткого списка для and, сумма длин списков для or).
+        """
+        self._counters["searches"] += 1
+        lists = [self._postings.get(term, []) for term in set(terms)]
+        if not lists:
+            return [], 0
+        if mode == "and":
+            lists.sort(key=len)
+            shortest, others = lists[0], lists[1:]
+            matches = (video_id for video_id in after(shortest, after_id)
+                       if all(contains(postings, video_id) for postings in others))
+            estimate = len(shortest)
+        else:
+            merged = heapq.merge(*(after(postings, after_id) for postings in lists))
+            matches = (video_id for video_id, _ in groupby(merged))
+            estimate = min(sum(len(postings) for postings in lists), len(self._terms))
+        # Просмотр заканчивается на заполненной странице, остальные совпадения не перебираются
+        page = list(islice(matches, limit))
+        if after_id == 0 and len(page) < limit:
+            return page, len(page)
+        return page, max(estimate, len(page))
+
+    def counts(self, video_ids: Iterable[int], top: int = 10) -> Dict[str, List[Tuple[int, int]]]:
+        counters = {kind: Counter() for kind in KINDS}
+        for video_id in set(video_ids):
+            for kind, term_id in self._terms.get(video_id, ()):
+                counters[kind][term_id] += 1
+        return {kind: counter.most_common(top) for kind, counter in counters.items()}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                # Версия больше ожидаемой - индекс изменял другой процесс
+                if await self._read_version() != self._version + self._bumps:
+                    await self.load()
+            except Exception as ex:
+                log.exception("Error checking video index version", exc_info=ex)
+
+    async def start(self):
+        await self.load()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> dict:
+        return {"videos": len(self._terms), "terms": len(self._postings),
+                "postings": sum(len(postings) for postings in self._postings.values()),
+                "version": self._version + self._bumps, **self._counters}
@@ -1,20 +1,125 @@
 import os
 import uuid
-from aiofiles import open as aio_open
-from config import Config
-config = Config()
+import asyncio
+import hashlib
+from functools import partial
+from typing import Optional
+from fastapi import HTTPException, status
+from env import Env
+from src import path_to_config
+from src.repository import media_repository
+from src.utils.config_parser import ConfigParser
+from src.utils.custom_logging import setup_logging
 
+env = Env()
+log = setup_logging()
+config = ConfigParser.parse(path_to_config())
 
-async def write_file_into_server(name_object: str, file) -> None:
-    # Получаем расширение файла
-    file_extension = file.filename.split('.')[-1]
-    # Создаем уникальное имя файла
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    # Записываем путь к файлу
-    file_location = os.path.join(config.__getattr__("UPLOAD_DIR"), f"{name_object}", unique_filename)
+CHUNK_SIZE = int(config["Upload"]["chunk_size"])
+EXTENSIONS = frozenset(extension.lower() for extension in config["Upload"]["extensions"])
+
+
+def upload_dir(name_object: str) -> str:
     # Проверяем существует ли папка, в которой храняться файлы
-    os.makedirs(os.path.join(config.__getattr__("UPLOAD_DIR"), f"{name_object}"), exist_ok=True)
-    # Открывааем файл и записываем данные изображения
-    async with aio_open(file_location, "wb") as buffer:
-        await buffer.write(await file.read())
-    return unique_filename
+    directory = os.path.join(env.__getattr__("UPLOAD_DIR"), f"{name_object}")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def file_extension(filename: str) -> str:
+    """
+    Расширение из имени файла клиента, если оно есть в Upload.extensions.
+
+    Raises:
+        HTTPException: 415, если расширения нет или оно не разрешено.
+    """
+    extension = os.path.splitext(os.path.basename(filename or ""))[1].lstrip(".").lower()
+    if extension not in EXTENSIONS:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail=f"File extension must be one of {', '.join(sorted(EXTENSIONS))}")
+    return extension
+
+
+def _remove(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+async def store_file(name_object: str, path: str, sha256: str, extension: str, size: int) -> str:
+    """
+    Переносит готовый файл в хранилище под именем его хеша и добавляет ссылку в media_objects.
+    Если такое содержимое уже хранится, файл path не нужен и остается вызывающему для удаления.
+
+    Args:
+        name_object (str): Папка объектов (например, videos).
+        path (str): Путь к записанному файлу в той же файловой системе.
+        sha256 (str): Хеш содержимого.
+        extension (str): Расширение файла.
+        size (int): Размер в байтах.
+
+    Returns:
+        str: Имя файла в папке name_object.
+    """
+    filename, refcount = await asyncio.to_thread(media_repository.acquire_media_object,
+                                                 name_object, sha256, f"{sha256}.{extension}", size)
+    location = os.path.join(await asyncio.to_thread(upload_dir, name_object), filename)
+    try:
+        if not os.path.exists(location):
+            await asyncio.to_thread(os.replace, path, location)
+    except OSError:
+        await release_file_from_server(name_object, filename)
+        raise
+    log.info(f"Stored {name_object}/{filename} ({size} bytes, {refcount} references)")
+    return filename
+
+
+async def write_file_into_server(name_object: str, file) -> str:
+    """
+    Потоково записывает загруженный файл в хранилище с адресацией по содержимому.
+
+    Файл читается порциями по Upload.chunk_size и хешируется по мере записи
+    во временный файл, поэтому память не зависит от размера видео. Одинаковое
+    содержимое хранится один раз: повторная загрузка только увеличивает
+    счетчик ссылок и возвращает имя уже сохраненного файла.
+
+    Args:
+        name_object (str): Папка объектов (например, videos).
+        file (UploadFile): Загруженный файл.
+
+    Returns:
+        str: Имя файла в папке name_object.
+
+    Raises:
+        HTTPException: 415, если расширение файла не из Upload.extensions.
+    """
+    # Получаем расширение файла
+    extension = file_extension(file.filename)
+    temporary = os.path.join(await asyncio.to_thread(upload_dir, name_object), f".{uuid.uuid4()}.part")
+    digest, size = hashlib.sha256(), 0
+    try:
+        buffer = await asyncio.to_thread(open, temporary, "wb")
+        try:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+        finally:
+            await asyncio.to_thread(buffer.close)
+        return await store_file(name_object, temporary, digest.hexdigest(), extension, size)
+    finally:
+        await asyncio.to_thread(_remove, temporary)
+
+
+async def release_file_from_server(name_object: str, filename: str) -> Optional[int]:
+    """
+    Убирает ссылку на файл, файл удаляется вместе с последней ссылкой.
+
+    Returns:
+        Optional[int]: Оставшееся число ссылок или None, если файл не учтен.
+    """
+    location = os.path.join(env.__getattr__("UPLOAD_DIR"), f"{name_object}", filename)
+    return await asyncio.to_thread(media_repository.release_media_object, name_object, filename,
+                                   partial(_remove, location))